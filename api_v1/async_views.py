@@ -0,0 +1,73 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from mainapp.models import Albums
+from recognition.models import People, Patterns
+from recognition.redis_interface.async_api import AsyncRedisAPIAlbumState, AsyncRedisAPISearchState
+
+
+# Status views are polled all the time while album is processed or person is searched, and they only read redis.
+# So they are async: under ASGI server waiting for redis does not hold a worker, and only authentication
+# with lookup of owned object is done in thread by one database query.
+
+class NotAuthenticatedError(Exception):
+    pass
+
+
+def _get_owned_object_pk(request, queryset, slug):
+    """Authenticates request by authenticators of API and returns pk of user's object with slug (or None)."""
+    user = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]).user
+    if not user.is_authenticated:
+        raise NotAuthenticatedError
+    return queryset.filter(slug=slug, owner__pk=user.pk).values_list('pk', flat=True).first()
+
+
+async def _get_owned_object_pk_or_error_response(request, queryset, slug, not_found_message):
+    try:
+        object_pk = await sync_to_async(_get_owned_object_pk)(request, queryset, slug)
+    except NotAuthenticatedError:
+        return None, JsonResponse({"detail": "Authentication credentials were not provided."},
+                                  status=status.HTTP_401_UNAUTHORIZED)
+    except APIException as exc:
+        return None, JsonResponse({"detail": exc.detail}, status=exc.status_code)
+
+    if object_pk is None:
+        return None, JsonResponse({"error": not_found_message}, status=status.HTTP_404_NOT_FOUND)
+    return object_pk, None
+
+
+async def album_processing_status_view(request, album_slug):
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    album_pk, error_response = await _get_owned_object_pk_or_error_response(request, Albums.objects, album_slug,
+                                                                            'Album not found')
+    if error_response is not None:
+        return error_response
+
+    state = await AsyncRedisAPIAlbumState.get_state(album_pk)
+    state['finished'] = state['finished'] or False
+    return JsonResponse(state)
+
+
+async def search_status_view(request):
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    person_slug = request.GET.get('person')
+    if person_slug is None:
+        return JsonResponse({"error": "person slug was not specified"}, status=status.HTTP_400_BAD_REQUEST)
+
+    person_pk, error_response = await _get_owned_object_pk_or_error_response(request, People.objects, person_slug,
+                                                                             'Person not found')
+    if error_response is not None:
+        return error_response
+
+    state = await AsyncRedisAPISearchState.get_state(person_pk)
+    if state['searching_now']:
+        state['total_patterns_amount'] = await Patterns.objects.filter(person__pk=person_pk).acount()
+    return JsonResponse(state)
@@ -1,6 +1,8 @@
 from api_v1.data_extractors import FacesInPhotosExtractor, PatternsFacesExtractor, PatternsForGroupingExtractor, \
     TechPairsExtractor, SinglePeopleExtractor, ProcessedPhotosAmountExtractor
-from recognition.redis_interface.functional_api import RedisAPIStage, RedisAPIStatus, RedisAPIFinished
+from mainapp.utils import get_or_compute
+from photoalbums.settings import RECOGNITION_STATE_CACHE_SECONDS
+from recognition.redis_interface.functional_api import RedisAPIAlbumState
 
 
 class RecognitionStateCollector:
@@ -17,9 +19,13 @@ class RecognitionStateCollector:
     def __init__(self, album_pk: int, request=None):
         self.album_pk = album_pk
         self.request = request
-        self.stage = RedisAPIStage.get_stage(album_pk)
-        self.status = RedisAPIStatus.get_status(album_pk)
-        self.finished = RedisAPIFinished.get_finished_status(album_pk) or False
+        state = RedisAPIAlbumState.get_state(album_pk)
+        self.stage = state['stage']
+        self.status = state['status']
+        self.finished = state['finished'] or False
+        self.progress = state['progress']
+        self.queue_position = state['queue_position']
+        self.version = state['version']
         self.data = None
 
     def collect(self):
@@ -34,4 +40,11 @@ class RecognitionStateCollector:
             return
 
         extractor = extractor_class(self.album_pk, self.request)
-        self.data = extractor.get_data()
+
+        # Data of completed stage does not change until next change of stage or status,
+        # while amount of processed photos changes all the time
+        if extractor_class.completed_stage == 0 or self.version is None:
+            self.data = extractor.get_data()
+        else:
+            cache_key = f"album_{self.album_pk}_processing_data_{self.version}_{self.request.get_host()}"
+            self.data = get_or_compute(cache_key, extractor.get_data, RECOGNITION_STATE_CACHE_SECONDS)
@@ -18,6 +18,9 @@ class DataExtractor:
     def get_data(self):
         raise NotImplementedError
 
+    def _get_face_image_url(self, face_slug):
+        return reverse('api_v1:face-img', request=self.request) + '?face=' + face_slug
+
 
 class ProcessedPhotosAmountExtractor(DataExtractor):
     completed_stage = 0
@@ -34,14 +37,14 @@ class FacesInPhotosExtractor(DataExtractor):
 
     def get_data(self):
         photo_slugs = RedisAPIPhotoSlug.get_photo_slugs(self.album_pk)
-        image_links = [reverse('api_v1:photo-with-frames', request=self.request) + '?photo=' + photo_slug
-                       for photo_slug in photo_slugs]
-
-        photos = Photos.objects.filter(slug__in=photo_slugs)
-        faces_amounts = [RedisAPIPhotoDataGetter.get_faces_amount_in_photo(photo_pk=photos.get(slug=photo_slug).pk)
-                         for photo_slug in photo_slugs]
-        data = [{'photo_slug': photo_slugs[i], 'image': image_links[i], 'faces_amount': faces_amounts[i]}
-                for i in range(len(photo_slugs))]
+        image_url = reverse('api_v1:photo-with-frames', request=self.request)
+
+        photos_pks = dict(Photos.objects.filter(slug__in=photo_slugs).values_list('slug', 'pk'))
+        faces_amounts = RedisAPIPhotoDataGetter.get_faces_amounts_in_photos(
+            [photos_pks[photo_slug] for photo_slug in photo_slugs],
+        )
+        data = [{'photo_slug': photo_slug, 'image': image_url + '?photo=' + photo_slug, 'faces_amount': faces_amount}
+                for photo_slug, faces_amount in zip(photo_slugs, faces_amounts)]
         return data
 
 
@@ -92,9 +95,8 @@ class TechPairsExtractor(DataExtractor):
                          for x in patt_inds]
 
         # old people
-        old_people = People.objects.filter(pk__in=old_people_pks).prefetch_related('patterns_set__faces_set')
-        old_face_urls = [reverse('api_v1:face-img', request=self.request) + '?face=' +
-                         old_people.get(pk=x).patterns_set.first().faces_set.first().slug for x in old_people_pks]
+        old_faces_slugs = dict(People.objects.filter(pk__in=old_people_pks).values_list('pk', 'cover_face__slug'))
+        old_face_urls = [self._get_face_image_url(old_faces_slugs[x]) for x in old_people_pks]
 
         data = {}
         for i in range(len(new_people_inds)):
@@ -119,18 +121,14 @@ class SinglePeopleExtractor(DataExtractor):
         return data
 
     def _get_old_unpaired_people(self):
-        queryset = People.objects.prefetch_related('patterns_set__faces_set').filter(owner=self.request.user)
-
         # Collecting already paired people with created people of this album
         paired = RedisAPIMatchesGetter.get_old_paired_people(self.album_pk)
 
         # Taking face image url of one of the faces of person,
         # if it is not already paired with one of people from this album
-        old_ppl = []
-        for person in queryset:
-            if person.pk not in paired:
-                old_ppl.append((person.pk,
-                                reverse('api_v1:face-img', request=self.request) + '?face=' +
-                                person.patterns_set.first().faces_set.first().slug))
-
-        return old_ppl
+        queryset = People.objects.filter(
+            owner=self.request.user,
+            cover_face__isnull=False,
+        ).exclude(pk__in=paired).values_list('pk', 'cover_face__slug')
+
+        return [(pk, self._get_face_image_url(face_slug)) for pk, face_slug in queryset]
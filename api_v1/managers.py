@@ -8,7 +8,7 @@ from recognition.redis_interface.task_handlers_api import RedisAPIBaseHandler
 from recognition.redis_interface.views_api import RedisAPIStage2View, RedisAPIStage4View, RedisAPIStage5View, \
     RedisAPIStage7View, RedisAPIStage8View
 from recognition.supporters import DataDeletionSupporter
-from recognition.tasks import recognition_task
+from recognition.tasks import schedule_recognition_task, lock_recognition_task
 from recognition.utils import set_album_photos_processed
 
 
@@ -19,6 +19,8 @@ class AlbumProcessingManager:
     def __init__(self, data_collector, user):
         self.data_collector = data_collector
         self.user = user
+        # Set, if celery task of next stage was already launched by another request, so run did nothing with it
+        self.task_already_launched = False
 
         if self.redisAPI is None or self.recognition_stage is None:
             raise NotImplementedError
@@ -27,9 +29,12 @@ class AlbumProcessingManager:
         raise NotImplementedError
 
     def _start_celery_task(self, next_stage):
+        if not lock_recognition_task(self.data_collector.album_pk, next_stage):
+            self.task_already_launched = True
+            return
         self.redisAPI.set_stage(album_pk=self.data_collector.album_pk, stage=next_stage)
         self.redisAPI.set_status(album_pk=self.data_collector.album_pk, status="processing")
-        recognition_task.delay(self.data_collector.album_pk, next_stage)
+        schedule_recognition_task(self.data_collector.album_pk, next_stage, self.user.pk)
 
     def _choose_celery_task_and_start_it(self):
         another_album_processed = Faces.objects.filter(
@@ -52,9 +57,12 @@ class StartProcessingManager(AlbumProcessingManager):
     redisAPI = RedisAPIBaseHandler
 
     def run(self):
+        if not lock_recognition_task(self.data_collector.album_pk, 1):
+            self.task_already_launched = True
+            return
         RedisAPIStage.set_stage(album_pk=self.data_collector.album_pk, stage=0)
         RedisAPIStatus.set_status(album_pk=self.data_collector.album_pk, status="processing")
-        recognition_task.delay(self.data_collector.album_pk, 1)
+        schedule_recognition_task(self.data_collector.album_pk, 1, self.user.pk)
 
 
 class VerifyFramesManager(AlbumProcessingManager):
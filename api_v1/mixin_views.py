@@ -0,0 +1,80 @@
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from accounts.models import User
+from mainapp.supporters import AlbumsVersionSupporter
+from recognition.models import People
+from recognition.utils import get_people_version
+
+
+class ConditionalGetMixin:
+    """Answers requests of lists and details with 304 Not Modified, if client already has actual version of data,
+    before data is queried and serialized. Version is a stamp in nanoseconds, returned by get_version()
+    (or None, if it is unknown). It is sent in ETag (together with user, as data depends on him).
+    Last-Modified is not sent: it has precision of seconds, so change in the same second as cached response
+    would be answered by 304."""
+
+    def get_version(self):
+        raise NotImplementedError
+
+    def list(self, request, *args, **kwargs):
+        return self.get_not_modified_response(request) or super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_not_modified_response(request) or super().retrieve(request, *args, **kwargs)
+
+    def get_not_modified_response(self, request):
+        self._version = self.get_version()
+        if self._version is None:
+            return
+        return get_conditional_response(request, etag=self._get_etag())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, '_version', None) is not None and response.status_code in (200, 304):
+            response['ETag'] = self._get_etag()
+            response['Cache-Control'] = 'private, no-cache'
+            patch_vary_headers(response, ('Authorization', 'Cookie'))
+        return response
+
+    def _get_etag(self):
+        return quote_etag(f'{self._version}-{self.request.user.pk or 0}')
+
+
+class OwnerAlbumsConditionalGetMixin(ConditionalGetMixin):
+    """Conditional requests of albums and photos of user from url, by version of all his albums."""
+
+    def get_version(self):
+        username_slug = self.kwargs.get('username_slug')
+        if self.request.user.is_authenticated and self.request.user.username_slug == username_slug:
+            owner_pk = self.request.user.pk
+        else:
+            owner_pk = User.objects.filter(username_slug=username_slug).values_list('pk', flat=True).first()
+
+        if owner_pk is not None:
+            return AlbumsVersionSupporter.get_version(owner_pk)
+
+
+class PersonConditionalGetMixin(ConditionalGetMixin):
+    """Conditional requests of person from url, by version of all people of his owner."""
+
+    def get_version(self):
+        owner_pk = People.objects.filter(
+            slug=self.kwargs.get('person_slug'),
+        ).values_list('owner_id', flat=True).first()
+
+        if owner_pk is not None:
+            return get_people_version(owner_pk)
+
+
+class FavoritesBulkUpdateMixin:
+    """Adding and removing of many favorites by one request with serializer from bulk_serializer_class."""
+    bulk_serializer_class = None
+
+    def bulk_update(self, request, *args, **kwargs):
+        serializer = self.bulk_serializer_class(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,26 @@
+from rest_framework.pagination import CursorPagination
+
+from photoalbums.settings import API_ALBUMS_PAGE_SIZE, API_PHOTOS_PAGE_SIZE, API_FACES_PAGE_SIZE, API_MAX_PAGE_SIZE
+
+
+class TimeCreateCursorPagination(CursorPagination):
+    """Keyset pagination by creation time (objects created at the same moment are ordered by pk),
+    so cost of page does not depend on its position."""
+    ordering = ('time_create', 'pk')
+    page_size_query_param = 'page_size'
+    max_page_size = API_MAX_PAGE_SIZE
+
+
+class AlbumsCursorPagination(TimeCreateCursorPagination):
+    page_size = API_ALBUMS_PAGE_SIZE
+
+
+class PhotosCursorPagination(TimeCreateCursorPagination):
+    page_size = API_PHOTOS_PAGE_SIZE
+
+
+class FacesCursorPagination(CursorPagination):
+    ordering = ('pk',)
+    page_size = API_FACES_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = API_MAX_PAGE_SIZE
@@ -7,7 +7,8 @@ class FavoritesRouter(SimpleRouter):
             url=r'^{prefix}{trailing_slash}$',
             mapping={
                 'get': 'list',
-                'post': 'create'
+                'post': 'create',
+                'patch': 'bulk_update',
             },
             name='{basename}-list',
             detail=False,
@@ -1,10 +1,10 @@
 from rest_framework import serializers
-from rest_framework.reverse import reverse
 
-from recognition.models import Patterns, Faces
+from recognition.models import Faces
+from .mixins import UrlTemplatesMixin
 
 
-class FaceSerializer(serializers.ModelSerializer):
+class FaceSerializer(UrlTemplatesMixin, serializers.ModelSerializer):
     face_img_url = serializers.SerializerMethodField()
     album_url = serializers.SerializerMethodField()
     photo_url = serializers.SerializerMethodField()
@@ -13,34 +13,33 @@ class FaceSerializer(serializers.ModelSerializer):
         model = Faces
         fields = ('face_img_url', 'album_url', 'photo_url')
 
+    @staticmethod
+    def setup_queryset(queryset):
+        """Faces queryset, taking in one query only columns, that are needed for urls
+        (and privacy of photo and album, that is read on their initialization)."""
+        return queryset.select_related('photo__album__owner').only(
+            'slug',
+            'photo__slug',
+            'photo__is_private',
+            'photo__album__slug',
+            'photo__album__is_private',
+            'photo__album__owner__username_slug',
+        )
+
     def get_photo_url(self, face):
-        return reverse(
-            viewname='api_v1:photos-detail',
-            request=self.context['request'],
-            kwargs={
-                'username_slug': face.photo.album.owner.username_slug,
-                'album_slug': face.photo.album.slug,
-                'photo_slug': face.photo.slug,
-            }
+        return self.build_url(
+            'api_v1:photos-detail',
+            username_slug=face.photo.album.owner.username_slug,
+            album_slug=face.photo.album.slug,
+            photo_slug=face.photo.slug,
         )
 
     def get_face_img_url(self, face):
-        return reverse('api_v1:face-img', request=self.context['request']) + f"face={face.slug}"
+        return self.build_url('api_v1:face-img', query_params={'face': face.slug})
 
     def get_album_url(self, face):
-        return reverse(
-            viewname='api_v1:albums-detail',
-            request=self.context['request'],
-            kwargs={
-                'username_slug': face.photo.album.owner.username_slug,
-                'album_slug': face.photo.album.slug,
-            }
+        return self.build_url(
+            'api_v1:albums-detail',
+            username_slug=face.photo.album.owner.username_slug,
+            album_slug=face.photo.album.slug,
         )
-
-
-class PatternsSerializer(serializers.ModelSerializer):
-    faces = FaceSerializer(many=True, read_only=True, source='faces_set')
-
-    class Meta:
-        model = Patterns
-        fields = ('faces',)
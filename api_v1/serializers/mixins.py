@@ -1,17 +1,85 @@
+from rest_framework.reverse import reverse
 from rest_framework.serializers import ValidationError
 
 from mainapp.models import Albums
+from photoalbums.settings import PHOTO_RENDITIONS, PHOTO_RENDITIONS_FORMATS
+
+
+class UrlTemplatesMixin:
+    """Url of view is reversed once per request (with placeholders instead of kwargs),
+    then only placeholders are replaced for every object.
+    Templates are stored in context, so they are shared by nested and list serializers."""
+
+    def build_url(self, viewname, query_params=None, **kwargs):
+        url = self._get_url_template(viewname, tuple(kwargs))
+        for name, value in kwargs.items():
+            url = url.replace(self._get_placeholder(name), value)
+        if query_params:
+            url += '?' + '&'.join(f'{name}={value}' for name, value in query_params.items())
+        return url
+
+    def _get_url_template(self, viewname, kwargs_names):
+        templates = self.context.setdefault('url_templates', {})
+        if (viewname, kwargs_names) not in templates:
+            templates[(viewname, kwargs_names)] = reverse(
+                viewname,
+                request=self.context.get('request'),
+                kwargs={name: self._get_placeholder(name) for name in kwargs_names},
+            )
+        return templates[(viewname, kwargs_names)]
+
+    @staticmethod
+    def _get_placeholder(name):
+        return f'__{name}__'
 
 
 class AlbumMiniatureMixin:
     def get_miniature_url(self, album):
         if album.miniature is None:
             return
-        miniature_url = album.miniature.original.url
+        miniature_url = album.miniature.thumbnail_url
         request = self.context.get('request')
         return request.build_absolute_uri(miniature_url)
 
 
+class PhotoRenditionsMixin:
+    def get_renditions(self, photo):
+        request = self.context.get('request')
+        renditions = {}
+        for rendition in PHOTO_RENDITIONS:
+            urls = {}
+            for image_format in PHOTO_RENDITIONS_FORMATS:
+                url = photo.get_rendition_url(rendition, image_format)
+                urls[image_format.lower()] = request.build_absolute_uri(url) if url else None
+            renditions[rendition] = urls
+        return renditions
+
+
+class PhotoValidationMixin:
+    """Rules of photo fields, shared by serializers of one photo and of many photos of album.
+    Every check returns error message (or None)."""
+
+    @staticmethod
+    def get_privacy_error(album, is_private):
+        if album.is_private and not is_private:
+            return 'In private album can not be any public photos.'
+
+    @staticmethod
+    def get_date_start_error(album, date_start):
+        if date_start and album.date_start and date_start < album.date_start:
+            return 'This date does not match the album date period.'
+
+    @staticmethod
+    def get_date_end_error(album, date_end):
+        if date_end and album.date_end and date_end > album.date_end:
+            return 'This date does not match the album date period.'
+
+    @staticmethod
+    def get_period_error(date_start, date_end):
+        if date_start and date_end and date_start > date_end:
+            return "The end of the photo period can't be earlier than the beginning"
+
+
 class AlbumsMixin(AlbumMiniatureMixin):
     class Meta:
         model = Albums
@@ -21,6 +21,8 @@ class AlbumProcessingInfoSerializer(serializers.Serializer):
     stage = serializers.IntegerField(read_only=True)
     status = serializers.CharField(read_only=True)
     finished = serializers.CharField(read_only=True)
+    progress = serializers.ReadOnlyField()
+    queue_position = serializers.IntegerField(read_only=True, allow_null=True)
     data = serializers.ReadOnlyField()
 
 
@@ -1,11 +1,15 @@
+from django.db import transaction
+from django.db.models import Prefetch
 from rest_framework import serializers
 from rest_framework.reverse import reverse
 
 from mainapp.utils import get_photos_title
-from photoalbums.settings import ALBUM_PHOTOS_AMOUNT_LIMIT, ALBUMS_AMOUNT_LIMIT
-from recognition.models import People
-from .inner_serializers import PatternsSerializer
-from .mixins import AlbumsMixin, AlbumMiniatureMixin
+from mainapp.supporters import PhotosBulkUpdateSupporter
+from photoalbums.settings import ALBUM_PHOTOS_AMOUNT_LIMIT, ALBUMS_AMOUNT_LIMIT, API_PERSON_FACES_LIMIT, \
+    API_BULK_OBJECTS_LIMIT
+from recognition.models import People, Patterns, Faces
+from .inner_serializers import FaceSerializer
+from .mixins import AlbumsMixin, AlbumMiniatureMixin, PhotoRenditionsMixin, UrlTemplatesMixin, PhotoValidationMixin
 from .fields import MiniatureSlugRelatedField
 from mainapp.models import Photos, Albums
 from ..utils import set_random_album_cover, clear_photo_favorites_and_faces
@@ -34,8 +38,9 @@ class MainPageSerializer(AlbumsMixin, serializers.ModelSerializer):
         )
 
 
-class PhotoDetailSerializer(serializers.ModelSerializer):
+class PhotoDetailSerializer(PhotoValidationMixin, PhotoRenditionsMixin, serializers.ModelSerializer):
     owner_profile = serializers.SerializerMethodField()
+    renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = Photos
@@ -50,9 +55,11 @@ class PhotoDetailSerializer(serializers.ModelSerializer):
             'time_update',
             'is_private',
             'original',
+            'processing_status',
+            'renditions',
             'owner_profile',
         )
-        extra_kwargs = {'original': {'read_only': True}}
+        extra_kwargs = {'original': {'read_only': True}, 'processing_status': {'read_only': True}}
 
     def get_owner_profile(self, photo):
         if self.context['request'].user == photo.album.owner:
@@ -77,38 +84,35 @@ class PhotoDetailSerializer(serializers.ModelSerializer):
 
     def validate_date_start(self, value):
         instance = getattr(self, 'instance')
-        album_date_start = instance.album.date_start
-        if album_date_start and value < album_date_start:
-            message = 'This date does not match the album date period.'
+        message = self.get_date_start_error(instance.album, value)
+        if message:
             raise serializers.ValidationError(message)
         return value
 
     def validate_date_end(self, value):
         instance = getattr(self, 'instance')
-        album_date_end = instance.album.date_end
-        if album_date_end and value > album_date_end:
-            message = 'This date does not match the album date period.'
+        message = self.get_date_end_error(instance.album, value)
+        if message:
             raise serializers.ValidationError(message)
         return value
 
     def validate_is_private(self, privacy):
         instance = getattr(self, 'instance')
-        if instance.album.is_private and not privacy:
-            message = 'In private album can not be any public photos.'
+        message = self.get_privacy_error(instance.album, privacy)
+        if message:
             raise serializers.ValidationError(message)
         return privacy
 
     def validate(self, data):
-        date_start = data.get('date_start')
-        date_end = data.get('date_end')
-        if date_start and date_end and date_start > date_end:
-            message = "The end of the photo period can't be earlier than the beginning"
+        message = self.get_period_error(data.get('date_start'), data.get('date_end'))
+        if message:
             raise serializers.ValidationError(message)
         return super().validate(data)
 
 
-class PhotosListSerializer(serializers.ModelSerializer):
+class PhotosListSerializer(UrlTemplatesMixin, PhotoRenditionsMixin, serializers.ModelSerializer):
     url = serializers.SerializerMethodField()
+    renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = Photos
@@ -119,20 +123,79 @@ class PhotosListSerializer(serializers.ModelSerializer):
             'location',
             'is_private',
             'original',
+            'processing_status',
+            'renditions',
             'url',
         )
-        extra_kwargs = {'original': {'read_only': True}}
+        extra_kwargs = {'original': {'read_only': True}, 'processing_status': {'read_only': True}}
 
     def get_url(self, photo):
-        return reverse(
-            viewname='api_v1:photos-detail',
-            kwargs={'username_slug': photo.album.owner.username_slug,
-                    'album_slug': photo.album.slug,
-                    'photo_slug': photo.slug},
-            request=self.context.get('request')
+        return self.build_url(
+            'api_v1:photos-detail',
+            username_slug=photo.album.owner.username_slug,
+            album_slug=photo.album.slug,
+            photo_slug=photo.slug,
         )
 
 
+class PhotoChangesSerializer(serializers.ModelSerializer):
+    slug = serializers.SlugField()
+
+    class Meta:
+        model = Photos
+        fields = ('slug', 'is_private', 'date_start', 'date_end', 'location')
+
+
+class PhotosBulkUpdateSerializer(PhotoValidationMixin, serializers.Serializer):
+    """Changes of many photos of album (from context), that are validated together and saved by one query."""
+    photos = PhotoChangesSerializer(many=True, allow_empty=False, max_length=API_BULK_OBJECTS_LIMIT)
+
+    def validate(self, data):
+        album = self.context['album']
+        photos_changes = {changes.pop('slug'): changes for changes in data['photos']}
+        if len(photos_changes) != len(data['photos']):
+            raise serializers.ValidationError('Every photo can be changed only once in one request.')
+
+        photos = Photos.objects.filter(album=album, slug__in=photos_changes).in_bulk(field_name='slug')
+        errors = {}
+        for slug, changes in photos_changes.items():
+            photo = photos.get(slug)
+            if photo is None:
+                errors[slug] = ['Photo not found in this album.']
+                continue
+            for field, value in changes.items():
+                setattr(photo, field, value)
+            photo_errors = self._get_photo_errors(photo, album)
+            if photo_errors:
+                errors[slug] = photo_errors
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        fields = set().union(*photos_changes.values())
+        return {'photos': list(photos.values()), 'fields': fields}
+
+    def create(self, validated_data):
+        album = self.context['album']
+        became_private_pks = PhotosBulkUpdateSupporter.update_photos(album, validated_data['photos'],
+                                                                      validated_data['fields'])
+
+        # Changing cover of album, if it became private
+        if album.miniature_id in became_private_pks and not album.is_private:
+            set_random_album_cover(album)
+
+        return validated_data['photos']
+
+    def _get_photo_errors(self, photo, album):
+        errors = (
+            self.get_privacy_error(album, photo.is_private),
+            self.get_date_start_error(album, photo.date_start),
+            self.get_date_end_error(album, photo.date_end),
+            self.get_period_error(photo.date_start, photo.date_end),
+        )
+        # Both dates out of album period give the same message
+        return list(dict.fromkeys(error for error in errors if error))
+
+
 class AlbumsListSerializer(AlbumsMixin, serializers.ModelSerializer):
     photos_amount = serializers.IntegerField(read_only=True)
     miniature_url = serializers.SerializerMethodField()
@@ -163,7 +226,7 @@ class AlbumPostAndDetailSerializer(AlbumsMixin, serializers.ModelSerializer):
     owner = serializers.HiddenField(default=serializers.CurrentUserDefault())
     owner_profile = serializers.SerializerMethodField()
     miniature_url = serializers.SerializerMethodField()
-    photos = PhotosListSerializer(many=True, read_only=True, source='filtered_photos_set')
+    photos_url = serializers.SerializerMethodField()
     uploaded_photos = serializers.ListField(
         child=serializers.ImageField(use_url=False),
         write_only=True, required=False,
@@ -177,7 +240,7 @@ class AlbumPostAndDetailSerializer(AlbumsMixin, serializers.ModelSerializer):
             'miniature',
             'download_url',
             'is_private',
-            'photos',
+            'photos_url',
             'uploaded_photos',
             'owner',
         )
@@ -186,6 +249,14 @@ class AlbumPostAndDetailSerializer(AlbumsMixin, serializers.ModelSerializer):
     def get_download_url(self, album):
         return reverse('download', request=self.context.get('request')) + f'?album={album.slug}'
 
+    def get_photos_url(self, album):
+        return reverse(
+            viewname='api_v1:albums-photos',
+            kwargs={'username_slug': album.owner.username_slug,
+                    'album_slug': album.slug},
+            request=self.context.get('request')
+        )
+
     def create(self, validated_data):
         self.validate_albums_amount(owner=validated_data["owner"])
         uploaded_images = self._pop_uploaded_images(validated_data)
@@ -237,6 +308,7 @@ class AlbumPostAndDetailSerializer(AlbumsMixin, serializers.ModelSerializer):
                     is_private=instance.is_private,
                     album=instance,
                     original=image,
+                    processing_status=Photos.PROCESSING_UPLOADED,
                 )
 
     def validate_uploaded_photos(self, value):
@@ -296,27 +368,33 @@ class AlbumPostAndDetailSerializer(AlbumsMixin, serializers.ModelSerializer):
         album.save()
 
 
-class PeopleListSerializer(serializers.HyperlinkedModelSerializer):
+class PeopleListSerializer(UrlTemplatesMixin, serializers.ModelSerializer):
     picture_url = serializers.SerializerMethodField()
+    url = serializers.SerializerMethodField()
 
     class Meta:
         model = People
         fields = ('name', 'picture_url', 'url')
-        extra_kwargs = {
-            'url': {'view_name': 'api_v1:people-detail', 'lookup_field': 'slug', 'lookup_url_kwarg': 'person_slug'}
-        }
+
+    @staticmethod
+    def setup_queryset(queryset):
+        return queryset.select_related('cover_face').only('name', 'slug', 'cover_face__slug')
 
     def get_picture_url(self, person):
-        return reverse('api_v1:face-img', request=self.context.get('request'))\
-            + f"?face={person.patterns_set.first().faces_set.first().slug}"
+        return self.build_url('api_v1:face-img', query_params={'face': person.cover_face.slug})
+
+    def get_url(self, person):
+        return self.build_url('api_v1:people-detail', person_slug=person.slug)
 
 
-class PersonSerializer(serializers.ModelSerializer):
-    patterns = PatternsSerializer(many=True, read_only=True, source='patterns_set')
+class PersonSerializer(UrlTemplatesMixin, serializers.ModelSerializer):
     patterns_amount = serializers.IntegerField(read_only=True)
+    faces_amount = serializers.IntegerField(read_only=True)
     photos_amount = serializers.IntegerField(read_only=True)
     albums_amount = serializers.IntegerField(read_only=True)
     search_url = serializers.SerializerMethodField()
+    faces = serializers.SerializerMethodField()
+    faces_url = serializers.SerializerMethodField()
 
     class Meta:
         model = People
@@ -324,14 +402,26 @@ class PersonSerializer(serializers.ModelSerializer):
             'name',
             'slug',
             'patterns_amount',
+            'faces_amount',
             'photos_amount',
             'albums_amount',
             'search_url',
-            'patterns',
+            'faces',
+            'faces_url',
         )
 
     def get_search_url(self, person):
-        return reverse('api_v1:people-search', request=self.context['request']) + f"?person={person.slug}"
+        return self.build_url('api_v1:people-search', query_params={'person': person.slug})
+
+    def get_faces(self, person):
+        """First faces of person, the rest can be received from faces_url."""
+        faces = FaceSerializer.setup_queryset(
+            Faces.objects.filter(pattern__person=person).order_by('pk'),
+        )[:API_PERSON_FACES_LIMIT]
+        return FaceSerializer(faces, many=True, context=self.context).data
+
+    def get_faces_url(self, person):
+        return self.build_url('api_v1:people-faces', person_slug=person.slug)
 
 
 class RecognitionAlbumsSerializer(AlbumMiniatureMixin, serializers.ModelSerializer):
@@ -355,9 +445,8 @@ class RecognitionAlbumsSerializer(AlbumMiniatureMixin, serializers.ModelSerializ
                        kwargs={'album_slug': album.slug})
 
 
-class FoundedPeopleSerializer(serializers.ModelSerializer):
-    url = serializers.HyperlinkedIdentityField(view_name='api_v1:people-detail', lookup_field='slug',
-                                               lookup_url_kwarg='person_slug')
+class FoundedPeopleSerializer(UrlTemplatesMixin, serializers.ModelSerializer):
+    url = serializers.SerializerMethodField()
     face_image = serializers.SerializerMethodField()
     patterns_images = serializers.SerializerMethodField()
     photos_amount = serializers.IntegerField()
@@ -374,15 +463,77 @@ class FoundedPeopleSerializer(serializers.ModelSerializer):
             'albums_amount',
         )
 
+    @staticmethod
+    def setup_queryset(queryset):
+        """People queryset with cover faces and only central faces of patterns prefetched."""
+        return queryset.select_related('cover_face').only(
+            'name', 'slug', 'photos_amount', 'albums_amount', 'cover_face__slug',
+        ).prefetch_related(Prefetch(
+            'patterns_set',
+            queryset=Patterns.objects.select_related('central_face').only('person', 'central_face__slug'),
+        ))
+
+    def get_url(self, person):
+        return self.build_url('api_v1:people-detail', person_slug=person.slug)
+
     def get_face_image(self, person):
-        return reverse('api_v1:face-img', request=self.context['request']) + \
-            f'?face={person.patterns_set.first().faces_set.first().slug}'
+        return self.build_url('api_v1:face-img', query_params={'face': person.cover_face.slug})
 
     def get_patterns_images(self, person):
         patterns = person.patterns_set.all()[1:5]
-        image_urls = list(map(lambda p: reverse('api_v1:face-img',
-                                                request=self.context['request']) + p.faces_set.first().slug, patterns))
-        return image_urls
+        return [self.build_url('api_v1:face-img', query_params={'face': p.central_face.slug}) for p in patterns]
+
+
+class FavoritesBulkSerializer(serializers.Serializer):
+    """Adding and removing of many favorites of user by one request. If any of added objects
+    is not someone else's public one, nothing is changed."""
+    add = serializers.ListField(child=serializers.SlugField(), required=False, max_length=API_BULK_OBJECTS_LIMIT)
+    remove = serializers.ListField(child=serializers.SlugField(), required=False, max_length=API_BULK_OBJECTS_LIMIT)
+    model = None
+    favorites_related_name = None
+
+    def get_available_queryset(self, user):
+        raise NotImplementedError
+
+    def validate_add(self, slugs):
+        user = self.context['request'].user
+        found = dict(self.get_available_queryset(user).filter(slug__in=slugs).values_list('slug', 'pk'))
+        not_found = [slug for slug in slugs if slug not in found]
+        if not_found:
+            raise serializers.ValidationError(f"Can't be added to favorites (not found or yours): {not_found}")
+        return list(found.values())
+
+    def validate_remove(self, slugs):
+        user = self.context['request'].user
+        return list(self.model.objects.filter(slug__in=slugs, in_users_favorites=user).values_list('pk', flat=True))
+
+    def validate(self, data):
+        if not data.get('add') and not data.get('remove'):
+            raise serializers.ValidationError('Nothing to add or remove was specified.')
+        return data
+
+    def create(self, validated_data):
+        favorites = getattr(self.context['request'].user, self.favorites_related_name)
+        with transaction.atomic():
+            favorites.add(*validated_data.get('add', []))
+            favorites.remove(*validated_data.get('remove', []))
+        return validated_data
+
+
+class FavoritesAlbumsBulkSerializer(FavoritesBulkSerializer):
+    model = Albums
+    favorites_related_name = 'albums_in_users_favorites'
+
+    def get_available_queryset(self, user):
+        return Albums.objects.filter(is_private=False).exclude(owner=user)
+
+
+class FavoritesPhotosBulkSerializer(FavoritesBulkSerializer):
+    model = Photos
+    favorites_related_name = 'photos_in_users_favorites'
+
+    def get_available_queryset(self, user):
+        return Photos.objects.filter(is_private=False).exclude(album__owner=user)
 
 
 class SearchStartOverSerializer(serializers.Serializer):
@@ -0,0 +1,117 @@
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+
+from mainapp.models import Albums, Photos
+from mainapp.tests.performance import PerformanceTestCase
+from recognition.models import People
+from recognition.redis_interface.functional_api import RedisAPISearchSetter
+from recognition.utils import recount_people_amounts
+
+
+class TestAPIViewsPerformance(PerformanceTestCase):
+    def test_main_page(self):
+        self.assertWithinBudget(reverse('api_v1:main'), queries=4)
+
+    def test_albums_list(self):
+        self.assertWithinBudget(reverse('api_v1:albums-list',
+                                        kwargs={'username_slug': self.user.username_slug}), queries=3)
+
+    def test_album(self):
+        self.assertWithinBudget(reverse('api_v1:albums-detail', kwargs={
+            'username_slug': self.user.username_slug,
+            'album_slug': self.album.slug,
+        }), queries=3)
+
+    def test_album_photos(self):
+        self.assertWithinBudget(reverse('api_v1:albums-photos', kwargs={
+            'username_slug': self.user.username_slug,
+            'album_slug': self.album.slug,
+        }), queries=4)
+
+    def test_photo(self):
+        self.assertWithinBudget(reverse('api_v1:photos-detail', kwargs={
+            'username_slug': self.user.username_slug,
+            'album_slug': self.album.slug,
+            'photo_slug': self.photo.slug,
+        }), queries=6)
+
+    def test_favorites_albums(self):
+        self.assertWithinBudget(reverse('api_v1:favorites-albums-list'), queries=4)
+
+    def test_favorites_photos(self):
+        self.assertWithinBudget(reverse('api_v1:favorites-photos-list'), queries=4)
+
+    def test_favorites_albums_queries_not_depend_on_albums_amount(self):
+        self.assertQueriesNotDependOnAmount(reverse('api_v1:favorites-albums-list'),
+                                            Albums.in_users_favorites.through.objects.filter(user=self.user))
+
+    def test_favorites_photos_queries_not_depend_on_photos_amount(self):
+        self.assertQueriesNotDependOnAmount(reverse('api_v1:favorites-photos-list'),
+                                            Photos.in_users_favorites.through.objects.filter(user=self.user))
+
+    def test_people_list(self):
+        self.assertWithinBudget(reverse('api_v1:people-list'), queries=4)
+
+    def test_person(self):
+        self.assertWithinBudget(reverse('api_v1:people-detail', kwargs={'person_slug': self.person.slug}), queries=5)
+
+    def test_person_faces(self):
+        self.assertWithinBudget(reverse('api_v1:people-faces', kwargs={'person_slug': self.person.slug}), queries=5)
+
+    def test_people_search(self):
+        RedisAPISearchSetter.prepare_to_search(self.person.pk)
+        RedisAPISearchSetter.set_founded_similar_people(
+            self.person.pk, list(People.objects.exclude(owner=self.user).values_list('pk', flat=True)))
+        self.assertWithinBudget(reverse('api_v1:people-search'), {'person': self.person.slug}, queries=7)
+        RedisAPISearchSetter.prepare_to_search(self.person.pk)
+
+    def test_albums_list_not_modified(self):
+        url = reverse('api_v1:albums-list', kwargs={'username_slug': self.user.username_slug})
+        etag = self.assertNotModified(url, queries=3)
+
+        self.album.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_change_in_the_same_second_is_not_answered_by_not_modified(self):
+        url = reverse('api_v1:albums-list', kwargs={'username_slug': self.user.username_slug})
+        self.assertNotIn('Last-Modified', self.client.get(url))
+
+        self.album.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time())).status_code, 200)
+
+    def test_photo_not_modified(self):
+        url = reverse('api_v1:photos-detail', kwargs={
+            'username_slug': self.user.username_slug,
+            'album_slug': self.album.slug,
+            'photo_slug': self.photo.slug,
+        })
+        etag = self.assertNotModified(url, queries=3)
+
+        self.photo.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_person_not_modified(self):
+        url = reverse('api_v1:people-detail', kwargs={'person_slug': self.person.slug})
+        etag = self.assertNotModified(url, queries=3)
+
+        recount_people_amounts(People.objects.filter(pk=self.person.pk))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_album_photos_bulk_update(self):
+        url = reverse('api_v1:albums-photos', kwargs={
+            'username_slug': self.user.username_slug,
+            'album_slug': self.album.slug,
+        })
+        slugs = self.album.photos_set.values_list('slug', flat=True)
+        data = {'photos': [{'slug': slug, 'location': 'Home', 'is_private': False} for slug in slugs]}
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, data, content_type='application/json')
+
+        self.assertEqual(response.status_code, 204)
+        self.assertLessEqual(len(queries), 8,
+                             msg='\n'.join(query['sql'] for query in queries.captured_queries))
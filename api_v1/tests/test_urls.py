@@ -4,7 +4,7 @@ from django.urls import reverse, resolve
 from api_v1.auth_views import ActivateUserAPIView, PasswordResetFormView
 from api_v1.views import AnotherUserDetailAPIView, MainPageAPIView, PhotoAPIView, RecognitionAlbumsListAPIView, \
     AlbumProcessingAPIView, SearchPersonAPIView, return_face_image_view, return_photo_with_framed_faces, PeopleViewSet, \
-    FavoritesPhotosViewSet, FavoritesAlbumsViewSet, AlbumsViewSet
+    FavoritesPhotosViewSet, FavoritesAlbumsViewSet, AlbumsViewSet, AlbumPhotosListAPIView, PersonFacesListAPIView
 
 
 class TestUrls(SimpleTestCase):
@@ -59,6 +59,11 @@ class TestUrls(SimpleTestCase):
                                                       'album_slug': 'some-album-slug'})
         self.assertEqual(resolve(url).func.cls, AlbumsViewSet)
 
+    def test_albums_photos_url_resolves(self):
+        url = reverse('api_v1:albums-photos', kwargs={'username_slug': 'some-username',
+                                                      'album_slug': 'some-album-slug'})
+        self.assertEqual(resolve(url).func.view_class, AlbumPhotosListAPIView)
+
     def test_favorites_albums_list_url_resolves(self):
         url = reverse('api_v1:favorites-albums-list')
         self.assertEqual(resolve(url).func.cls, FavoritesAlbumsViewSet)
@@ -82,3 +87,7 @@ class TestUrls(SimpleTestCase):
     def test_people_detail_url_resolves(self):
         url = reverse('api_v1:people-detail', kwargs={'person_slug': 'some-person-slug'})
         self.assertEqual(resolve(url).func.cls, PeopleViewSet)
+
+    def test_people_faces_url_resolves(self):
+        url = reverse('api_v1:people-faces', kwargs={'person_slug': 'some-person-slug'})
+        self.assertEqual(resolve(url).func.view_class, PersonFacesListAPIView)
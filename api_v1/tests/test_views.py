@@ -0,0 +1,173 @@
+from django.test import AsyncClient
+from django.urls import reverse
+
+from mainapp.models import Albums, Photos
+from mainapp.tests.performance import PerformanceTestCase
+from recognition.models import Faces, Patterns
+from recognition.redis_interface.functional_api import RedisAPIStage, RedisAPIStatus, RedisAPIProgress, \
+    RedisAPISearchSetter, RedisAPITaskLock
+from recognition.tasks import lock_recognition_task
+
+
+class TestBulkViews(PerformanceTestCase):
+    users_amount = 2
+    albums_per_user = 2
+    photos_per_album = 4
+
+    def test_bulk_photos_update(self):
+        url = reverse('api_v1:albums-photos', kwargs={'username_slug': self.user.username_slug,
+                                                      'album_slug': self.album.slug})
+        photos = list(self.album.photos_set.all())
+        self.assertTrue(Faces.objects.filter(photo__album=self.album).exists())
+
+        response = self.client.patch(url, {'photos': [{'slug': photo.slug, 'is_private': True, 'location': 'Home'}
+                                                      for photo in photos]}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Photos.objects.filter(album=self.album, is_private=False).exists())
+        self.assertEqual(Photos.objects.filter(album=self.album, location='Home').count(), len(photos))
+        self.assertFalse(Faces.objects.filter(photo__album=self.album).exists())
+        self.assertFalse(Photos.in_users_favorites.through.objects.filter(photos__album=self.album).exists())
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.public_photos_amount, 0)
+
+    def test_bulk_photos_update_is_validated_together(self):
+        url = reverse('api_v1:albums-photos', kwargs={'username_slug': self.user.username_slug,
+                                                      'album_slug': self.album.slug})
+        photo = self.album.photos_set.first()
+
+        response = self.client.patch(url, {'photos': [{'slug': photo.slug, 'location': 'Home'},
+                                                      {'slug': 'not-existing-photo', 'location': 'Home'}]},
+                                     content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('not-existing-photo', response.data)
+        self.assertFalse(Photos.objects.filter(location='Home').exists())
+
+    def test_bulk_photos_update_by_not_owner(self):
+        another_album = Albums.objects.exclude(owner=self.user).first()
+        url = reverse('api_v1:albums-photos', kwargs={'username_slug': another_album.owner.username_slug,
+                                                      'album_slug': another_album.slug})
+        photo = another_album.photos_set.first()
+
+        response = self.client.patch(url, {'photos': [{'slug': photo.slug, 'location': 'Home'}]},
+                                     content_type='application/json')
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_bulk_favorites_albums(self):
+        url = reverse('api_v1:favorites-albums-list')
+        favorites = list(self.user.albums_in_users_favorites.values_list('slug', flat=True))
+
+        response = self.client.patch(url, {'remove': favorites}, content_type='application/json')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(self.user.albums_in_users_favorites.exists())
+
+        response = self.client.patch(url, {'add': favorites}, content_type='application/json')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.user.albums_in_users_favorites.count(), len(favorites))
+
+    def test_bulk_favorites_photos_can_not_add_own(self):
+        url = reverse('api_v1:favorites-photos-list')
+        favorites_amount = self.user.photos_in_users_favorites.count()
+        other_photo = Photos.objects.exclude(album__owner=self.user).first()
+        self.user.photos_in_users_favorites.remove(other_photo)
+
+        response = self.client.patch(url, {'add': [other_photo.slug, self.photo.slug]},
+                                     content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.user.photos_in_users_favorites.count(), favorites_amount - 1)
+
+
+class TestAsyncStatusViews(PerformanceTestCase):
+    users_amount = 2
+    albums_per_user = 1
+    photos_per_album = 2
+
+    def setUp(self):
+        super().setUp()
+        self.async_client.force_login(self.user)
+
+    async def test_album_processing_status(self):
+        RedisAPIStage.set_stage(self.album.pk, 1)
+        RedisAPIStatus.set_status(self.album.pk, "processing")
+        RedisAPIProgress.set_progress(f"album_{self.album.pk}", stage=1, done=1, total=2, started_at=0)
+
+        response = await self.async_client.get(
+            reverse('api_v1:recognition-processing-status', kwargs={'album_slug': self.album.slug}))
+
+        self.assertEqual(response.status_code, 200)
+        state = response.json()
+        self.assertEqual((state['stage'], state['status'], state['finished']), (1, "processing", False))
+        self.assertEqual((state['progress']['done'], state['progress']['total']), (1, 2))
+
+    async def test_album_processing_status_of_another_user(self):
+        album = await Albums.objects.exclude(owner__pk=self.user.pk).afirst()
+        url = reverse('api_v1:recognition-processing-status', kwargs={'album_slug': album.slug})
+
+        self.assertEqual((await self.async_client.get(url)).status_code, 404)
+        self.assertEqual((await AsyncClient().get(url)).status_code, 401)
+
+    async def test_search_status(self):
+        RedisAPISearchSetter.prepare_to_search(self.person.pk)
+        RedisAPISearchSetter.set_person_searching(self.person.pk)
+        RedisAPISearchSetter.encrease_patterns_search_amount(self.person.pk)
+
+        response = await self.async_client.get(reverse('api_v1:people-search-status'), {'person': self.person.slug})
+
+        self.assertEqual(response.status_code, 200)
+        state = response.json()
+        self.assertTrue(state['searching_now'])
+        self.assertEqual(state['processed_patterns_amount'], 1)
+        self.assertEqual(state['total_patterns_amount'],
+                         await Patterns.objects.filter(person__pk=self.person.pk).acount())
+
+
+class TestRepeatedLaunches(PerformanceTestCase):
+    users_amount = 1
+    albums_per_user = 1
+    photos_per_album = 2
+
+    def tearDown(self):
+        RedisAPITaskLock.release(f'person_{self.person.pk}', 0)
+
+    def test_repeated_search_launch_returns_status(self):
+        self.assertTrue(lock_recognition_task(self.person.pk, 0))
+        RedisAPISearchSetter.prepare_to_search(self.person.pk)
+        url = reverse('api_v1:people-search')
+
+        response = self.client.get(url, {'person': self.person.slug})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['searching_now'])
+        self.assertEqual(self.client.post(url, {'person': self.person.slug, 'start': True}).data,
+                         {'error': 'Search is running now'})
+
+
+class TestPersonFacesView(PerformanceTestCase):
+    users_amount = 2
+    albums_per_user = 1
+    photos_per_album = 2
+
+    def setUp(self):
+        super().setUp()
+        self.person = Faces.objects.filter(photo__album__owner=self.user).first().pattern.person
+
+    def test_faces_of_another_user_person_as_its_details(self):
+        self.client.force_login(self.users[1])
+        url = reverse('api_v1:people-faces', kwargs={'person_slug': self.person.slug})
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), Faces.objects.filter(pattern__person=self.person).count())
+        self.assertEqual(self.client.get(reverse('api_v1:people-detail',
+                                                 kwargs={'person_slug': self.person.slug})).status_code, 200)
+
+    def test_faces_of_person_for_anonymous(self):
+        self.client.logout()
+
+        response = self.client.get(reverse('api_v1:people-faces', kwargs={'person_slug': self.person.slug}))
+
+        self.assertEqual(response.status_code, 401)
@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import SimpleRouter
 
+from .async_views import album_processing_status_view, search_status_view
 from .auth_views import ActivateUserAPIView, PasswordResetFormView
 from .routers import FavoritesRouter, PeopleRouter
-from .views import MainPageAPIView, AlbumsViewSet, AnotherUserDetailAPIView, PhotoAPIView, FavoritesAlbumsViewSet, \
-    FavoritesPhotosViewSet, PeopleViewSet, return_face_image_view, return_photo_with_framed_faces, \
-    RecognitionAlbumsListAPIView, AlbumProcessingAPIView, SearchPersonAPIView
+from .views import MainPageAPIView, AlbumsViewSet, AlbumPhotosListAPIView, AnotherUserDetailAPIView, PhotoAPIView, \
+    FavoritesAlbumsViewSet, FavoritesPhotosViewSet, PeopleViewSet, PersonFacesListAPIView, return_face_image_view, \
+    return_photo_with_framed_faces, RecognitionAlbumsListAPIView, AlbumProcessingAPIView, SearchPersonAPIView
 
 app_name = 'api_v1'
 
@@ -28,13 +29,19 @@ urlpatterns = [
     path('auth/password/reset/<uid>/<token>', PasswordResetFormView.as_view(), name='password_reset_proxy'),
     path('main/', MainPageAPIView.as_view(), name='main'),
     path('users/<slug:username_slug>/', include(albums_router.urls)),
+    path('users/<slug:username_slug>/albums/<slug:album_slug>/photos/', AlbumPhotosListAPIView.as_view(),
+         name='albums-photos'),
     path('users/<slug:username_slug>/albums/<slug:album_slug>/photos/<slug:photo_slug>/',
          PhotoAPIView.as_view(), name='photos-detail'),
     path('favorites/', include(favorites_router.urls)),
     path('recognition/', include(recognition_router.urls)),
+    path('recognition/people/<slug:person_slug>/faces/', PersonFacesListAPIView.as_view(), name='people-faces'),
     path('recognition/albums/', RecognitionAlbumsListAPIView.as_view(), name='recognition-albums'),
     path('recognition/processing/<slug:album_slug>/', AlbumProcessingAPIView.as_view(), name='recognition-processing'),
+    path('recognition/processing/<slug:album_slug>/status/', album_processing_status_view,
+         name='recognition-processing-status'),
     path('recognition/search/', SearchPersonAPIView.as_view(), name='people-search'),
+    path('recognition/search/status/', search_status_view, name='people-search-status'),
     path('face-img/', return_face_image_view, name='face-img'),
     path('photo-with-frames/', return_photo_with_framed_faces, name='photo-with-frames'),
 ]
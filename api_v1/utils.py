@@ -1,3 +1,6 @@
+from recognition.supporters import FacesDeletionSupporter
+
+
 def set_random_album_cover(album):
     if album.is_private:
         cover = album.photos_set.order_by('?').first()
@@ -11,8 +14,7 @@ def set_random_album_cover(album):
 def clear_photo_favorites_and_faces(photo, commit=True):
     photo.in_users_favorites.clear()
     if photo.faces_extracted:
-        for face in photo.faces_set.all():
-            face.delete()
+        FacesDeletionSupporter.delete_faces(photo.faces_set.all())
         photo.faces_extracted = False
 
     if commit:
@@ -1,10 +1,6 @@
-import os
-
-from PIL import Image, ImageDraw, ImageFont
-from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Count, Prefetch, Q
-from django.http import HttpResponse
+from django.db.models import Count, F, Q
+from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.exceptions import ValidationError
@@ -16,23 +12,29 @@ from rest_framework.viewsets import ModelViewSet
 
 from accounts.models import User
 from mainapp.utils import delete_from_favorites
-from photoalbums.settings import BASE_DIR
 from recognition.models import People, Faces
-from recognition.tasks import recognition_task
+from recognition.tasks import schedule_recognition_task, lock_recognition_task
+from recognition.utils import get_face_thumbnail_response, get_framed_photo_response, get_people_version
 from recognition.redis_interface.functional_api import RedisAPIPhotoDataGetter, RedisAPISearchGetter, \
-    RedisAPISearchChecker, RedisAPISearchSetter
+    RedisAPISearchChecker, RedisAPISearchSetter, RedisAPIProgress, RedisAPITasksQueue
 from .data_collectors import RecognitionStateCollector
+from .mixin_views import ConditionalGetMixin, OwnerAlbumsConditionalGetMixin, PersonConditionalGetMixin, \
+    FavoritesBulkUpdateMixin
 from .managers import StartProcessingManager, VerifyFramesManager, VerifyPatternsManager, GroupPatternsManager, \
     VerifyTechPeopleMatchesManager, ManualMatchingPeopleManager
+from .paginations import AlbumsCursorPagination, PhotosCursorPagination, FacesCursorPagination
 from .permissions import AlbumsPermission, PhotosPermission, IsOwner
 from .serializers.auth_serializers import AnotherUserSerializer
+from .serializers.inner_serializers import FaceSerializer
 from .serializers.rec_processing_serializers import AlbumProcessingInfoSerializer, StartAlbumProcessingSerializer, \
     VerifyFramesSerializer, VerifyPatternsSerializer, GroupPatternsSerializer, VerifyTechPeopleMatchesSerializer, \
     ManualMatchingPeopleSerializer
 from .serializers.serializers import MainPageSerializer, AlbumsListSerializer, AlbumPostAndDetailSerializer, \
     PhotoDetailSerializer, PhotosListSerializer, PeopleListSerializer, PersonSerializer, RecognitionAlbumsSerializer, \
-    FoundedPeopleSerializer, SearchStartOverSerializer
+    FoundedPeopleSerializer, SearchStartOverSerializer, PhotosBulkUpdateSerializer, FavoritesAlbumsBulkSerializer, \
+    FavoritesPhotosBulkSerializer
 from mainapp.models import Albums, Photos
+from mainapp.supporters import PhotosDeletionSupporter, MainFeedSupporter, AlbumCloneSupporter
 from mainapp.tasks import album_deletion_task
 from .utils import set_random_album_cover
 
@@ -43,41 +45,37 @@ class AnotherUserDetailAPIView(RetrieveAPIView):
     lookup_field = 'username_slug'
 
 
-class MainPageAPIView(ListAPIView):
+class MainPageAPIView(ConditionalGetMixin, ListAPIView):
     serializer_class = MainPageSerializer
 
     def get_queryset(self):
-        return Albums.objects.filter(
-            is_private=False,
-            photos__isnull=False,
-        ).annotate(
-            photos_amount=Count('photos'),
-        ).order_by(
-            '-time_create',
-        )[:16]
+        return MainFeedSupporter.get_albums(self.get_feed())
+
+    def get_version(self):
+        return self.get_feed()['version']
+
+    def get_feed(self):
+        """Feed is read from cache once per request, so version and albums are always of the same feed."""
+        if not hasattr(self, '_feed'):
+            self._feed = MainFeedSupporter.get_feed()
+        return self._feed
 
 
-class AlbumsViewSet(ModelViewSet):
+class AlbumsViewSet(OwnerAlbumsConditionalGetMixin, ModelViewSet):
     permission_classes = (AlbumsPermission,)
+    pagination_class = AlbumsCursorPagination
     lookup_field = 'slug'
     lookup_url_kwarg = 'album_slug'
 
     def get_queryset(self):
+        queryset = Albums.objects.filter(
+            owner__username_slug=self.kwargs.get('username_slug'),
+        ).select_related('owner', 'miniature')
+
         if self.request.user.is_authenticated and self.request.user.username_slug == self.kwargs.get('username_slug'):
-            return Albums.objects.filter(owner__username_slug=self.kwargs.get('username_slug')).annotate(
-                photos_amount=Count('photos'),
-            ).prefetch_related(
-                Prefetch('photos_set', to_attr='filtered_photos_set')
-            )
+            return queryset.annotate(photos_amount=Count('photos'))
         else:
-            return Albums.objects.filter(
-                owner__username_slug=self.kwargs.get('username_slug'),
-                is_private=False,
-            ).annotate(
-                photos_amount=Count('photos'),
-            ).prefetch_related(
-                Prefetch('photos_set', queryset=Photos.objects.filter(is_private=False), to_attr='filtered_photos_set'),
-            )
+            return queryset.filter(is_private=False).annotate(photos_amount=F('public_photos_amount'))
 
     def get_serializer_class(self):
         if self.detail or self.request.method == 'POST':
@@ -89,7 +87,34 @@ class AlbumsViewSet(ModelViewSet):
         album_deletion_task.delay(instance.pk)
 
 
-class PhotoAPIView(RetrieveUpdateDestroyAPIView):
+class AlbumPhotosListAPIView(OwnerAlbumsConditionalGetMixin, ListAPIView):
+    serializer_class = PhotosListSerializer
+    pagination_class = PhotosCursorPagination
+    permission_classes = (AlbumsPermission,)
+
+    def get_queryset(self):
+        is_owner = self.request.user.is_authenticated and \
+                   self.request.user.username_slug == self.kwargs.get('username_slug')
+        albums = Albums.objects.filter(owner__username_slug=self.kwargs.get('username_slug'))
+        if not is_owner:
+            albums = albums.filter(is_private=False)
+        album = get_object_or_404(albums, slug=self.kwargs.get('album_slug'))
+
+        photos = Photos.objects.filter(album=album).select_related('album__owner')
+        if not is_owner:
+            photos = photos.filter(is_private=False)
+        return photos
+
+    def patch(self, request, *args, **kwargs):
+        """Changing privacy, dates and location of many photos of album by one request."""
+        album = get_object_or_404(Albums, owner=request.user, slug=self.kwargs.get('album_slug'))
+        serializer = PhotosBulkUpdateSerializer(data=request.data, context={'request': request, 'album': album})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class PhotoAPIView(OwnerAlbumsConditionalGetMixin, RetrieveUpdateDestroyAPIView):
     permission_classes = (PhotosPermission,)
     serializer_class = PhotoDetailSerializer
     lookup_field = 'slug'
@@ -107,19 +132,20 @@ class PhotoAPIView(RetrieveUpdateDestroyAPIView):
     def perform_destroy(self, instance):
         album = instance.album
         need_cover = album.miniature == instance
-        super().perform_destroy(instance)
+        PhotosDeletionSupporter.delete_photos(Photos.objects.filter(pk=instance.pk))
         if need_cover:
             set_random_album_cover(album)
 
 
-class FavoritesAlbumsViewSet(ModelViewSet):
+class FavoritesAlbumsViewSet(FavoritesBulkUpdateMixin, ModelViewSet):
     lookup_field = 'slug'
     lookup_url_kwarg = 'album_slug'
     serializer_class = AlbumsListSerializer
+    bulk_serializer_class = FavoritesAlbumsBulkSerializer
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
-        return Albums.objects.filter(in_users_favorites=self.request.user)
+        return Albums.objects.filter(in_users_favorites=self.request.user).select_related('miniature', 'owner')
 
     def create(self, request, *args, **kwargs):
         album_slug = request.data.get('album_slug')
@@ -160,23 +186,7 @@ class FavoritesAlbumsViewSet(ModelViewSet):
             return Response({"error": "Album is not in your favorites."})
 
         delete_from_favorites(request.user, album)
-
-        album.pk, album.id = None, None
-        album._state.adding = True
-        album.owner = request.user
-        album.miniature = None
-        album.save()
-
-        for photo in Photos.objects.filter(album__slug=album_slug, is_private=False):
-            photo.pk, photo.id = None, None
-            photo.faces_extracted = False
-            photo._state.adding = True
-            photo.album = album
-            photo.save()
-
-        album.miniature = Photos.objects.get(original=Albums.objects.get(slug=album_slug).miniature.original,
-                                             album=album)
-        album.save()
+        AlbumCloneSupporter.clone_album(album, owner=request.user)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -184,14 +194,15 @@ class FavoritesAlbumsViewSet(ModelViewSet):
         delete_from_favorites(self.request.user, instance)
 
 
-class FavoritesPhotosViewSet(ModelViewSet):
+class FavoritesPhotosViewSet(FavoritesBulkUpdateMixin, ModelViewSet):
     lookup_field = 'slug'
     lookup_url_kwarg = 'photo_slug'
     serializer_class = PhotosListSerializer
+    bulk_serializer_class = FavoritesPhotosBulkSerializer
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
-        return Photos.objects.filter(in_users_favorites=self.request.user)
+        return Photos.objects.filter(in_users_favorites=self.request.user).select_related('album__owner')
 
     def create(self, request, *args, **kwargs):
         photo_slug = request.data.get('photo_slug')
@@ -265,7 +276,7 @@ class FavoritesPhotosViewSet(ModelViewSet):
         delete_from_favorites(self.request.user, instance)
 
 
-class PeopleViewSet(ModelViewSet):
+class PeopleViewSet(PersonConditionalGetMixin, ModelViewSet):
     lookup_field = 'slug'
     lookup_url_kwarg = 'person_slug'
     permission_classes = (IsAuthenticated,)
@@ -273,12 +284,10 @@ class PeopleViewSet(ModelViewSet):
     def get_queryset(self):
         if self.detail:
             return People.objects.all().annotate(
-                patterns_amount=Count('patterns', distinct=True),
-                photos_amount=Count('patterns__faces__photo', distinct=True),
-                albums_amount=Count('patterns__faces__photo__album', distinct=True),
+                patterns_amount=Count('patterns'),
             )
         else:
-            return People.objects.filter(owner=self.request.user)
+            return PeopleListSerializer.setup_queryset(People.objects.filter(owner=self.request.user))
 
     def get_serializer_class(self):
         if self.detail:
@@ -286,17 +295,31 @@ class PeopleViewSet(ModelViewSet):
         else:
             return PeopleListSerializer
 
+    def get_version(self):
+        if self.detail:
+            return super().get_version()
+        else:
+            return get_people_version(self.request.user.pk)
+
+
+class PersonFacesListAPIView(PersonConditionalGetMixin, ListAPIView):
+    """Faces of person for any authenticated user, as details of person (with its first faces), that are
+    opened from search results of other users. Faces are only on public photos."""
+    serializer_class = FaceSerializer
+    pagination_class = FacesCursorPagination
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        person = get_object_or_404(People, slug=self.kwargs.get('person_slug'))
+        return FaceSerializer.setup_queryset(Faces.objects.filter(pattern__person=person))
+
 
 class RecognitionAlbumsListAPIView(ListAPIView):
     serializer_class = RecognitionAlbumsSerializer
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
-        return Albums.objects.filter(owner=self.request.user).annotate(
-            processed_photos_amount=Count('photos', filter=(Q(photos__is_private=False) &
-                                                            Q(photos__faces_extracted=True))),
-            public_photos_amount=Count('photos', filter=Q(photos__is_private=False)),
-        )
+        return Albums.objects.filter(owner=self.request.user)
 
 
 @api_view(['GET'])
@@ -314,17 +337,7 @@ def return_face_image_view(request):
     if face.photo.is_private:
         return Response({"error": "Face not found."})
 
-    response = cache.get(face_slug)
-    if response:
-        return response
-
-    photo_img = Image.open(os.path.join(BASE_DIR, face.photo.original.url[1:]))
-    top, right, bottom, left = face.loc_top, face.loc_right, face.loc_bot, face.loc_left
-    face_img = photo_img.crop((left, top, right, bottom))
-    response = HttpResponse(content_type='image/jpg')
-    face_img.save(response, "JPEG")
-    cache.set(face_slug, response, 60 * 5)
-    return response
+    return get_face_thumbnail_response(request, face)
 
 
 @api_view(['GET'])
@@ -348,20 +361,7 @@ def return_photo_with_framed_faces(request):
     # Loading faces locations from redis
     faces_locations = RedisAPIPhotoDataGetter.get_face_locations_in_photo(photo.pk)
 
-    # Drawing
-    image = Image.open(os.path.join(BASE_DIR, photo.original.url[1:]))
-    draw = ImageDraw.Draw(image)
-    for i, location in enumerate(faces_locations, 1):
-        top, right, bottom, left = location
-        draw.rectangle(((left, top), (right, bottom)), outline=(0, 255, 0), width=4)
-        fontsize = (bottom - top) // 3
-        font = ImageFont.truetype("arialbd.ttf", fontsize)
-        draw.text((left, top), str(i), fill=(255, 0, 0), font=font)
-    del draw
-
-    response = HttpResponse(content_type='image/jpg')
-    image.save(response, "JPEG")
-    return response
+    return get_framed_photo_response(request, photo, faces_locations)
 
 
 class AlbumProcessingAPIView(APIView):
@@ -417,6 +417,10 @@ class AlbumProcessingAPIView(APIView):
         manager = self.get_manager(data_collector, user=request.user)
         manager.run()
 
+        # Repeated launch of task returns state of already launched one
+        if manager.task_already_launched:
+            return Response(AlbumProcessingInfoSerializer(self.data_collector_class(album.pk)).data)
+
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def get_object(self):
@@ -463,24 +467,27 @@ class SearchPersonAPIView(APIView):
         searching_now = RedisAPISearchChecker.is_person_searching(self._person.pk)
         search_completed = bool(RedisAPISearchGetter.get_founded_similar_people(self._person.pk))
 
-        if not searching_now and not search_completed:
+        if not searching_now and not search_completed and lock_recognition_task(self._person.pk, 0):
             RedisAPISearchSetter.prepare_to_search(self._person.pk)
-            recognition_task.delay(self._person.pk, 0)
+            schedule_recognition_task(self._person.pk, 0, request.user.pk)
             return Response(f'Search of people similar to {self._person.slug} started')
 
-        if searching_now:
+        # Search is running, waits in queue or was just launched by another request
+        if searching_now or not search_completed:
+            queue_position = RedisAPITasksQueue.get_queue_position(f"person_{self._person.pk}")
             processed_patterns_amount = RedisAPISearchGetter.get_searched_patterns_amount(self._person.pk)
             total_patterns_amount = self._person.patterns_set.count()
             return Response({
                 'searching_now': True,
                 'processed_patterns_amount': processed_patterns_amount,
                 'total_patterns_amount': total_patterns_amount,
+                'progress': RedisAPIProgress.get_progress(f"person_{self._person.pk}"),
+                'queue_position': queue_position,
             })
 
-        if search_completed:
-            query_list = self.get_query_list()
-            serializer = FoundedPeopleSerializer(query_list, many=True, context={'request': request})
-            return Response(serializer.data)
+        query_list = self.get_query_list()
+        serializer = FoundedPeopleSerializer(query_list, many=True, context={'request': request})
+        return Response(serializer.data)
 
     def post(self, request, *args, **kwargs):
         try:
@@ -491,11 +498,11 @@ class SearchPersonAPIView(APIView):
         serializer = SearchStartOverSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        if RedisAPISearchChecker.is_person_searching(self._person.pk):
+        if not lock_recognition_task(self._person.pk, 0):
             return Response({'error': 'Search is running now'})
 
         RedisAPISearchSetter.prepare_to_search(self._person.pk)
-        recognition_task.delay(self._person.pk, 0)
+        schedule_recognition_task(self._person.pk, 0, request.user.pk)
         return Response(f'Search of people similar to {self._person.slug} started')
 
     def get_object(self):
@@ -511,11 +518,6 @@ class SearchPersonAPIView(APIView):
 
     def get_query_list(self):
         nearest_people_pks = RedisAPISearchGetter.get_founded_similar_people(self._person.pk)
-        queryset = People.objects.prefetch_related('patterns_set__faces_set').select_related('owner')\
-            .filter(pk__in=nearest_people_pks)\
-            .annotate(
-                photos_amount=Count('patterns__faces__photo', distinct=True),
-                albums_amount=Count('patterns__faces__photo__album', distinct=True),
-            )
+        queryset = FoundedPeopleSerializer.setup_queryset(People.objects.filter(pk__in=nearest_people_pks))
         query_list = sorted(queryset, key=lambda p: nearest_people_pks.index(p.pk))
         return query_list
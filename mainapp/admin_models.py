@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.safestring import mark_safe
 
-from recognition.models import Faces
+from recognition.models import People
 
 
 class AlbumsAdmin(admin.ModelAdmin):
@@ -19,17 +19,17 @@ class AlbumsAdmin(admin.ModelAdmin):
 
     def get_html_miniature_cover(self, obj):
         if obj.miniature:
-            return mark_safe(f"<img src='{obj.miniature.original.url}' width=50>")
+            return mark_safe(f"<img src='{obj.miniature.thumbnail_url}' width=50>")
             
     def get_photos_amount(self, obj):
         return obj.photos_set.count()
 
     def are_all_photos_processed(self, obj):
-        return obj.photos_set.count() == obj.photos_set.filter(faces_extracted=True).count()
+        return obj.public_photos_amount == obj.processed_photos_amount
 
     def get_people_amount(self, obj):
-        if obj.photos_set.filter(faces_extracted=True).exists():
-            return len(set((face.pattern.person.pk for face in Faces.objects.filter(photo__album__pk=obj.pk))))
+        if obj.processed_photos_amount:
+            return People.objects.filter(patterns__faces__photo__album__pk=obj.pk).distinct().count()
 
     are_all_photos_processed.short_description = "Fully processed"
     get_html_miniature_cover.short_description = "Cover"
@@ -52,7 +52,7 @@ class PhotosAdmin(admin.ModelAdmin):
         return obj.album.owner
 
     def get_html_miniature(self, obj):
-        return mark_safe(f"<img src='{obj.original.url}' width=50>")
+        return mark_safe(f"<img src='{obj.thumbnail_url}' width=50>")
 
     def get_people_amount(self, obj):
         if obj.faces_extracted:
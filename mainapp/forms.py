@@ -4,6 +4,7 @@ from django.core.validators import FileExtensionValidator
 from django.forms import inlineformset_factory, BaseInlineFormSet
 from django.forms.formsets import DELETION_FIELD_NAME
 
+from recognition.supporters import FacesDeletionSupporter
 from .models import *
 
 
@@ -117,8 +118,7 @@ class AlbumEditForm(forms.ModelForm):
 
                     # Delete all recognized faces
                     if photo.faces_extracted:
-                        for face in photo.faces_set.all():
-                            face.delete()
+                        FacesDeletionSupporter.delete_faces(photo.faces_set.all())
                         photo.faces_extracted = False
                 photo.save()
 
@@ -168,8 +168,7 @@ class CustomInlineFormset(BaseInlineFormSet):
 
                 # Delete all recognized faces
                 if instance.faces_extracted:
-                    for face in instance.faces_set.all():
-                        face.delete()
+                    FacesDeletionSupporter.delete_faces(instance.faces_set.all())
                     instance.faces_extracted = False
             if commit:
                 instance.save()
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from mainapp.models import Photos
+from mainapp.tasks import photo_renditions_task
+
+
+class Command(BaseCommand):
+    help = "Starts background creation of missing renditions for all photos."
+
+    def handle(self, *args, **options):
+        # Photos sharing one file share renditions, so one task per file is enough
+        photos_pks = {}
+        for pk, original in Photos.objects.values_list('pk', 'original'):
+            photos_pks.setdefault(original, pk)
+
+        for pk in photos_pks.values():
+            photo_renditions_task.delay(pk)
+
+        self.stdout.write(f"Started creation of renditions for {len(photos_pks)} files.")
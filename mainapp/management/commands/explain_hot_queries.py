@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from accounts.models import User
+from mainapp.models import Albums, Photos
+from recognition.models import Clusters, Faces, Patterns, People
+
+
+class Command(BaseCommand):
+    help = "Runs MySQL EXPLAIN on the most frequent queries of the site and reports full table scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail-on-full-scan', action='store_true',
+                            help="Exit with error, if any query scans a whole table.")
+        parser.add_argument('--min-rows', type=int, default=1000,
+                            help="Full scans of tables with less estimated rows are not reported.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'mysql':
+            raise CommandError("EXPLAIN output can be checked only on MySQL database.")
+
+        full_scans = []
+        for name, queryset in self._get_hot_queries():
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN {sql}", params)
+                columns = [column[0] for column in cursor.description]
+                plan = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for step in plan:
+                self.stdout.write(f"  table={step['table']} type={step['type']} key={step['key']} "
+                                  f"rows={step['rows']} extra={step['Extra']}")
+                if step['type'] == 'ALL' and (step['rows'] or 0) >= options['min_rows']:
+                    full_scans.append(f"{name}: {step['table']} ({step['rows']} rows)")
+
+        if not full_scans:
+            self.stdout.write(self.style.SUCCESS("No full table scans found."))
+            return
+
+        for full_scan in full_scans:
+            self.stdout.write(self.style.WARNING(f"Full scan in {full_scan}"))
+        if options['fail_on_full_scan']:
+            raise CommandError(f"{len(full_scans)} full table scans found.")
+
+    @staticmethod
+    def _get_hot_queries():
+        """Querysets repeating the hot queries of views and recognition stages, with parameters of existing objects."""
+        user = User.objects.order_by('pk').first()
+        user_pk = user.pk if user else 0
+        album_pk = Albums.objects.order_by('pk').values_list('pk', flat=True).first() or 0
+        person_pk = People.objects.order_by('pk').values_list('pk', flat=True).first() or 0
+        cluster = Clusters.objects.order_by('pk').first()
+
+        return (
+            ('Main page albums', Albums.objects.filter(
+                is_private=False,
+                photos__isnull=False,
+            ).select_related('owner', 'miniature').annotate(Count('photos')).order_by('-time_create')[:16]),
+            ('User albums', Albums.objects.filter(owner__pk=user_pk).order_by('time_create')),
+            ('Album public photos', Photos.objects.filter(album__pk=album_pk, is_private=False)),
+            ('Favorite photos', Photos.objects.filter(in_users_favorites__pk=user_pk, is_private=False)),
+            ('Cluster unregistered patterns', Patterns.objects.filter(
+                cluster__pk=cluster.pk if cluster else 0,
+                is_registered_in_cluster=False,
+            )),
+            ('Clusters subtree', Clusters.objects.filter(path__startswith=cluster.path if cluster else '')),
+            ('Person faces of owner', Faces.objects.filter(
+                pattern__person__pk=person_pk,
+                photo__album__owner__pk=user_pk,
+            ).select_related('photo')),
+            ('Recognized people of user', People.objects.filter(owner__pk=user_pk)),
+        )
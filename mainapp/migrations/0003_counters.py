@@ -0,0 +1,39 @@
+# Generated by Django 4.1.3 on 2026-10-19 15:44
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_albums_photos(apps, schema_editor):
+    Albums = apps.get_model('mainapp', 'Albums')
+    Photos = apps.get_model('mainapp', 'Photos')
+
+    def photos_amount(**filters):
+        return Coalesce(Subquery(Photos.objects.filter(
+            album=OuterRef('pk'), is_private=False, **filters,
+        ).order_by().values('album').annotate(amount=Count('pk')).values('amount')), 0)
+
+    Albums.objects.update(public_photos_amount=photos_amount(),
+                          processed_photos_amount=photos_amount(faces_extracted=True))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0002_alter_albums_in_users_favorites_alter_albums_owner_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='albums',
+            name='processed_photos_amount',
+            field=models.PositiveIntegerField(default=0, verbose_name='Processed public photos amount'),
+        ),
+        migrations.AddField(
+            model_name='albums',
+            name='public_photos_amount',
+            field=models.PositiveIntegerField(default=0, verbose_name='Public photos amount'),
+        ),
+        migrations.RunPython(count_albums_photos, migrations.RunPython.noop),
+    ]
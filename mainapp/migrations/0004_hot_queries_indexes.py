@@ -0,0 +1,25 @@
+# Generated by Django 4.1.3 on 2026-10-19 15:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0003_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='albums',
+            index=models.Index(fields=['is_private', 'time_create'], name='albums_private_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='albums',
+            index=models.Index(fields=['owner', 'time_create'], name='albums_owner_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photos',
+            index=models.Index(fields=['album', 'is_private', 'time_create'], name='photos_album_private_time_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.1.3 on 2026-10-19 16:02
+
+from django.db import migrations
+import mainapp.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0004_hot_queries_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='photos',
+            name='slug',
+            field=mainapp.utils.BulkAutoSlugField(blank=True, editable=False, populate_from='title', unique=True, verbose_name='URL'),
+        ),
+    ]
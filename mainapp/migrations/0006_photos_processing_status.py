@@ -0,0 +1,24 @@
+# Generated by Django 4.1.3 on 2026-10-19 16:06
+
+from django.db import migrations, models
+import mainapp.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0005_photos_bulk_slug'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photos',
+            name='processing_status',
+            field=models.CharField(choices=[('uploaded', 'Processing'), ('ready', 'Ready'), ('failed', 'Processing failed')], default='ready', max_length=15, verbose_name='Processing status'),
+        ),
+        migrations.AlterField(
+            model_name='photos',
+            name='original',
+            field=models.ImageField(upload_to=mainapp.utils.get_photo_save_path, verbose_name='Original'),
+        ),
+    ]
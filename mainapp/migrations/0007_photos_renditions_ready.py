@@ -0,0 +1,30 @@
+# Generated by Django 4.1.3 on 2026-10-19 17:23
+
+from django.db import migrations, models
+
+from mainapp.utils import get_rendition_name
+
+
+def mark_photos_renditions_ready(apps, schema_editor):
+    Photos = apps.get_model('mainapp', 'Photos')
+    storage = Photos._meta.get_field('original').storage
+
+    originals = set(Photos.objects.exclude(original='').values_list('original', flat=True))
+    ready_originals = [name for name in originals if storage.exists(get_rendition_name(name, 'thumbnail'))]
+    Photos.objects.filter(original__in=ready_originals).update(renditions_ready=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0006_photos_processing_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photos',
+            name='renditions_ready',
+            field=models.BooleanField(default=False, verbose_name='Renditions are created'),
+        ),
+        migrations.RunPython(mark_photos_renditions_ready, migrations.RunPython.noop),
+    ]
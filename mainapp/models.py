@@ -1,10 +1,9 @@
 from django.db import models
 from django.urls import reverse
 from django_extensions.db.fields import AutoSlugField
-from django_resized import ResizedImageField
 
 from photoalbums.settings import AUTH_USER_MODEL
-from .utils import get_photo_save_path, TruncatingCharField
+from .utils import get_photo_save_path, get_rendition_name, TruncatingCharField, BulkAutoSlugField
 
 
 class Albums(models.Model):
@@ -22,6 +21,8 @@ class Albums(models.Model):
     is_private = models.BooleanField(default=False, verbose_name='Privacy')
     miniature = models.OneToOneField('Photos', blank=True, null=True, on_delete=models.SET_NULL,
                                      verbose_name='Miniature')
+    public_photos_amount = models.PositiveIntegerField(default=0, verbose_name='Public photos amount')
+    processed_photos_amount = models.PositiveIntegerField(default=0, verbose_name='Processed public photos amount')
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -37,11 +38,25 @@ class Albums(models.Model):
         verbose_name = 'Album'
         verbose_name_plural = 'Albums'
         ordering = ['time_create']
+        indexes = [
+            models.Index(fields=['is_private', 'time_create'], name='albums_private_time_idx'),
+            models.Index(fields=['owner', 'time_create'], name='albums_owner_time_idx'),
+        ]
 
 
 class Photos(models.Model):
+    # Originals uploaded by users are stored as is, and resized with creating renditions in background
+    PROCESSING_UPLOADED = 'uploaded'
+    PROCESSING_READY = 'ready'
+    PROCESSING_FAILED = 'failed'
+    PROCESSING_STATUSES = [
+        (PROCESSING_UPLOADED, 'Processing'),
+        (PROCESSING_READY, 'Ready'),
+        (PROCESSING_FAILED, 'Processing failed'),
+    ]
+
     title = TruncatingCharField(max_length=127, verbose_name='Title')
-    slug = AutoSlugField(populate_from='title', unique=True, db_index=True, verbose_name='URL')
+    slug = BulkAutoSlugField(populate_from='title', unique=True, db_index=True, verbose_name='URL')
     date_start = models.DateField(blank=True, null=True, verbose_name='Photo date start')
     date_end = models.DateField(blank=True, null=True, verbose_name='Photo date end')
     location = models.CharField(max_length=63, blank=True, verbose_name='Location')
@@ -50,15 +65,44 @@ class Photos(models.Model):
     time_update = models.DateTimeField(auto_now=True, verbose_name="Last update date")
     is_private = models.BooleanField(default=False, verbose_name='Privacy')
     album = models.ForeignKey('Albums', on_delete=models.CASCADE, verbose_name='Album')
-    original = ResizedImageField(upload_to=get_photo_save_path, verbose_name="Original")
+    original = models.ImageField(upload_to=get_photo_save_path, verbose_name="Original")
     in_users_favorites = models.ManyToManyField(AUTH_USER_MODEL, blank=True, related_name='photos_in_users_favorites',
                                                 verbose_name="In Users' Favorites")
     faces_extracted = models.BooleanField(default=False, verbose_name='Processed')
+    processing_status = models.CharField(max_length=15, choices=PROCESSING_STATUSES, default=PROCESSING_READY,
+                                         verbose_name='Processing status')
+    # Set, when renditions of original are created, so their urls are built without checking storage
+    renditions_ready = models.BooleanField(default=False, verbose_name='Renditions are created')
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         setattr(self, 'original_is_private', getattr(self, 'is_private'))
 
+    def get_rendition_url(self, rendition, image_format='JPEG'):
+        """Returns url of smaller copy of the photo, or None if it was not created yet."""
+        if self.renditions_ready:
+            return self.original.storage.url(get_rendition_name(self.original.name, rendition, image_format))
+
+    @property
+    def is_processing(self):
+        return self.processing_status == self.PROCESSING_UPLOADED
+
+    @property
+    def thumbnail_url(self):
+        return self.get_rendition_url('thumbnail') or self.original.url
+
+    @property
+    def thumbnail_webp_url(self):
+        return self.get_rendition_url('thumbnail', 'WEBP')
+
+    @property
+    def medium_url(self):
+        return self.get_rendition_url('medium') or self.original.url
+
+    @property
+    def medium_webp_url(self):
+        return self.get_rendition_url('medium', 'WEBP')
+
     def get_absolute_url(self):
         return reverse('photo', kwargs={'photo_slug': self.slug,
                                         'username_slug': self.album.owner.username_slug,
@@ -71,3 +115,6 @@ class Photos(models.Model):
         verbose_name = 'Photo'
         verbose_name_plural = 'Photos'
         ordering = ['time_create']
+        indexes = [
+            models.Index(fields=['album', 'is_private', 'time_create'], name='photos_album_private_time_idx'),
+        ]
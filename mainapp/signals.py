@@ -1,21 +1,57 @@
 import os
 
+from django.db import transaction
 from django.db.models import Q
-from django.db.models.signals import pre_delete
+from django.db.models.signals import pre_delete, post_save, post_delete
 from django.dispatch import receiver
 
 from photoalbums.settings import BASE_DIR
-from .models import Photos
-from recognition.models import Faces
+from .models import Albums, Photos
+from .supporters import PhotosDeletionSupporter, MainFeedSupporter, AlbumsVersionSupporter
+from .tasks import photo_renditions_task, photo_processing_task
+from .utils import delete_photo_renditions
+from recognition.supporters import FacesDeletionSupporter
+from recognition.utils import recount_albums_photos_amounts
+
+
+@receiver(post_save, sender=Albums)
+@receiver(post_delete, sender=Albums)
+def albums_change(sender, instance, **kwargs):
+    MainFeedSupporter.invalidate()
+    AlbumsVersionSupporter.bump([instance.owner_id])
+
+
+@receiver(post_save, sender=Photos)
+def photos_save(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is None or {'is_private', 'faces_extracted', 'album'} & set(update_fields):
+        recount_albums_photos_amounts(Albums.objects.filter(pk=instance.album_id))
+    MainFeedSupporter.invalidate()
+    AlbumsVersionSupporter.bump_by_albums([instance.album_id])
+
+    # Uploaded original is resized in background, renditions are created after that
+    if instance.processing_status == Photos.PROCESSING_UPLOADED:
+        if created:
+            transaction.on_commit(lambda: photo_processing_task.delay(instance.pk))
+        return
+
+    # Creating renditions in background, if they are not created yet (copies of photo share file and its flag)
+    if not instance.original or (update_fields is not None and 'original' not in update_fields):
+        return
+    if not instance.renditions_ready:
+        transaction.on_commit(lambda: photo_renditions_task.delay(instance.pk))
 
 
 @receiver(pre_delete, sender=Photos)
 def photos_delete(sender, instance, **kwargs):
+    if PhotosDeletionSupporter.signals_suspended():
+        return
+
     # Deletion of image file
     if instance.original is not None and\
             not Photos.objects.filter(Q(original=instance.original) & ~ Q(pk=instance.pk)).exists():
 
         directory = os.path.dirname(os.path.abspath(os.path.join(BASE_DIR, instance.original.url[1:])))
+        delete_photo_renditions(instance.original)
         instance.original.delete()
 
         # removing empty folders
@@ -27,5 +63,14 @@ def photos_delete(sender, instance, **kwargs):
                 break
 
     # Faces set deletion
-    for face in instance.faces_set.all():
-        Faces.objects.get(pk=face.pk).delete()
+    FacesDeletionSupporter.delete_faces(instance.faces_set.all())
+
+
+@receiver(post_delete, sender=Photos)
+def photos_post_delete(sender, instance, **kwargs):
+    if PhotosDeletionSupporter.signals_suspended():
+        return
+
+    recount_albums_photos_amounts(Albums.objects.filter(pk=instance.album_id))
+    MainFeedSupporter.invalidate()
+    AlbumsVersionSupporter.bump_by_albums([instance.album_id])
@@ -0,0 +1,227 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from photoalbums.settings import MAIN_FEED_ALBUMS_AMOUNT, MAIN_FEED_FRESH_SECONDS, MAIN_FEED_STALE_SECONDS, \
+    MAIN_FEED_REFRESH_LOCK_SECONDS
+from recognition.models import Faces
+from recognition.supporters import FacesDeletionSupporter, SignalsSuspendingSupporter
+from recognition.utils import recount_albums_photos_amounts
+from .models import Albums, Photos
+from .utils import delete_photos_files, get_version, bump_version, acquire_cache_lock, release_cache_lock
+
+
+class PhotosDeletionSupporter(SignalsSuspendingSupporter):
+    """Deletion of photos set by a few queries. Faces of all photos are deleted together (so patterns and
+    clusters are handled once), and files, not used by other photos, are deleted in one pass after that."""
+
+    @classmethod
+    def delete_photos(cls, photos_queryset):
+        photos = list(photos_queryset.values_list('pk', 'original', 'album_id'))
+        if not photos:
+            return
+
+        photos_pks, originals, albums_pks = zip(*photos)
+
+        with transaction.atomic():
+            # Files, that are shared with photos out of deleting set, should stay
+            shared_originals = set(Photos.objects.filter(
+                original__in=set(originals),
+            ).exclude(
+                pk__in=photos_pks,
+            ).values_list('original', flat=True))
+            originals_to_delete = set(originals) - shared_originals - {''}
+
+            FacesDeletionSupporter.delete_faces(Faces.objects.filter(photo__pk__in=photos_pks))
+            with cls.suspend_signals():
+                Photos.objects.filter(pk__in=photos_pks).delete()
+            recount_albums_photos_amounts(Albums.objects.filter(pk__in=set(albums_pks)))
+            AlbumsVersionSupporter.bump_by_albums(set(albums_pks))
+
+            # Files are deleted only when deletion of rows is committed (also by outer transaction),
+            # so rolled back deletion never leaves photos without files
+            transaction.on_commit(lambda: delete_photos_files(Photos._meta.get_field('original').storage,
+                                                              originals_to_delete))
+        MainFeedSupporter.invalidate()
+
+
+class PhotosBulkUpdateSupporter:
+    """Saving of changed fields of many photos of one album by one query. Photos, that became private,
+    are removed from favorites and their faces are deleted together, instead of signals of every photo.
+    Returns pks of photos, that became private."""
+
+    @classmethod
+    def update_photos(cls, album, photos, fields):
+        fields = set(fields) | {'time_update'}
+        privacy_changed = any(photo.is_private != photo.original_is_private for photo in photos)
+        became_private_pks = [photo.pk for photo in photos if photo.is_private and not photo.original_is_private]
+        now = timezone.now()
+        for photo in photos:
+            photo.time_update = now
+            if photo.pk in became_private_pks:
+                photo.faces_extracted = False
+        if became_private_pks:
+            fields.add('faces_extracted')
+
+        with transaction.atomic():
+            if became_private_pks:
+                Photos.in_users_favorites.through.objects.filter(photos__pk__in=became_private_pks).delete()
+                FacesDeletionSupporter.delete_faces(Faces.objects.filter(photo__pk__in=became_private_pks))
+            Photos.objects.bulk_update(photos, fields)
+            if privacy_changed:
+                recount_albums_photos_amounts(Albums.objects.filter(pk=album.pk))
+                album.public_photos_amount, album.processed_photos_amount = Albums.objects.filter(
+                    pk=album.pk,
+                ).values_list('public_photos_amount', 'processed_photos_amount').get()
+            AlbumsVersionSupporter.bump([album.owner_id])
+        MainFeedSupporter.invalidate()
+
+        for photo in photos:
+            photo.original_is_private = photo.is_private
+        return became_private_pks
+
+
+class AlbumsVersionSupporter:
+    """Version stamps of albums of users for conditional requests. Albums, photos and renditions
+    of one owner share one version, so it is reset by change of any of them."""
+
+    @staticmethod
+    def get_key(owner_pk):
+        return f'user_{owner_pk}_albums_version'
+
+    @classmethod
+    def get_version(cls, owner_pk):
+        return get_version(cls.get_key(owner_pk))
+
+    @classmethod
+    def bump(cls, owners_pks):
+        for owner_pk in set(owners_pks):
+            bump_version(cls.get_key(owner_pk))
+
+    @classmethod
+    def bump_by_albums(cls, albums_pks):
+        cls.bump(Albums.objects.filter(pk__in=albums_pks).values_list('owner_id', flat=True))
+
+    @classmethod
+    def bump_by_photos(cls, photos_queryset):
+        cls.bump(photos_queryset.values_list('album__owner_id', flat=True))
+
+
+class AlbumCloneSupporter:
+    """Copying of public part of album to another user by a few queries. Photos are bulk created (with slugs
+    prepared by one query) and share image files with originals, so renditions and found faces are reused."""
+
+    @classmethod
+    def clone_album(cls, album, owner):
+        photos = list(Photos.objects.filter(album=album, is_private=False))
+        miniature_pk = album.miniature_id
+
+        with transaction.atomic():
+            new_album = cls._clone_album_instance(album, owner, photos_amount=len(photos))
+            new_photos = cls._clone_photos(photos, new_album)
+
+            miniature = new_photos.get(miniature_pk)
+            if miniature is not None:
+                new_album.miniature = miniature
+                new_album.save(update_fields=['miniature'])
+
+        return new_album
+
+    @staticmethod
+    def _clone_album_instance(album, owner, photos_amount):
+        album.pk, album.id = None, None
+        album._state.adding = True
+        album.owner = owner
+        album.miniature = None
+        album.public_photos_amount = photos_amount
+        album.processed_photos_amount = 0
+        album.save()
+        return album
+
+    @staticmethod
+    def _clone_photos(photos, album):
+        """Creates copies of photos in album, returns them by pk of copied photos."""
+        old_pks = []
+        for photo in photos:
+            old_pks.append(photo.pk)
+            photo.pk, photo.id = None, None
+            photo._state.adding = True
+            photo.album = album
+            photo.faces_extracted = False
+
+        slug_field = Photos._meta.get_field('slug')
+        slug_field.prepare_slugs(photos)
+        Photos.objects.bulk_create(photos)
+
+        # Primary keys of bulk created rows are not returned by MySQL, so they are matched by unique slugs
+        if any(photo.pk is None for photo in photos):
+            new_photos = {photo.slug: photo for photo in Photos.objects.filter(album=album)}
+            photos = [new_photos[photo.slug] for photo in photos]
+        return dict(zip(old_pks, photos))
+
+
+class MainFeedSupporter:
+    """Albums of the main page, materialized in cache (rows of albums with their owners, miniatures and amounts
+    of photos, and version, that changes every time feed is recomputed). When feed is not fresh anymore
+    (expired or invalidated by changes of albums and photos), it is still returned from cache, while only one
+    request recomputes it.
+    Feed should be read once per request by get_feed(), and its albums are taken by get_albums(feed)."""
+    feed_key = 'main_feed_albums'
+    fresh_key = 'main_feed_fresh'
+    lock_key = 'main_feed_refreshing'
+
+    @classmethod
+    def get_feed(cls):
+        feed = cache.get(cls.feed_key)
+        if feed is not None and cache.get(cls.fresh_key) is not None:
+            return feed
+
+        # Stale feed is returned, while other request holds the lock and recomputes it
+        token = acquire_cache_lock(cls.lock_key, MAIN_FEED_REFRESH_LOCK_SECONDS)
+        if feed is not None and token is None:
+            return feed
+        try:
+            return cls.refresh()
+        finally:
+            if token is not None:
+                release_cache_lock(cls.lock_key, token)
+
+    @staticmethod
+    def get_albums(feed):
+        """Cached albums of feed, that are still public and not empty (stale feed can be returned,
+        while it is recomputed)."""
+        albums = feed['albums']
+        visible_pks = set(Albums.objects.filter(
+            pk__in=[album.pk for album in albums],
+            is_private=False,
+            photos__isnull=False,
+        ).values_list('pk', flat=True))
+        return [album for album in albums if album.pk in visible_pks]
+
+    @classmethod
+    def refresh(cls):
+        albums = list(Albums.objects.filter(
+            is_private=False,
+            photos__isnull=False,
+        ).select_related(
+            'owner',
+            'miniature',
+        ).annotate(
+            photos_amount=Count('photos'),
+        ).order_by(
+            '-time_create',
+        )[:MAIN_FEED_ALBUMS_AMOUNT])
+
+        feed = {'albums': albums, 'version': time.time_ns()}
+        cache.set(cls.feed_key, feed, MAIN_FEED_STALE_SECONDS)
+        cache.set(cls.fresh_key, True, MAIN_FEED_FRESH_SECONDS)
+        return feed
+
+    @classmethod
+    def invalidate(cls):
+        # Feed could be recomputed by another request before the changes were committed, so once more after commit
+        cache.delete(cls.fresh_key)
+        transaction.on_commit(lambda: cache.delete(cls.fresh_key))
@@ -1,7 +1,14 @@
+from datetime import timedelta
+
 from celery.utils.log import get_task_logger
 from celery import shared_task
+from django.utils import timezone
+from PIL import Image
 
-from .models import Albums
+from photoalbums.settings import PHOTO_PROCESSING_STALE_SECONDS
+from .models import Albums, Photos
+from .supporters import PhotosDeletionSupporter, MainFeedSupporter, AlbumsVersionSupporter
+from .utils import create_photo_renditions, process_photo_original
 
 logger = get_task_logger(__name__)
 
@@ -10,7 +17,66 @@ logger = get_task_logger(__name__)
 def album_deletion_task(album_pk):
     logger.info(f"Starting to delete album {album_pk}.")
     album = Albums.objects.get(pk=album_pk)
-    for photo in album.photos_set.all():
-        photo.delete()
+    PhotosDeletionSupporter.delete_photos(album.photos_set.all())
     album.delete()
     return f"Deletion of album {album_pk} has been finished."
+
+
+@shared_task
+def photo_renditions_task(photo_pk):
+    try:
+        photo = Photos.objects.get(pk=photo_pk)
+    except Photos.DoesNotExist:
+        return f"Photo {photo_pk} was deleted before creating its renditions."
+    create_photo_renditions(photo.original)
+    Photos.objects.filter(original=photo.original.name).update(renditions_ready=True, time_update=timezone.now())
+    AlbumsVersionSupporter.bump_by_photos(Photos.objects.filter(original=photo.original.name))
+    return f"Renditions of photo {photo_pk} are created."
+
+
+@shared_task
+def photo_processing_task(photo_pk):
+    try:
+        photo = Photos.objects.get(pk=photo_pk)
+    except Photos.DoesNotExist:
+        return f"Photo {photo_pk} was deleted before processing."
+    if photo.processing_status != Photos.PROCESSING_UPLOADED:
+        return f"Photo {photo_pk} is already processed."
+
+    raw_name = photo.original.name
+    try:
+        name = process_photo_original(photo.original)
+    except (OSError, Image.DecompressionBombError) as exc:
+        logger.warning(f"Processing of photo {photo_pk} failed: {exc}")
+        Photos.objects.filter(original=raw_name).update(processing_status=Photos.PROCESSING_FAILED,
+                                                        time_update=timezone.now())
+        AlbumsVersionSupporter.bump_by_photos(Photos.objects.filter(original=raw_name))
+        return f"Processing of photo {photo_pk} failed."
+
+    # Copies of photo, saved while it was processed, share the same file
+    Photos.objects.filter(original=raw_name).update(original=name, processing_status=Photos.PROCESSING_READY,
+                                                     time_update=timezone.now())
+    if name != raw_name:
+        photo.original.storage.delete(raw_name)
+    MainFeedSupporter.invalidate()
+
+    photo.original.name = name
+    create_photo_renditions(photo.original)
+    Photos.objects.filter(original=name).update(renditions_ready=True, time_update=timezone.now())
+    AlbumsVersionSupporter.bump_by_photos(Photos.objects.filter(original=name))
+    return f"Photo {photo_pk} is processed."
+
+
+@shared_task
+def requeue_stale_uploaded_photos():
+    stale_photos = Photos.objects.filter(
+        processing_status=Photos.PROCESSING_UPLOADED,
+        time_update__lt=timezone.now() - timedelta(seconds=PHOTO_PROCESSING_STALE_SECONDS),
+    )
+    photos_pks = list(stale_photos.values_list('pk', flat=True))
+
+    # Time of update is moved, so photo is queued again only if this task is lost too
+    Photos.objects.filter(pk__in=photos_pks).update(time_update=timezone.now())
+    for photo_pk in photos_pks:
+        photo_processing_task.delay(photo_pk)
+    return f"{len(photos_pks)} stale uploaded photos are queued for processing again."
@@ -0,0 +1,147 @@
+import base64
+import time
+
+import numpy as np
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User
+from mainapp.models import Albums, Photos
+from photoalbums.settings import ALBUMS_AMOUNT_LIMIT
+from recognition.models import Faces, Patterns, People, Clusters
+from recognition.utils import recount_patterns_faces_amounts, recount_people_amounts
+
+
+class PerformanceTestCase(TestCase):
+    """Base class for query-count and latency regression tests of hot views.
+    Builds fixtures of several users with full albums, recognized people and populated clusters tree
+    (with synthetic face encodings), and checks requests against budgets, set by tests themselves.
+    Budgets are set a little above measured values, and should be lowered when views get faster."""
+
+    users_amount = 3
+    albums_per_user = ALBUMS_AMOUNT_LIMIT
+    photos_per_album = 12
+    faces_per_photo = 2
+    people_per_user = 8
+    dummy_password = '12345'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls._rng = np.random.default_rng(0)
+        cls.users = [User.objects.create_user(username=f'perf_user_{i}',
+                                              password=cls.dummy_password,
+                                              email=f'perf_user_{i}@mail.com') for i in range(cls.users_amount)]
+        cls.root_cluster = Clusters.objects.create()
+
+        image_name = None
+        for user in cls.users:
+            people = [People.objects.create(owner=user, name=f'{user.username} person {i}')
+                      for i in range(cls.people_per_user)]
+            user_cluster = Clusters.objects.create(parent=cls.root_cluster)
+
+            for album_index in range(cls.albums_per_user):
+                album = Albums.objects.create(title=f'album {album_index}', owner=user)
+                patterns = {}
+                for photo_index in range(cls.photos_per_album):
+                    if image_name is None:
+                        photo = Photos.objects.create(title=f'photo {photo_index}', album=album,
+                                                      original=cls._get_test_image(), faces_extracted=True)
+                        image_name = photo.original.name
+                    else:
+                        # All photos share one file, as copies of saved photos do
+                        photo = Photos.objects.create(title=f'photo {photo_index}', album=album,
+                                                      original=image_name, faces_extracted=True)
+                    if photo_index == 0:
+                        album.miniature = photo
+                        album.save(update_fields=['miniature'])
+
+                    for face_index in range(1, cls.faces_per_photo + 1):
+                        person = people[(photo_index * cls.faces_per_photo + face_index) % cls.people_per_user]
+                        if person.pk not in patterns:
+                            patterns[person.pk] = Patterns.objects.create(person=person, cluster=user_cluster,
+                                                                          is_registered_in_cluster=True)
+                        face = Faces.objects.create(photo=photo, index=face_index, pattern=patterns[person.pk],
+                                                    loc_top=0, loc_right=4, loc_bot=4, loc_left=0,
+                                                    encoding=cls._rng.random(128).dumps())
+                        if patterns[person.pk].central_face is None:
+                            patterns[person.pk].central_face = face
+                            patterns[person.pk].save(update_fields=['central_face'])
+
+                if user_cluster.center is None:
+                    user_cluster.center = next(iter(patterns.values()))
+                    user_cluster.save(update_fields=['center'])
+
+        cls.root_cluster.center = Clusters.objects.filter(parent=cls.root_cluster).first().center
+        cls.root_cluster.save(update_fields=['center'])
+        recount_patterns_faces_amounts(Patterns.objects.all())
+        recount_people_amounts(People.objects.all())
+
+        # First user has all public albums and photos of other users in favorites
+        cls.user = cls.users[0]
+        for album in Albums.objects.exclude(owner=cls.user):
+            album.in_users_favorites.add(cls.user)
+        for photo in Photos.objects.exclude(album__owner=cls.user):
+            photo.in_users_favorites.add(cls.user)
+
+        cls.album = Albums.objects.filter(owner=cls.user).first()
+        cls.photo = cls.album.photos_set.last()
+        cls.person = People.objects.filter(owner=cls.user).first()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    @staticmethod
+    def _get_test_image():
+        return SimpleUploadedFile(
+            "perf_photo.jpeg",
+            base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAUA" +
+                             "AAAFCAYAAACNbyblAAAAHElEQVQI12P4//8/w38GIAXDIBKE0DHxgljNBAAO" +
+                             "9TXL0Y4OHwAAAABJRU5ErkJggg=="), content_type="image/jpeg")
+
+    def assertWithinBudget(self, url, data=None, *, queries, seconds=None):
+        """Requests url (after one warming up request and clearing of cache) and checks amount of queries
+        and wall time of request (only if it is given, as it depends on machine running tests)."""
+        self.client.get(url, data)
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = self.client.get(url, data)
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(captured), queries,
+                             msg=f"{url}: {len(captured)} queries, budget is {queries}.\n" +
+                                 '\n'.join(query['sql'] for query in captured.captured_queries))
+        if seconds is not None:
+            self.assertLessEqual(elapsed, seconds, msg=f"{url}: {elapsed:.3f} seconds, budget is {seconds}.")
+        return response
+
+    def assertQueriesNotDependOnAmount(self, url, queryset, keep_amount=2):
+        """Requests url before and after removing of all but keep_amount objects of queryset
+        (items of requested list) and checks, that amount of queries is the same."""
+        queries_amounts = []
+        for _ in range(2):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            queries_amounts.append(len(queries))
+            queryset.exclude(pk__in=list(queryset.values_list('pk', flat=True)[:keep_amount])).delete()
+
+        self.assertEqual(*queries_amounts)
+
+    def assertNotModified(self, url, data=None, *, queries):
+        """Requests url again with ETag of its response and checks, that answer is 304 Not Modified
+        and it takes not more queries than budget. Returns ETag."""
+        etag = self.client.get(url, data)['ETag']
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, data, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertLessEqual(len(captured), queries,
+                             msg='\n'.join(query['sql'] for query in captured.captured_queries))
+        return etag
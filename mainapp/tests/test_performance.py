@@ -0,0 +1,35 @@
+from django.urls import reverse
+
+from mainapp.models import Albums, Photos
+from mainapp.tests.performance import PerformanceTestCase
+
+
+class TestViewsPerformance(PerformanceTestCase):
+    def test_main_page(self):
+        self.assertWithinBudget(reverse('main'), queries=5)
+
+    def test_user_albums(self):
+        self.assertWithinBudget(reverse('user_albums', kwargs={'username_slug': self.user.username_slug}), queries=6)
+
+    def test_album(self):
+        self.assertWithinBudget(self.album.get_absolute_url(), queries=8)
+
+    def test_photo(self):
+        self.assertWithinBudget(self.photo.get_absolute_url(), queries=13)
+
+    def test_favorites(self):
+        self.assertWithinBudget(reverse('favorites', kwargs={'username_slug': self.user.username_slug}), queries=5)
+
+    def test_favorites_photos(self):
+        self.assertWithinBudget(reverse('favorites_photos',
+                                        kwargs={'username_slug': self.user.username_slug}), queries=6)
+
+    def test_favorites_queries_not_depend_on_albums_amount(self):
+        self.assertQueriesNotDependOnAmount(reverse('favorites', kwargs={'username_slug': self.user.username_slug}),
+                                            Albums.in_users_favorites.through.objects.filter(user=self.user))
+
+    def test_favorites_photos_queries_not_depend_on_photos_amount(self):
+        self.assertQueriesNotDependOnAmount(
+            reverse('favorites_photos', kwargs={'username_slug': self.user.username_slug}),
+            Photos.in_users_favorites.through.objects.filter(user=self.user),
+        )
@@ -5,12 +5,15 @@ import zipfile
 
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.datetime_safe import datetime
 
 from accounts.models import User
 from mainapp.models import Albums, Photos
+from mainapp.tasks import photo_processing_task
 from photoalbums.settings import ALBUMS_AMOUNT_LIMIT, ALBUM_PHOTOS_AMOUNT_LIMIT
 
 
@@ -92,6 +95,23 @@ class TestMainPageView(TestView):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'mainapp/index.html')
 
+    def test_stale_feed_without_private_album_GET(self):
+        test_image = SimpleUploadedFile(
+            f"{self.dummy_photo_title}.jpeg",
+            base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAUA" +
+                             "AAAFCAYAAACNbyblAAAAHElEQVQI12P4//8/w38GIAXDIBKE0DHxgljNBAAO" +
+                             "9TXL0Y4OHwAAAABJRU5ErkJggg=="), content_type="image/jpeg")
+        album = Albums.objects.create(title=self.dummy_album_title, owner=self.user)
+        Photos.objects.create(title=self.dummy_photo_title, album=album, original=test_image)
+        self.assertContains(self.client.get(self.url), album.get_absolute_url())
+
+        # Feed is not recomputed, as it is, when changes are not committed yet
+        Albums.objects.filter(pk=album.pk).update(is_private=True)
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, album.get_absolute_url())
+
 
 class TestAboutPageView(TestView):
     viewname = 'about'
@@ -234,6 +254,29 @@ class TestAlbumCreateView(TestView):
 
         self.assertIsNotNone(self.user.albums.first().miniature)
 
+    def test_POST_uploaded_photos_processed_in_background(self):
+        self.client.login(username=self.dummy_username, password=self.dummy_password)
+        photo_file = SimpleUploadedFile(
+            "raw.png",
+            base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAUA" +
+                             "AAAFCAYAAACNbyblAAAAHElEQVQI12P4//8/w38GIAXDIBKE0DHxgljNBAAO" +
+                             "9TXL0Y4OHwAAAABJRU5ErkJggg=="), content_type="image/png")
+
+        self.client.post(self.url, {'title': 'test_creating', 'images': [photo_file]})
+
+        photo = self.user.albums.first().photos_set.get()
+        self.assertEqual(photo.processing_status, Photos.PROCESSING_UPLOADED)
+        self.assertTrue(photo.original.name.endswith('.png'))
+        uploaded_time_update = photo.time_update
+
+        photo_processing_task(photo.pk)
+
+        photo.refresh_from_db()
+        self.assertEqual(photo.processing_status, Photos.PROCESSING_READY)
+        self.assertGreater(photo.time_update, uploaded_time_update)
+        self.assertTrue(photo.original.name.endswith('.jpg'))
+        self.assertIsNotNone(photo.get_rendition_url('thumbnail'))
+
 
 class TestAlbumView(TestView):
     viewname = 'album'
@@ -1096,3 +1139,23 @@ class TestSavAlbum(TestManagementView):
         self.assertEqual(self.second_user.albums.first().photos_set.count(), 1)
         self.assertIsNotNone(self.second_user.albums.first().miniature)
         self.assertRedirects(response, reverse('user_albums', kwargs={'username_slug': self.second_user.username_slug}))
+
+    def test_POST_successful_save_queries_amount_not_depends_on_photos_amount(self):
+        self.client.login(username=self.dummy_2_username, password=self.dummy_2_password)
+        for _ in range(5):
+            Photos.objects.create(title=self.dummy_photo_title, album=self.album, original=self.photo.original.name)
+        self.album.in_users_favorites.add(self.second_user)
+        self.album.miniature = self.photo
+        self.album.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, {'album': self.album.slug})
+
+        self.assertLessEqual(len(queries), 15)
+
+        new_album = self.second_user.albums.get()
+        slugs = set(new_album.photos_set.values_list('slug', flat=True))
+        self.assertEqual(len(slugs), 6)
+        self.assertFalse(slugs & set(self.album.photos_set.values_list('slug', flat=True)))
+        self.assertEqual(new_album.miniature.original, self.photo.original)
+        self.assertEqual(new_album.public_photos_amount, 6)
@@ -1,14 +1,25 @@
+import hashlib
+import operator
 import os
+import re
+import time
+import uuid
 from datetime import datetime
-import tempfile
 import zipfile
+from functools import reduce
 from math import ceil
-from wsgiref.util import FileWrapper
 
+from django.core.cache import cache
 from django.core.paginator import Paginator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
+from django_extensions.db.fields import AutoSlugField, MAX_UNIQUE_QUERY_ATTEMPTS
+from PIL import Image, ImageOps
 
-from photoalbums.settings import BASE_DIR
+from photoalbums.settings import BASE_DIR, MEDIA_ROOT, PHOTO_RENDITIONS, PHOTO_RENDITIONS_FORMATS, PHOTO_RENDITIONS_QUALITY, \
+    ZIP_STREAMING_CHUNK_SIZE, ZIP_CACHING, ZIP_CACHE_ROOT, ZIP_CACHE_EXPIRATION_SECONDS, CACHE_DEFAULT_TIMEOUT, \
+    CACHE_LOCK_SECONDS, CACHE_LOCK_WAIT_SECONDS, CACHE_LOCK_POLL_SECONDS, PHOTO_ORIGINAL_SIZE, PHOTO_ORIGINAL_QUALITY, \
+    PHOTO_ORIGINAL_FORMAT
 
 
 def get_photo_save_path(instance, filename):
@@ -16,19 +27,127 @@ def get_photo_save_path(instance, filename):
     return f'photos/{date}/{instance.album.slug}/{instance.slug}.{filename.split(".")[-1]}'
 
 
+def get_temp_path(path):
+    """Unique path of temp file next to path (so it can be atomically moved there).
+    Unique name keeps concurrent writers of the same file in different temp files."""
+    return f'{path}.{uuid.uuid4().hex}.tmp'
+
+
+def get_rendition_name(original_name, rendition, image_format='JPEG'):
+    """Renditions are stored next to the original file and named by it,
+    so all photos, that share one file, share its renditions too."""
+    root, _ = os.path.splitext(original_name)
+    return f'{root}.{rendition}{PHOTO_RENDITIONS_FORMATS[image_format]}'
+
+
+def get_renditions_names(original_name):
+    return [get_rendition_name(original_name, rendition, image_format)
+            for rendition in PHOTO_RENDITIONS for image_format in PHOTO_RENDITIONS_FORMATS]
+
+
+def create_photo_renditions(original):
+    storage = original.storage
+    missing = [(rendition, size, image_format)
+               for rendition, size in PHOTO_RENDITIONS.items()
+               for image_format in PHOTO_RENDITIONS_FORMATS
+               if not storage.exists(get_rendition_name(original.name, rendition, image_format))]
+    if not missing:
+        return
+
+    with Image.open(original.path) as image:
+        image = image.convert('RGB')
+        for rendition, size, image_format in missing:
+            rendition_image = image.copy()
+            rendition_image.thumbnail(size)
+
+            # Writing to temp file first, so not finished rendition will never be served
+            path = storage.path(get_rendition_name(original.name, rendition, image_format))
+            temp_path = get_temp_path(path)
+            rendition_image.save(temp_path, image_format, quality=PHOTO_RENDITIONS_QUALITY)
+            os.replace(temp_path, path)
+
+
+def process_photo_original(original):
+    """Rotates uploaded image by its EXIF orientation, reduces it to PHOTO_ORIGINAL_SIZE and re-encodes it
+    without metadata. Returns name of processed file (extension could change with format)."""
+    storage = original.storage
+    root, _ = os.path.splitext(original.name)
+    name = f'{root}{PHOTO_RENDITIONS_FORMATS[PHOTO_ORIGINAL_FORMAT]}'
+    if name != original.name:
+        name = storage.get_available_name(name)
+
+    with Image.open(original.path) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        image.thumbnail(PHOTO_ORIGINAL_SIZE)
+
+        path = storage.path(name)
+        temp_path = get_temp_path(path)
+        image.save(temp_path, PHOTO_ORIGINAL_FORMAT, quality=PHOTO_ORIGINAL_QUALITY)
+        os.replace(temp_path, path)
+    return name
+
+
+def delete_photo_renditions(original):
+    for name in get_renditions_names(original.name):
+        original.storage.delete(name)
+
+
+def delete_photos_files(storage, originals_names):
+    """Deletion of photos files with their renditions, and then of all directories, that became empty."""
+    directories = set()
+    for name in originals_names:
+        for rendition_name in get_renditions_names(name):
+            storage.delete(rendition_name)
+        storage.delete(name)
+        directories.add(os.path.dirname(storage.path(name)))
+
+    # Removing empty folders level by level, starting from the deepest ones
+    while directories:
+        deepest_level = max(directory.count(os.sep) for directory in directories)
+        level_directories = {directory for directory in directories if directory.count(os.sep) == deepest_level}
+        directories -= level_directories
+        for directory in level_directories:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                continue
+            parent = os.path.dirname(directory)
+            if parent.startswith(MEDIA_ROOT) and parent != MEDIA_ROOT:
+                directories.add(parent)
+
+
 def get_photos_title(filename):
     return filename[:filename.rindex('.')]
 
 
-def get_zip(album, private_access=False):
-    temp = tempfile.TemporaryFile()
-    archive = zipfile.ZipFile(temp, 'w', zipfile.ZIP_DEFLATED)
+class ZipStreamBuffer:
+    """Unseekable file-like object for zipfile, which keeps written bytes until they are taken away."""
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
 
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+
+def get_zip_entries(album, private_access=False):
     if private_access:
         photos = album.photos_set.all()
     else:
         photos = album.photos_set.filter(is_private=False)
 
+    entries = []
     photos_filename_titles = []
     for photo in photos:
         filepath = os.path.abspath(os.path.join(BASE_DIR, photo.original.url[1:]))
@@ -43,12 +162,151 @@ def get_zip(album, private_access=False):
         photos_filename_titles.append(file_title)
 
         filename = file_title + os.path.splitext(filepath)[-1]
-        archive.write(filepath, filename)
+        entries.append((filepath, filename))
+
+    return entries
+
+
+def iter_zip(entries, save_path=None):
+    """Generates zip archive chunk by chunk. Photos are already compressed, so they are stored as is.
+    If save_path is set, archive is also saved there, after it was completely sent."""
+    buffer = ZipStreamBuffer()
+    save_file = temp_path = None
+    if save_path is not None:
+        temp_path = get_temp_path(save_path)
+        save_file = open(temp_path, 'wb')
+
+    def take_chunk():
+        chunk = buffer.pop()
+        if save_file is not None:
+            save_file.write(chunk)
+        return chunk
+
+    try:
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+            for filepath, filename in entries:
+                zip_info = zipfile.ZipInfo.from_file(filepath, filename)
+                zip_info.compress_type = zipfile.ZIP_STORED
+                with open(filepath, 'rb') as photo_file, archive.open(zip_info, 'w') as archive_file:
+                    while data := photo_file.read(ZIP_STREAMING_CHUNK_SIZE):
+                        archive_file.write(data)
+                        if buffer.size >= ZIP_STREAMING_CHUNK_SIZE:
+                            yield take_chunk()
+        yield take_chunk()
+    except BaseException:
+        if save_file is not None:
+            save_file.close()
+            os.remove(temp_path)
+        raise
+
+    if save_file is not None:
+        save_file.close()
+        os.replace(temp_path, save_path)
+
+
+def get_zip_cache_path(album, private_access=False):
+    """Path of cached archive of the current album version. Version changes with any photo in it."""
+    if private_access:
+        photos = album.photos_set.all()
+    else:
+        photos = album.photos_set.filter(is_private=False)
+    photos_data = list(photos.values_list('pk', 'title', 'original', 'time_update'))
+    version = hashlib.md5(repr(photos_data).encode()).hexdigest()
+    access = 'private' if private_access else 'public'
+    return os.path.join(ZIP_CACHE_ROOT, f'album_{album.pk}_{access}_{version}.zip')
+
+
+def get_zip(album, private_access=False):
+    """Returns opened cached archive of album, if it exists, or generator of archive."""
+    entries = get_zip_entries(album, private_access=private_access)
+    if not ZIP_CACHING:
+        return iter_zip(entries)
+
+    cache_path = get_zip_cache_path(album, private_access=private_access)
+    if os.path.exists(cache_path):
+        return open(cache_path, 'rb')
+
+    if not os.path.exists(ZIP_CACHE_ROOT):
+        os.makedirs(ZIP_CACHE_ROOT, exist_ok=True)
+
+    # Deleting archives of previous versions of album
+    old_versions_prefix = os.path.basename(cache_path).rsplit('_', 1)[0] + '_'
+    for filename in os.listdir(ZIP_CACHE_ROOT):
+        if filename.startswith(old_versions_prefix) and filename.endswith('.zip'):
+            os.remove(os.path.join(ZIP_CACHE_ROOT, filename))
 
-    archive.close()
-    temp.seek(0)
+    return iter_zip(entries, save_path=cache_path)
 
-    return FileWrapper(temp)
+
+def delete_expired_zip_cache():
+    if not os.path.exists(ZIP_CACHE_ROOT):
+        return
+    for filename in os.listdir(ZIP_CACHE_ROOT):
+        path = os.path.join(ZIP_CACHE_ROOT, filename)
+        if time.time() - os.path.getmtime(path) > ZIP_CACHE_EXPIRATION_SECONDS:
+            os.remove(path)
+
+
+def acquire_cache_lock(lock_key, timeout):
+    """Takes lock in cache, if it is free. Returns unique token of holder (or None), which is needed to release it."""
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, timeout):
+        return token
+
+
+def release_cache_lock(lock_key, token):
+    """Releases lock only if it is still held by token, so lock, which expired and was taken by another process,
+    is not released by the old holder."""
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def get_or_compute(key, compute, timeout=CACHE_DEFAULT_TIMEOUT):
+    """Returns cached value of key, or computes and caches it.
+    Only one process computes missing value (holding lock in cache), others wait for it to appear.
+    If waiting takes too long, value is computed without lock."""
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}_lock'
+    token = acquire_cache_lock(lock_key, CACHE_LOCK_SECONDS)
+    if token is None:
+        deadline = time.monotonic() + CACHE_LOCK_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(CACHE_LOCK_POLL_SECONDS)
+            value = cache.get(key)
+            if value is not None:
+                return value
+            token = acquire_cache_lock(lock_key, CACHE_LOCK_SECONDS)
+            if token is not None:
+                break
+        else:
+            return compute()
+
+    try:
+        value = compute()
+        cache.set(key, value, timeout)
+    finally:
+        release_cache_lock(lock_key, token)
+    return value
+
+
+def get_version(key):
+    """Version stamp of resource (time of its last change in nanoseconds), kept in cache.
+    Missing stamp is created by the first request after change or cache loss, so it is never older than data.
+    Stamp does not expire, as every new stamp makes cached responses of clients stale."""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key) or time.time_ns()
+    return version
+
+
+def bump_version(key):
+    # Version could be requested by another process before the changes were committed, so once more after commit
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
 
 
 def delete_from_favorites(user, obj):
@@ -91,6 +349,64 @@ class TruncatingCharField(models.CharField):
         return value
 
 
+class BulkAutoSlugField(AutoSlugField):
+    """AutoSlugField, that can prepare unique slugs for many new instances by one query, so they could be
+    bulk created. Prepared slugs are kept on saving, instead of being generated again."""
+    prepared_flag = '_slug_prepared'
+
+    def create_slug(self, model_instance, add):
+        if add and getattr(model_instance, self.prepared_flag, False):
+            return getattr(model_instance, self.attname)
+        return super().create_slug(model_instance, add)
+
+    def prepare_slugs(self, model_instances):
+        self.slug_len = self.max_length
+        original_slugs = [self._get_original_slug(instance) for instance in model_instances]
+        if not original_slugs:
+            return
+
+        # Slugs shortened to fit numeric ending still start with this prefix (so index is used)
+        prefixes = {slug[:self.max_length - 4].rstrip(self.separator) or self.separator for slug in original_slugs}
+        query = reduce(operator.or_, (Q(**{f'{self.attname}__startswith': prefix}) for prefix in prefixes))
+        # and only slugs, that could be generated for these instances, are taken: slug itself or its base
+        # (shortened to fit ending) with numeric ending
+        query &= Q(**{f'{self.attname}__regex': self._get_candidates_regex(original_slugs)})
+        taken_slugs = set(self.model._default_manager.filter(query).values_list(self.attname, flat=True))
+
+        for instance, original_slug in zip(model_instances, original_slugs):
+            for slug in self.slug_generator(original_slug, 2):
+                if slug and slug not in taken_slugs:
+                    break
+            taken_slugs.add(slug)
+            setattr(instance, self.attname, slug)
+            setattr(instance, self.prepared_flag, True)
+
+    def _get_candidates_regex(self, original_slugs):
+        endings_lengths = {len(f'{self.separator}{i}') for i in range(2, MAX_UNIQUE_QUERY_ATTEMPTS)}
+        bases = set()
+        for slug in original_slugs:
+            for ending_length in endings_lengths:
+                if len(slug) + ending_length > self.slug_len:
+                    bases.add(self._slug_strip(slug[:self.slug_len - ending_length]))
+                else:
+                    bases.add(slug)
+        return (f'^({"|".join(re.escape(slug) for slug in sorted(set(original_slugs) | bases))})'
+                f'({re.escape(self.separator)}[0-9]+)?$')
+
+    def _get_original_slug(self, model_instance):
+        populate_from = self._populate_from
+        if not isinstance(populate_from, (list, tuple)):
+            populate_from = (populate_from, )
+        slugify_function = getattr(model_instance, 'slugify_function', self.slugify_function)
+
+        slug = self.separator.join(self.slugify_func(self.get_slug_fields(model_instance, lookup_value),
+                                                     slugify_function=slugify_function)
+                                   for lookup_value in populate_from)
+        if self.max_length:
+            slug = slug[:self.max_length]
+        return self._slug_strip(slug)
+
+
 class AboutPageInfo:
     def __init__(self, section_id, text_first, img_url, title, paragraphs):
         self.section_id = section_id
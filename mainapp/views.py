@@ -4,7 +4,8 @@ import re
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ObjectDoesNotExist
-from django.http import HttpResponseNotFound, Http404, HttpResponseRedirect, FileResponse, HttpResponse
+from django.http import HttpResponseNotFound, Http404, HttpResponseRedirect, FileResponse, HttpResponse, \
+    StreamingHttpResponse
 from django.shortcuts import redirect, get_object_or_404
 from django.templatetags.static import static
 from django.urls import reverse_lazy
@@ -13,30 +14,28 @@ from django.views.generic.detail import SingleObjectMixin, DetailView
 from django.db.models import Count
 
 from accounts.models import User
-from photoalbums.settings import ALBUMS_AMOUNT_LIMIT, ALBUM_PHOTOS_AMOUNT_LIMIT
+from photoalbums.settings import ALBUMS_AMOUNT_LIMIT, ALBUM_PHOTOS_AMOUNT_LIMIT, MAIN_FEED_STALE_SECONDS
 from .forms import *
 from .utils import get_zip, delete_from_favorites, FavoritesPaginator, AboutPageInfo, get_photos_title
 from .tasks import album_deletion_task
+from .supporters import PhotosDeletionSupporter, MainFeedSupporter, AlbumCloneSupporter
 
 
 class MainPageView(ListView):
     model = Albums
     template_name = 'mainapp/index.html'
     context_object_name = 'albums'
-    extra_context = {'title': 'Main Page'}
+    extra_context = {'title': 'Main Page', 'feed_cache_seconds': MAIN_FEED_STALE_SECONDS}
 
     def get_queryset(self):
-        return self.model.objects.filter(
-            is_private=False,
-            photos__isnull=False,
-        ).select_related(
-            'owner',
-            'miniature',
-        ).annotate(
-            Count('photos'),
-        ).order_by(
-            '-time_create',
-        )[:16]
+        self.feed = MainFeedSupporter.get_feed()
+        return MainFeedSupporter.get_albums(self.feed)
+
+    def get_context_data(self, *, object_list=None, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update({'feed_version': self.feed['version'],
+                        'feed_albums_pks': [album.pk for album in self.object_list]})
+        return context
 
 
 class AboutPageView(TemplateView):
@@ -291,7 +290,8 @@ class AlbumCreateView(LoginRequiredMixin, CreateView):
                            location=form.cleaned_data['location'],
                            is_private=form.cleaned_data['is_private'],
                            album=self.object,
-                           original=image)
+                           original=image,
+                           processing_status=Photos.PROCESSING_UPLOADED)
             self.object.photos_set.add(photo, bulk=False)
 
     def _set_random_album_cover(self):
@@ -382,10 +382,10 @@ class AlbumEditView(LoginRequiredMixin, UpdateView):
         self.photos_formset.save()
 
         # deleting marked objects
-        for delete_value in self.photos_formset.deleted_objects:
-            if self.object.miniature and delete_value.pk == self.object.miniature.pk:
-                need_new_cover = True
-            delete_value.delete()
+        deleted_pks = [photo.pk for photo in self.photos_formset.deleted_objects]
+        if self.object.miniature and self.object.miniature.pk in deleted_pks:
+            need_new_cover = True
+        PhotosDeletionSupporter.delete_photos(Photos.objects.filter(pk__in=deleted_pks))
 
         # check if old cover become private
         self.object = self.get_object()
@@ -433,7 +433,8 @@ class AlbumEditView(LoginRequiredMixin, UpdateView):
                            location=form.cleaned_data['location'],
                            is_private=form.cleaned_data['is_private'],
                            album=self.object,
-                           original=image)
+                           original=image,
+                           processing_status=Photos.PROCESSING_UPLOADED)
             self.object.photos_set.add(photo, bulk=False)
 
     def _set_random_album_cover(self):
@@ -467,9 +468,11 @@ def download(request):
                 not private_access and not album.photos_set.filter(is_private=False).exists():
             return HttpResponse(status=204)
 
-        zip_wrapper = get_zip(album, private_access=private_access)
-        response = FileResponse(zip_wrapper,
-                                content_type='application/zip')
+        zip_content = get_zip(album, private_access=private_access)
+        if hasattr(zip_content, 'read'):
+            response = FileResponse(zip_content, content_type='application/zip')
+        else:
+            response = StreamingHttpResponse(zip_content, content_type='application/zip')
         response['Content-Disposition'] = f'attachment; filename={album.title}.zip'
 
         return response
@@ -514,7 +517,7 @@ class FavoritesView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         return self.model.objects.filter(
             in_users_favorites=self.request.user,
-        ).select_related('owner')
+        ).select_related('miniature', 'owner').annotate(Count('photos'))
 
 
 class FavoritesPhotosView(LoginRequiredMixin, ListView):
@@ -662,23 +665,6 @@ def save_album(request):
         return HttpResponse(status=400)
 
     delete_from_favorites(request.user, album)
-
-    album.pk, album.id = None, None
-    album._state.adding = True
-    album.owner = request.user
-    album.miniature = None
-    album.save()
-
-    for photo in Photos.objects.filter(album__slug=album_slug, is_private=False):
-        photo.pk, photo.id = None, None
-        photo.faces_extracted = False
-        photo._state.adding = True
-        photo.album = album
-        photo.save()
-
-    miniature = Albums.objects.get(slug=album_slug).miniature
-    if miniature is not None:
-        album.miniature = Photos.objects.get(original=miniature.original, album=album)
-        album.save()
+    AlbumCloneSupporter.clone_album(album, owner=request.user)
 
     return redirect('user_albums', username_slug=request.user.username_slug)
@@ -1,5 +1,7 @@
 import os
 from celery import Celery
+from celery.signals import celeryd_init
+from django.conf import settings
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'photoalbums.settings')
 
@@ -7,3 +9,21 @@ app = Celery('photoalbums')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
 app.autodiscover_tasks()
+
+
+def route_recognition_task(name, args, kwargs, options, task=None, **kw):
+    """Sends recognition task to queue of its stage."""
+    if name != 'recognition.tasks.recognition_task':
+        return
+    recognition_stage = args[1] if len(args) > 1 else kwargs['recognition_stage']
+    return {'queue': settings.RECOGNITION_STAGES_QUEUES[recognition_stage]}
+
+
+@celeryd_init.connect
+def set_recognition_worker_concurrency(sender, conf, options, **kwargs):
+    """Worker of recognition queues runs as many processes, as many tasks of them the scheduler starts at once
+    (their slots in RECOGNITION_QUEUES_SLOTS), if concurrency is not set by command line."""
+    slots = [settings.RECOGNITION_QUEUES_SLOTS[queue] for queue in options.get('queues') or []
+             if queue in settings.RECOGNITION_QUEUES_SLOTS]
+    if slots and not options.get('concurrency'):
+        conf.worker_concurrency = sum(slots)
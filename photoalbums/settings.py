@@ -92,6 +92,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'photoalbums.wsgi.application'
+ASGI_APPLICATION = 'photoalbums.asgi.application'
 
 
 # Database
@@ -208,23 +209,49 @@ MEDIA_URL = 'media/'
 
 TEMP_ROOT = os.path.join(MEDIA_ROOT, 'temp_photos')
 
+# Face thumbnails settings
+FACES_THUMBNAILS_ROOT = os.path.join(MEDIA_ROOT, 'faces')
+FACE_THUMBNAIL_SIZE = (160, 160)
+FACE_THUMBNAIL_QUALITY = 85
+FACE_THUMBNAIL_FORMATS = {'JPEG': '.jpg', 'WEBP': '.webp'}
+FACE_THUMBNAIL_CACHE_SECONDS = 60 * 60 * 24 * 30
+
+# Widths, to which photos with framed faces may be downscaled
+FRAMED_PHOTO_WIDTHS = (480, 768, 1024, 1280)
+
 ACCOUNT_ACTIVATION_DAYS = 7
 
 DATE_FORMAT = 'j N, Y'
 USE_L10N = False
 
-CACHE_ROOT = os.path.join(BASE_DIR, 'site_cache')
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': CACHE_ROOT,
-    }
-}
+# Main page feed cache settings (feed is served stale, while one request recomputes it)
+MAIN_FEED_ALBUMS_AMOUNT = 16
+MAIN_FEED_FRESH_SECONDS = 60 * 5
+MAIN_FEED_STALE_SECONDS = 60 * 60 * 24
+MAIN_FEED_REFRESH_LOCK_SECONDS = 60
+
+# Albums zip archives settings
+ZIP_STREAMING_CHUNK_SIZE = 64 * 1024
+ZIP_CACHING = True
+ZIP_CACHE_ROOT = os.path.join(BASE_DIR, 'zip_cache')
+ZIP_CACHE_EXPIRATION_SECONDS = 60 * 60 * 24
 
 # Uploads amount limits
 ALBUMS_AMOUNT_LIMIT = 5
 ALBUM_PHOTOS_AMOUNT_LIMIT = 50
 
+# Page sizes of API lists (client can ask for smaller or bigger page, but not bigger than maximum)
+API_ALBUMS_PAGE_SIZE = 12
+API_PHOTOS_PAGE_SIZE = 24
+API_FACES_PAGE_SIZE = 48
+API_MAX_PAGE_SIZE = 100
+
+# Amount of faces embedded in person details, the rest are listed by faces endpoint of person
+API_PERSON_FACES_LIMIT = 24
+
+# Maximum amount of objects changed by one request of bulk API endpoints
+API_BULK_OBJECTS_LIMIT = 500
+
 # Photo resize settings
 DJANGORESIZED_DEFAULT_SIZE = [1280, 1280]
 DJANGORESIZED_DEFAULT_SCALE = 1.0
@@ -234,6 +261,19 @@ DJANGORESIZED_DEFAULT_FORCE_FORMAT = 'JPEG'
 DJANGORESIZED_DEFAULT_FORMAT_EXTENSIONS = {'JPEG': ".jpg"}
 DJANGORESIZED_DEFAULT_NORMALIZE_ROTATION = True
 
+# Uploaded photos are stored raw and reduced to this size (with normalizing of rotation) in background
+PHOTO_ORIGINAL_SIZE = (1280, 1280)
+PHOTO_ORIGINAL_QUALITY = 90
+PHOTO_ORIGINAL_FORMAT = 'JPEG'
+
+# Smaller copies of photos (max width and height), shown in grids and covers
+PHOTO_RENDITIONS = {
+    'thumbnail': (400, 400),
+    'medium': (960, 960),
+}
+PHOTO_RENDITIONS_FORMATS = {'JPEG': '.jpg', 'WEBP': '.webp'}
+PHOTO_RENDITIONS_QUALITY = 82
+
 # gmail_send/settings.py
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -247,13 +287,69 @@ DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'familiealbums.team@gm
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER', "redis://redis:6379/0")
 CELERY_RESULT_BACKEND = os.environ.get('CELERY_BROKER', "redis://redis:6379/0")
 
+# Every queue is served by its own worker (with its own concurrency and prefetch, see docker-compose.yml),
+# so long image work of recognition never delays database stages, search or housekeeping.
+# Recognition task goes to queue of its stage, other tasks - by routes, or to default queue (photos processing).
+RECOGNITION_STAGES_QUEUES = {
+    1: 'recognition_images',
+    3: 'recognition_images',
+    6: 'recognition_db',
+    9: 'recognition_db',
+    0: 'search',
+    -1: 'housekeeping',
+}
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_ROUTES = (
+    {
+        'mainapp.tasks.album_deletion_task': {'queue': 'housekeeping'},
+        'recognition.tasks.delete_expired_temp_files': {'queue': 'housekeeping'},
+        'recognition.tasks.dispatch_recognition_tasks': {'queue': 'housekeeping'},
+        'mainapp.tasks.requeue_stale_uploaded_photos': {'queue': 'housekeeping'},
+    },
+    'photoalbums.celery.route_recognition_task',
+)
+# Tasks are long, so workers should not reserve them ahead (quick queues raise it by their command line)
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
 TEMP_FILES_EXPIRATION_SECONDS = 60 * 30
 
+# Uploaded photos, that are not processed in this time (their task was lost), are queued for processing again
+PHOTO_PROCESSING_STALE_SECONDS = 60 * 15
+
+# Scheduling of recognition tasks: not more tasks run at once in every celery queue, than its slots
+# (concurrency of its worker), and not more than RECOGNITION_USER_TASKS_LIMIT of one user in it,
+# others wait in queue.
+# Queue is ordered fairly between users, and tasks of bulk stages wait for tasks of interactive ones.
+# Running task refreshes its start time and lock every RECOGNITION_TASK_HEARTBEAT_SECONDS. Tasks, that did not
+# refresh them in RECOGNITION_TASK_STALE_SECONDS (as their worker died), are considered lost and free their slots.
+RECOGNITION_QUEUES_SLOTS = {
+    'recognition_images': 2,
+    'recognition_db': 4,
+    'search': 2,
+    'housekeeping': 2,
+}
+RECOGNITION_USER_TASKS_LIMIT = 2
+RECOGNITION_BULK_STAGES = (0, -1)
+RECOGNITION_TASK_HEARTBEAT_SECONDS = 60
+RECOGNITION_TASK_STALE_SECONDS = 10 * RECOGNITION_TASK_HEARTBEAT_SECONDS
+RECOGNITION_QUEUE_DISPATCH_SECONDS = 60
+# Launched task of album stage (or of person search) is locked, while it waits in queue and runs,
+# so repeated launches of it do nothing. Lock of dispatched task expires as its slot, if task is lost.
+RECOGNITION_TASK_LOCK_SECONDS = 60 * 60 * 2
+
 CELERY_BEAT_SCHEDULE = {
     "deletion_expired_temp_files_task": {
-        "task": "recognition.tasks.clear_cache_and_delete_expired_temp_files",
+        "task": "recognition.tasks.delete_expired_temp_files",
         "schedule": TEMP_FILES_EXPIRATION_SECONDS,
-    }
+    },
+    "dispatch_recognition_tasks_task": {
+        "task": "recognition.tasks.dispatch_recognition_tasks",
+        "schedule": RECOGNITION_QUEUE_DISPATCH_SECONDS,
+    },
+    "requeue_stale_uploaded_photos_task": {
+        "task": "mainapp.tasks.requeue_stale_uploaded_photos",
+        "schedule": PHOTO_PROCESSING_STALE_SECONDS,
+    },
 }
 
 # Redis settings
@@ -262,6 +358,39 @@ REDIS_PORT = 6379
 
 REDIS_DATA_EXPIRATION_SECONDS = 60 * 60
 
+# Faces, found on image file, are kept by digest of its content, so they are not searched again
+# on copies of the same photos (in copied albums)
+REDIS_DETECTED_FACES_EXPIRATION_SECONDS = 60 * 60 * 24 * 30
+
+# Pool of async redis client, shared by all status requests of ASGI worker.
+# Requests wait for free connection not longer than timeout.
+REDIS_ASYNC_MAX_CONNECTIONS = 50
+REDIS_ASYNC_POOL_TIMEOUT_SECONDS = 5
+
+# Data of completed recognition stage for API, cached by version of album processing state
+RECOGNITION_STATE_CACHE_SECONDS = 60 * 10
+
+# Cache settings (separate redis database, so recognition data is not mixed with cached values).
+# Increasing CACHE_VERSION makes all cached values of previous version unreachable.
+REDIS_CACHE_DB = 1
+CACHE_VERSION = 1
+CACHE_DEFAULT_TIMEOUT = 60 * 60
+CACHE_LOCK_SECONDS = 30
+CACHE_LOCK_WAIT_SECONDS = 5
+CACHE_LOCK_POLL_SECONDS = 0.05
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_CACHE_DB}',
+        'KEY_PREFIX': 'photoalbums',
+        'VERSION': CACHE_VERSION,
+        'TIMEOUT': CACHE_DEFAULT_TIMEOUT,
+    }
+}
+
+# Minimal interval between progress records of running recognition task
+PROGRESS_REPORT_INTERVAL_SECONDS = 1
+
 # Face Recognition settings
 FACE_RECOGNITION_TOLERANCE = 0.6
 PATTERN_EQUALITY_TOLERANCE = 0.75
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from mainapp.models import Albums
+from recognition.models import Patterns, People
+from recognition.utils import recount_albums_photos_amounts, recount_patterns_faces_amounts, recount_people_amounts
+
+
+class Command(BaseCommand):
+    help = "Recomputes stored amounts of photos of albums, faces of patterns and faces, photos and albums of people " \
+           "with their cover faces."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recount_albums_photos_amounts(Albums.objects.all())
+            recount_patterns_faces_amounts(Patterns.objects.all())
+            recount_people_amounts(People.objects.all())
+
+        self.stdout.write("Amounts of albums, patterns and people were recomputed.")
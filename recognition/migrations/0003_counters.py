@@ -0,0 +1,54 @@
+# Generated by Django 4.1.3 on 2026-10-19 15:44
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_faces(apps, schema_editor):
+    Faces = apps.get_model('recognition', 'Faces')
+    Patterns = apps.get_model('recognition', 'Patterns')
+    People = apps.get_model('recognition', 'People')
+
+    def faces_amount(related_field, counted_field='pk'):
+        return Coalesce(Subquery(Faces.objects.filter(
+            **{related_field: OuterRef('pk')},
+        ).order_by().values(related_field).annotate(
+            amount=Count(counted_field, distinct=True),
+        ).values('amount')), 0)
+
+    Patterns.objects.update(faces_amount=faces_amount('pattern'))
+    People.objects.update(faces_amount=faces_amount('pattern__person'),
+                          photos_amount=faces_amount('pattern__person', 'photo'),
+                          albums_amount=faces_amount('pattern__person', 'photo__album'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recognition', '0002_alter_people_owner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patterns',
+            name='faces_amount',
+            field=models.PositiveIntegerField(default=0, verbose_name='Faces amount'),
+        ),
+        migrations.AddField(
+            model_name='people',
+            name='albums_amount',
+            field=models.PositiveIntegerField(default=0, verbose_name='Albums amount'),
+        ),
+        migrations.AddField(
+            model_name='people',
+            name='faces_amount',
+            field=models.PositiveIntegerField(default=0, verbose_name='Faces amount'),
+        ),
+        migrations.AddField(
+            model_name='people',
+            name='photos_amount',
+            field=models.PositiveIntegerField(default=0, verbose_name='Photos amount'),
+        ),
+        migrations.RunPython(count_faces, migrations.RunPython.noop),
+    ]
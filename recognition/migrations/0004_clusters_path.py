@@ -0,0 +1,38 @@
+# Generated by Django 4.1.3 on 2026-10-19 15:53
+
+from django.db import migrations, models
+
+
+def fill_clusters_paths(apps, schema_editor):
+    Clusters = apps.get_model('recognition', 'Clusters')
+    parents_paths = {None: ('', -1)}
+    level = list(Clusters.objects.filter(parent__isnull=True))
+    while level:
+        for cluster in level:
+            parent_path, parent_depth = parents_paths[cluster.parent_id]
+            cluster.path = parent_path + f"{cluster.pk:010d}/"
+            cluster.depth = parent_depth + 1
+            parents_paths[cluster.pk] = (cluster.path, cluster.depth)
+        Clusters.objects.bulk_update(level, fields=['path', 'depth'])
+        level = list(Clusters.objects.filter(parent__pk__in=[cluster.pk for cluster in level]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recognition', '0003_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clusters',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Level in tree'),
+        ),
+        migrations.AddField(
+            model_name='clusters',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, max_length=255, verbose_name='Path from root cluster'),
+        ),
+        migrations.RunPython(fill_clusters_paths, migrations.RunPython.noop),
+    ]
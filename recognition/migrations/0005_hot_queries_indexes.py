@@ -0,0 +1,25 @@
+# Generated by Django 4.1.3 on 2026-10-19 15:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recognition', '0004_clusters_path'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='faces',
+            index=models.Index(fields=['pattern', 'photo', 'index'], name='faces_pattern_photo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patterns',
+            index=models.Index(fields=['cluster', 'is_registered_in_cluster'], name='patterns_cluster_reg_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='people',
+            index=models.Index(fields=['owner', 'name'], name='people_owner_name_idx'),
+        ),
+    ]
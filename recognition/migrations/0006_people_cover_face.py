@@ -0,0 +1,32 @@
+# Generated by Django 4.1.3 on 2026-10-19 18:20
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def set_cover_faces(apps, schema_editor):
+    Patterns = apps.get_model('recognition', 'Patterns')
+    People = apps.get_model('recognition', 'People')
+
+    People.objects.update(cover_face=Subquery(Patterns.objects.filter(
+        person=OuterRef('pk'),
+        central_face__isnull=False,
+    ).order_by('-faces_amount', 'pk').values('central_face')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recognition', '0005_hot_queries_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='people',
+            name='cover_face',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL,
+                                    related_name='+', to='recognition.faces', verbose_name='Cover face'),
+        ),
+        migrations.RunPython(set_cover_faces, migrations.RunPython.noop),
+    ]
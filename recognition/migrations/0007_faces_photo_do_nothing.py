@@ -0,0 +1,20 @@
+# Generated by Django 4.1.3 on 2026-10-19 17:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0006_photos_processing_status'),
+        ('recognition', '0006_people_cover_face'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='faces',
+            name='photo',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='mainapp.photos', verbose_name='Photo'),
+        ),
+    ]
@@ -11,7 +11,9 @@ class Faces(models.Model):
      Contains a link to the photo, coordinates of the location of the face on it
       and encoding of the face for recognition."""
 
-    photo = models.ForeignKey(Photos, on_delete=models.CASCADE, verbose_name='Photo')
+    # Faces of deleted photo are deleted together by pre_delete receiver of photos (FacesDeletionSupporter),
+    # so deletion of photo does not collect them and does not run signals of every face
+    photo = models.ForeignKey(Photos, on_delete=models.DO_NOTHING, verbose_name='Photo')
     index = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='Index on photo')
     slug = AutoSlugField(populate_from=['photo__slug', 'index'], unique=True, db_index=True, verbose_name='Face URL')
     pattern = models.ForeignKey('Patterns', on_delete=models.CASCADE, null=True, blank=True, verbose_name='Pattern')
@@ -28,6 +30,9 @@ class Faces(models.Model):
         verbose_name = 'Recognized Face'
         verbose_name_plural = 'Recognized Faces'
         ordering = ['photo', 'index']
+        indexes = [
+            models.Index(fields=['pattern', 'photo', 'index'], name='faces_pattern_photo_idx'),
+        ]
 
 
 class Patterns(models.Model):
@@ -39,11 +44,15 @@ class Patterns(models.Model):
     central_face = models.OneToOneField('Faces', blank=True, null=True, on_delete=models.SET_NULL,
                                         verbose_name='Central Face')
     is_registered_in_cluster = models.BooleanField(default=False, verbose_name='Is registered in cluster')
+    faces_amount = models.PositiveIntegerField(default=0, verbose_name='Faces amount')
 
     class Meta:
         verbose_name = 'Face Pattern'
         verbose_name_plural = 'Faces Patterns'
         ordering = ['person', 'central_face']
+        indexes = [
+            models.Index(fields=['cluster', 'is_registered_in_cluster'], name='patterns_cluster_reg_idx'),
+        ]
 
 
 class People(models.Model):
@@ -52,6 +61,11 @@ class People(models.Model):
     owner = models.ForeignKey(AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='people', verbose_name='User')
     name = models.CharField(max_length=100, verbose_name='Name')
     slug = AutoSlugField(populate_from='name', db_index=True, unique=True, verbose_name='Face URL')
+    faces_amount = models.PositiveIntegerField(default=0, verbose_name='Faces amount')
+    photos_amount = models.PositiveIntegerField(default=0, verbose_name='Photos amount')
+    albums_amount = models.PositiveIntegerField(default=0, verbose_name='Albums amount')
+    cover_face = models.ForeignKey('Faces', blank=True, null=True, on_delete=models.SET_NULL, related_name='+',
+                                   verbose_name='Cover face')
 
     def __str__(self):
         return self.name
@@ -63,18 +77,50 @@ class People(models.Model):
         verbose_name = 'Recognized Person'
         verbose_name_plural = 'Recognized People'
         ordering = ['owner', 'name']
+        indexes = [
+            models.Index(fields=['owner', 'name'], name='people_owner_name_idx'),
+        ]
 
 
 class Clusters(models.Model):
     """Module that unites the most similar patterns into groups
      to simplify searching people by encoding of their faces (patterns).
-     Fractal structure is used."""
+     Fractal structure is used. Path of cluster has step of path_step_length digits and slash for every level,
+     so tree is not deeper than max_depth (pool of the deepest cluster is not divided further)."""
+    path_step_length = 10
+    path_max_length = 255
+    max_depth = path_max_length // (path_step_length + 1) - 1
 
     parent = models.ForeignKey('self', blank=True, null=True, on_delete=models.PROTECT, verbose_name='Parent')
     center = models.ForeignKey('Patterns', blank=True, null=True, on_delete=models.SET_NULL,
                                verbose_name='Central Pattern')
     not_recalc_patt_del = models.PositiveSmallIntegerField(default=0,
                                                            verbose_name='Not recalculated patterns deletions')
+    path = models.CharField(max_length=path_max_length, blank=True, db_index=True,
+                            verbose_name='Path from root cluster')
+    depth = models.PositiveSmallIntegerField(default=0, verbose_name='Level in tree')
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+
+        # Path contains own pk, so it can be set only after cluster was created
+        if not self.path:
+            self.path = self.get_child_path(self.parent, self.pk)
+            self.depth = 0 if self.parent is None else self.parent.depth + 1
+            Clusters.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+
+    @classmethod
+    def get_child_path(cls, parent, pk):
+        return ('' if parent is None else parent.path) + f"{pk:0{cls.path_step_length}d}/"
+
+    def get_ancestors_pks(self):
+        return [int(step) for step in self.path.split('/')[:-2]]
+
+    def get_ancestors(self):
+        return Clusters.objects.filter(pk__in=self.get_ancestors_pks()).order_by('depth')
+
+    def get_descendants(self):
+        return Clusters.objects.filter(path__startswith=self.path).exclude(pk=self.pk)
 
     class Meta:
         verbose_name = 'Fractal Cluster of Patterns'
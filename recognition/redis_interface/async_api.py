@@ -0,0 +1,74 @@
+import asyncio
+import weakref
+
+from redis import asyncio as aioredis
+
+from photoalbums.settings import REDIS_HOST, REDIS_PORT, REDIS_ASYNC_MAX_CONNECTIONS, REDIS_ASYNC_POOL_TIMEOUT_SECONDS
+from .functional_api import RedisAPIProgress, RedisAPITasksQueue, RedisAPITaskLock
+
+
+# Connections of async client are bound to event loop, in which they were opened. So there is one shared pool
+# for every running loop: single one of ASGI worker, or short-lived ones, if async views are served by WSGI server.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_redis():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        pool = aioredis.BlockingConnectionPool(host=REDIS_HOST,
+                                               port=REDIS_PORT,
+                                               db=0,
+                                               decode_responses=True,
+                                               max_connections=REDIS_ASYNC_MAX_CONNECTIONS,
+                                               timeout=REDIS_ASYNC_POOL_TIMEOUT_SECONDS)
+        client = _async_clients[loop] = aioredis.Redis(connection_pool=pool)
+    return client
+
+
+class AsyncRedisAPIAlbumState:
+    @staticmethod
+    async def get_state(album_pk: int):
+        """Stage, status, finished status, progress and position in tasks queue of album processing,
+        read by one round trip."""
+        pipeline = get_async_redis().pipeline()
+        pipeline.hmget(f"album_{album_pk}", "current_stage", "status")
+        pipeline.get(f"album_{album_pk}_finished")
+        pipeline.hgetall(f"album_{album_pk}_progress")
+        pipeline.zrange(RedisAPITasksQueue.queue_key, 0, -1, withscores=True)
+        pipeline.zrange(RedisAPITasksQueue.running_key, 0, -1)
+        (stage, status), finished, progress, queue, running = await pipeline.execute()
+
+        return {
+            "stage": int(stage) if stage is not None else None,
+            "status": status,
+            "finished": finished,
+            "progress": RedisAPIProgress.parse_progress(progress),
+            "queue_position": RedisAPITasksQueue.parse_queue_position(queue, running, f"album_{album_pk}"),
+        }
+
+
+class AsyncRedisAPISearchState:
+    @staticmethod
+    async def get_state(person_pk: int):
+        """Is search of similar people running (or launched and waiting in tasks queue) or completed,
+        and its progress, read by one round trip."""
+        pipeline = get_async_redis().pipeline()
+        pipeline.exists(f"person_{person_pk}_searching")
+        pipeline.exists(RedisAPITaskLock.get_key(f"person_{person_pk}", 0))
+        pipeline.get(f"person_{person_pk}_processed_patterns_amount")
+        pipeline.exists(f"nearest_people_to_{person_pk}")
+        pipeline.hgetall(f"person_{person_pk}_progress")
+        pipeline.zrange(RedisAPITasksQueue.queue_key, 0, -1, withscores=True)
+        pipeline.zrange(RedisAPITasksQueue.running_key, 0, -1)
+        searching_now, search_launched, processed_patterns_amount, search_completed, progress, queue, running = \
+            await pipeline.execute()
+        queue_position = RedisAPITasksQueue.parse_queue_position(queue, running, f"person_{person_pk}")
+
+        return {
+            "searching_now": bool(searching_now or search_launched) or queue_position is not None,
+            "queue_position": queue_position,
+            "search_completed": bool(search_completed),
+            "processed_patterns_amount": int(processed_patterns_amount or 0),
+            "progress": RedisAPIProgress.parse_progress(progress),
+        }
@@ -1,13 +1,16 @@
 import pickle
 import re
+import time
+from collections import Counter
 from typing import List, Tuple
 import redis
 
 from django.http import Http404
 
-from photoalbums.settings import REDIS_DATA_EXPIRATION_SECONDS
+from photoalbums.settings import REDIS_DATA_EXPIRATION_SECONDS, RECOGNITION_QUEUES_SLOTS, RECOGNITION_STAGES_QUEUES, \
+    RECOGNITION_USER_TASKS_LIMIT, RECOGNITION_BULK_STAGES, RECOGNITION_TASK_STALE_SECONDS, RECOGNITION_TASK_LOCK_SECONDS
 from ..data_classes import FaceData, PatternData, PersonData
-from photoalbums.settings import REDIS_HOST, REDIS_PORT
+from photoalbums.settings import REDIS_HOST, REDIS_PORT, REDIS_DETECTED_FACES_EXPIRATION_SECONDS
 
 
 redis_instance = redis.Redis(host=REDIS_HOST,
@@ -20,14 +23,29 @@ redis_instance_raw = redis.Redis(host=REDIS_HOST,
                                  decode_responses=False)
 
 
+class RedisAPIStateVersion:
+    """Version of album processing state, that changes with every change of stage or status.
+    It is kept out of album hash (which is deleted after processing), so versions are never repeated."""
+    @staticmethod
+    def bump_state_version(album_pk: int, pipeline):
+        pipeline.set(f"album_{album_pk}_state_version", time.time_ns(), ex=REDIS_DATA_EXPIRATION_SECONDS)
+
+    @staticmethod
+    def get_state_version(album_pk: int):
+        return redis_instance.get(f"album_{album_pk}_state_version")
+
+
 class RedisAPIStage:
     @staticmethod
     def set_stage(album_pk: int, stage: int):
         if stage not in range(-1, 10):
             raise ValueError("Unsupported stage value")
 
-        redis_instance.hset(f"album_{album_pk}", "current_stage", stage)
-        redis_instance.expire(f"album_{album_pk}", REDIS_DATA_EXPIRATION_SECONDS)
+        pipeline = redis_instance.pipeline()
+        pipeline.hset(f"album_{album_pk}", "current_stage", stage)
+        pipeline.expire(f"album_{album_pk}", REDIS_DATA_EXPIRATION_SECONDS)
+        RedisAPIStateVersion.bump_state_version(album_pk, pipeline)
+        pipeline.execute()
 
     @staticmethod
     def get_stage(album_pk: int):
@@ -50,8 +68,11 @@ class RedisAPIStatus:
         if status not in ("processing", "completed"):
             raise ValueError("status should be \"processing\" or \"completed\"")
 
-        redis_instance.hset(f"album_{album_pk}", "status", status)
-        redis_instance.expire(f"album_{album_pk}", REDIS_DATA_EXPIRATION_SECONDS)
+        pipeline = redis_instance.pipeline()
+        pipeline.hset(f"album_{album_pk}", "status", status)
+        pipeline.expire(f"album_{album_pk}", REDIS_DATA_EXPIRATION_SECONDS)
+        RedisAPIStateVersion.bump_state_version(album_pk, pipeline)
+        pipeline.execute()
 
     @staticmethod
     def get_status(album_pk: int):
@@ -100,6 +121,220 @@ class RedisAPIProcessedPhotos:
         redis_instance.expire(f"album_{album_pk}", REDIS_DATA_EXPIRATION_SECONDS)
 
 
+class RedisAPIProgress:
+    @staticmethod
+    def set_progress(object_key: str, stage: int, done: int, total: int, started_at: float):
+        redis_instance.hset(f"{object_key}_progress", mapping={
+            "stage": stage,
+            "done": done,
+            "total": total,
+            "started_at": started_at,
+            "updated_at": time.time(),
+        })
+        redis_instance.expire(f"{object_key}_progress", REDIS_DATA_EXPIRATION_SECONDS)
+
+    @classmethod
+    def get_progress(cls, object_key: str):
+        return cls.parse_progress(redis_instance.hgetall(f"{object_key}_progress"))
+
+    @staticmethod
+    def parse_progress(progress: dict):
+        if not progress:
+            return None
+
+        done, total = int(progress["done"]), int(progress["total"])
+        started_at, updated_at = float(progress["started_at"]), float(progress["updated_at"])
+        now = time.time() if done < total else updated_at
+
+        # Estimating remaining time by average speed of already done units
+        if done and done < total:
+            remaining = (updated_at - started_at) / done * (total - done) - (now - updated_at)
+            remaining = round(max(remaining, 0), 1)
+        elif done >= total:
+            remaining = 0
+        else:
+            remaining = None
+
+        return {
+            "stage": int(progress["stage"]),
+            "done": done,
+            "total": total,
+            "elapsed_seconds": round(now - started_at, 1),
+            "remaining_seconds": remaining,
+        }
+
+    @staticmethod
+    def delete_progress(object_key: str):
+        redis_instance.delete(f"{object_key}_progress")
+
+
+class RedisAPITasksQueue:
+    """Recognition tasks, waiting for free slot, and running ones. Task is kept in sorted set
+    as "<user_pk>:<stage>:<object_pk>" member, scored by time of queueing (or start, refreshed by heartbeats)."""
+    queue_key = "recognition_tasks_queue"
+    running_key = "recognition_tasks_running"
+
+    @staticmethod
+    def make_task(user_pk: int, stage: int, object_pk: int):
+        return f"{user_pk}:{stage}:{object_pk}"
+
+    @staticmethod
+    def parse_task(task: str):
+        user_pk, stage, object_pk = map(int, task.split(":"))
+        return user_pk, stage, object_pk
+
+    @staticmethod
+    def get_object_key(stage: int, object_pk: int):
+        return f"person_{object_pk}" if stage == 0 else f"album_{object_pk}"
+
+    @classmethod
+    def add_task(cls, user_pk: int, stage: int, object_pk: int):
+        redis_instance.zadd(cls.queue_key, {cls.make_task(user_pk, stage, object_pk): time.time()}, nx=True)
+
+    @classmethod
+    def finish_task(cls, user_pk: int, stage: int, object_pk: int):
+        redis_instance.zrem(cls.running_key, cls.make_task(user_pk, stage, object_pk))
+
+    @classmethod
+    def refresh_task(cls, user_pk: int, stage: int, object_pk: int):
+        # Task, that was already considered lost, is not returned to running ones
+        redis_instance.zadd(cls.running_key, {cls.make_task(user_pk, stage, object_pk): time.time()}, xx=True)
+
+    @classmethod
+    def pop_tasks_to_start(cls):
+        """Moves tasks, that can be started now, from queue to running ones, and returns them parsed.
+        Queue is read and changed in optimistic transaction, so concurrent dispatchers never start task twice."""
+        def pop(pipeline):
+            now = time.time()
+            queue = pipeline.zrange(cls.queue_key, 0, -1, withscores=True)
+            running = pipeline.zrange(cls.running_key, 0, -1, withscores=True)
+            lost = [task for task, started_at in running if now - started_at > RECOGNITION_TASK_STALE_SECONDS]
+            running = [task for task, started_at in running if now - started_at <= RECOGNITION_TASK_STALE_SECONDS]
+            tasks = cls._choose_tasks_to_start(queue, running)
+
+            pipeline.multi()
+            if lost:
+                pipeline.zrem(cls.running_key, *lost)
+            if tasks:
+                pipeline.zrem(cls.queue_key, *tasks)
+                pipeline.zadd(cls.running_key, {task: now for task in tasks})
+            return tasks
+
+        tasks = redis_instance.transaction(pop, cls.queue_key, cls.running_key, value_from_callable=True)
+        return list(map(cls.parse_task, tasks))
+
+    @classmethod
+    def get_queue_position(cls, object_key: str):
+        pipeline = redis_instance.pipeline()
+        pipeline.zrange(cls.queue_key, 0, -1, withscores=True)
+        pipeline.zrange(cls.running_key, 0, -1)
+        queue, running = pipeline.execute()
+        return cls.parse_queue_position(queue, running, object_key)
+
+    @classmethod
+    def get_celery_queue(cls, task: str):
+        return RECOGNITION_STAGES_QUEUES[cls.parse_task(task)[1]]
+
+    @classmethod
+    def parse_queue_position(cls, queue: List[Tuple[str, float]], running: List[str], object_key: str):
+        """Position (from 1) of task of object among ordered tasks of its celery queue, or None, if it is not queued."""
+        celery_queues_positions = Counter()
+        for task in cls.order_queue(queue, running):
+            celery_queue = cls.get_celery_queue(task)
+            celery_queues_positions[celery_queue] += 1
+            _, stage, object_pk = cls.parse_task(task)
+            if cls.get_object_key(stage, object_pk) == object_key:
+                return celery_queues_positions[celery_queue]
+
+    @classmethod
+    def order_queue(cls, queue: List[Tuple[str, float]], running: List[str]):
+        """Tasks of interactive stages go before bulk ones. Then users go in turns: n-th waiting task of user
+        has turn n plus amount of his running tasks in the same celery queue. Tasks with same turn go
+        by time of queueing."""
+        users_running_amounts = Counter((cls.parse_task(task)[0], cls.get_celery_queue(task)) for task in running)
+        users_queued_amounts = Counter()
+        order_keys = {}
+        for task, queued_at in sorted(queue, key=lambda item: item[1]):
+            user_pk, stage, _ = cls.parse_task(task)
+            celery_queue = cls.get_celery_queue(task)
+            is_bulk = stage in RECOGNITION_BULK_STAGES
+            turn = users_running_amounts[user_pk, celery_queue] + users_queued_amounts[user_pk, celery_queue, is_bulk]
+            order_keys[task] = (is_bulk, turn, queued_at)
+            users_queued_amounts[user_pk, celery_queue, is_bulk] += 1
+
+        return sorted(order_keys, key=order_keys.get)
+
+    @classmethod
+    def _choose_tasks_to_start(cls, queue: List[Tuple[str, float]], running: List[str]):
+        """Ordered tasks are taken, while their celery queue has free slots, and their user has not reached limit
+        of running tasks in it. So tasks of one celery queue never wait for tasks of another."""
+        celery_queues_running_amounts = Counter(map(cls.get_celery_queue, running))
+        users_running_amounts = Counter((cls.parse_task(task)[0], cls.get_celery_queue(task)) for task in running)
+
+        tasks = []
+        for task in cls.order_queue(queue, running):
+            user_pk = cls.parse_task(task)[0]
+            celery_queue = cls.get_celery_queue(task)
+            if celery_queues_running_amounts[celery_queue] >= RECOGNITION_QUEUES_SLOTS[celery_queue] or \
+                    users_running_amounts[user_pk, celery_queue] >= RECOGNITION_USER_TASKS_LIMIT:
+                continue
+            celery_queues_running_amounts[celery_queue] += 1
+            users_running_amounts[user_pk, celery_queue] += 1
+            tasks.append(task)
+
+        return tasks
+
+
+class RedisAPITaskLock:
+    """Lock of recognition task of object and stage. It is set by first launch of task and held until task finishes,
+    so repeated launches (by double clicks or retries of clients) do nothing."""
+    @staticmethod
+    def get_key(object_key: str, stage: int):
+        return f"{object_key}_stage_{stage}_task_lock"
+
+    @classmethod
+    def acquire(cls, object_key: str, stage: int):
+        return bool(redis_instance.set(cls.get_key(object_key, stage), time.time(),
+                                       nx=True, ex=RECOGNITION_TASK_LOCK_SECONDS))
+
+    @classmethod
+    def release(cls, object_key: str, stage: int):
+        redis_instance.delete(cls.get_key(object_key, stage))
+
+    @classmethod
+    def refresh(cls, object_key: str, stage: int):
+        """Lock of dispatched task expires, if task is not refreshing it, as its slot."""
+        redis_instance.expire(cls.get_key(object_key, stage), RECOGNITION_TASK_STALE_SECONDS)
+
+    @classmethod
+    def is_locked(cls, object_key: str, stage: int):
+        return bool(redis_instance.exists(cls.get_key(object_key, stage)))
+
+
+class RedisAPIAlbumState:
+    @staticmethod
+    def get_state(album_pk: int):
+        """Stage, status, finished status, progress, position in tasks queue and version of album processing,
+        read by one round trip."""
+        pipeline = redis_instance.pipeline()
+        pipeline.hmget(f"album_{album_pk}", "current_stage", "status")
+        pipeline.get(f"album_{album_pk}_finished")
+        pipeline.hgetall(f"album_{album_pk}_progress")
+        pipeline.get(f"album_{album_pk}_state_version")
+        pipeline.zrange(RedisAPITasksQueue.queue_key, 0, -1, withscores=True)
+        pipeline.zrange(RedisAPITasksQueue.running_key, 0, -1)
+        (stage, status), finished, progress, version, queue, running = pipeline.execute()
+
+        return {
+            "stage": int(stage) if stage is not None else None,
+            "status": status,
+            "finished": finished,
+            "progress": RedisAPIProgress.parse_progress(progress),
+            "queue_position": RedisAPITasksQueue.parse_queue_position(queue, running, f"album_{album_pk}"),
+            "version": version,
+        }
+
+
 class RedisAPIPhotoDataGetter:
     @staticmethod
     def get_face_locations_in_photo(photo_pk: int):
@@ -135,6 +370,25 @@ class RedisAPIPhotoDataGetter:
     def get_faces_amount_in_photo(photo_pk: int):
         return int(redis_instance.hget(f"photo_{photo_pk}", "faces_amount"))
 
+    @staticmethod
+    def get_faces_amounts_in_photos(photos_pks: List[int]):
+        pipeline = redis_instance.pipeline()
+        for photo_pk in photos_pks:
+            pipeline.hget(f"photo_{photo_pk}", "faces_amount")
+        return [int(amount) for amount in pipeline.execute()]
+
+
+class RedisAPIDetectedFaces:
+    @staticmethod
+    def get_detected_faces(file_digest: str):
+        data = redis_instance_raw.get(f"detected_faces_{file_digest}")
+        return None if data is None else pickle.loads(data)
+
+    @staticmethod
+    def set_detected_faces(file_digest: str, data: List[Tuple]):
+        redis_instance_raw.set(f"detected_faces_{file_digest}", pickle.dumps(data),
+                               ex=REDIS_DETECTED_FACES_EXPIRATION_SECONDS)
+
 
 class RedisAPIPhotoDataSetter:
     @staticmethod
@@ -419,6 +673,7 @@ class RedisAPIAlbumDataSetter:
             redis_instance.delete(f"album_{album_pk}_finished")
         else:
             redis_instance.delete(f"album_{album_pk}")
+        redis_instance.delete(f"album_{album_pk}_progress")
         redis_instance.delete(f"album_{album_pk}_photos")
         redis_instance.delete(*[f"photo_{pk}" for pk in photo_pks])
 
@@ -644,6 +899,6 @@ class RedisAPISearchSetter:
 
     @staticmethod
     def prepare_to_search(person_pk):
-        redis_instance.delete(f"nearest_people_to_{person_pk}")
+        redis_instance.delete(f"nearest_people_to_{person_pk}", f"person_{person_pk}_progress")
         redis_instance.set(f"person_{person_pk}_processed_patterns_amount", 0)
         redis_instance.expire(f"person_{person_pk}_processed_patterns_amount", REDIS_DATA_EXPIRATION_SECONDS)
@@ -1,13 +1,14 @@
 from .functional_api import RedisAPIStage, RedisAPIStatus, RedisAPIProcessedPhotos, RedisAPIAlbumDataChecker, \
     RedisAPIFullAlbumPeopleDataGetter, RedisAPIPhotoDataGetter, RedisAPIPersonDataCreator, RedisAPIPersonDataSetter, \
     RedisAPIFinished, RedisAPIMatchesSetter, RedisAPIPatternDataSetter, RedisAPIPhotoSlug, RedisAPIPhotoDataSetter, \
-    RedisAPISearchSetter, RedisAPIAlbumDataSetter, RedisAPIMatchesChecker
+    RedisAPISearchSetter, RedisAPIAlbumDataSetter, RedisAPIMatchesChecker, RedisAPIProgress, RedisAPIDetectedFaces
 
 
 class RedisAPIBaseHandler(
     RedisAPIStage,
     RedisAPIStatus,
     RedisAPIProcessedPhotos,
+    RedisAPIProgress,
 ):
     pass
 
@@ -27,6 +28,7 @@ class RedisAPIStage1Handler(
     RedisAPIBaseHandler,
     RedisAPIPhotoSlug,
     RedisAPIPhotoDataSetter,
+    RedisAPIDetectedFaces,
     RedisAPIFinished,
 ):
     pass
@@ -56,5 +58,5 @@ class RedisAPIStage9Handler(
     pass
 
 
-class RedisAPISearchHandler(RedisAPISearchSetter):
+class RedisAPISearchHandler(RedisAPISearchSetter, RedisAPIProgress):
     pass
@@ -2,10 +2,10 @@ from .functional_api import RedisAPIFinished, RedisAPIStatus, RedisAPIPhotoSlug,
     RedisAPIStage, RedisAPIProcessedPhotos, RedisAPIPhotoDataChecker, RedisAPIPhotoDataGetter, RedisAPIPhotoDataSetter, \
     RedisAPIAlbumDataGetter, RedisAPIAlbumDataSetter, RedisAPIPatternDataSetter, RedisAPIPatternDataGetter, \
     RedisAPIPatternDataChecker, RedisAPIPersonDataSetter, RedisAPIMatchesChecker, RedisAPIMatchesGetter, \
-    RedisAPIMatchesSetter, RedisAPISearchGetter
+    RedisAPIMatchesSetter, RedisAPISearchGetter, RedisAPIProgress
 
 
-class RedisAPIBaseView(RedisAPIStage, RedisAPIStatus):
+class RedisAPIBaseView(RedisAPIStage, RedisAPIStatus, RedisAPIProgress):
     pass
 
 
@@ -90,5 +90,5 @@ class RedisAPIStage9View(
     pass
 
 
-class RedisAPIStageSearchView(RedisAPISearchGetter):
+class RedisAPIStageSearchView(RedisAPISearchGetter, RedisAPIProgress):
     pass
@@ -1,14 +1,19 @@
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from .models import Faces, Patterns, People
-from .supporters import ManageClustersSupporter
-from .utils import recalculate_pattern_center
+from .supporters import ManageClustersSupporter, FacesDeletionSupporter
+from .utils import recalculate_pattern_center, delete_faces_thumbnails, recount_patterns_faces_amounts, \
+    recount_people_amounts, bump_people_versions, get_face_thumbnail_name
 
 
 @receiver(post_delete, sender=Faces)
 def faces_delete(sender, instance, **kwargs):
-    """Deletion empty patterns or recalculating its center"""
+    """Deletion face thumbnails and empty patterns or recalculating its center"""
+    if FacesDeletionSupporter.signals_suspended():
+        return
+
+    delete_faces_thumbnails([get_face_thumbnail_name(instance.pk, instance.slug)])
 
     try:
         pattern = instance.pattern
@@ -19,10 +24,15 @@ def faces_delete(sender, instance, **kwargs):
             instance.pattern.delete()
         else:
             recalculate_pattern_center(pattern=pattern)
+            recount_patterns_faces_amounts(Patterns.objects.filter(pk=pattern.pk))
+            recount_people_amounts(People.objects.filter(pk=pattern.person_id))
 
 
 @receiver(post_delete, sender=Patterns)
 def patterns_delete(sender, instance, **kwargs):
+    if FacesDeletionSupporter.signals_suspended():
+        return
+
     # If pattern's person empty now - deleting it
     try:
         person = instance.person
@@ -30,5 +40,13 @@ def patterns_delete(sender, instance, **kwargs):
         person = None
     if person and not person.patterns_set.exists():
         instance.person.delete()
+    elif person:
+        recount_people_amounts(People.objects.filter(pk=person.pk))
 
     ManageClustersSupporter.manage_clusters_after_pattern_deletion(instance)
+
+
+@receiver(post_save, sender=People)
+@receiver(post_delete, sender=People)
+def people_change(sender, instance, **kwargs):
+    bump_people_versions([instance.owner_id])
@@ -1,12 +1,21 @@
 import os
 import pickle
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
 import face_recognition as fr
+from django.db import transaction
+from django.db.models import CharField, Count, F, Value
+from django.db.models.functions import Concat, Substr
 
 from mainapp.models import Photos
 from photoalbums.settings import TEMP_ROOT, CLUSTER_LIMIT, MINIMAL_CLUSTER_TO_RECALCULATE, \
-    UNREGISTERED_PATTERNS_CLUSTER_RELEVANT_LIMIT, CACHE_ROOT
-from .models import Faces, Patterns, Clusters
+    UNREGISTERED_PATTERNS_CLUSTER_RELEVANT_LIMIT
+from .models import Faces, Patterns, People, Clusters
 from .redis_interface.functional_api import RedisAPIAlbumDataSetter
+from .utils import recalculate_pattern_center, delete_faces_thumbnails, recount_patterns_faces_amounts, \
+    recount_people_amounts, get_face_thumbnail_name
 
 
 class DataDeletionSupporter:
@@ -39,17 +48,12 @@ class DataDeletionSupporter:
 
     @staticmethod
     def _clear_db_album_data(album_pk):
-        for face in Faces.objects.filter(photo__album__pk=album_pk):
-            Faces.objects.get(pk=face.pk).delete()
-
-    @staticmethod
-    def clear_cache():
-        os.system(f"rm {CACHE_ROOT}/*")
+        FacesDeletionSupporter.delete_faces(Faces.objects.filter(photo__album__pk=album_pk))
 
 
 class ManageClustersSupporter:
     @classmethod
-    def form_cluster_structure(cls, new_patterns_instances):
+    def form_cluster_structure(cls, new_patterns_instances, on_pattern_registered=None):
         for pattern in new_patterns_instances:
             # Root cluster and its pool
             root_cluster = Clusters.objects.get(pk=1)
@@ -59,7 +63,7 @@ class ManageClustersSupporter:
             pool_clusters = root_pool_clusters
             pool_patterns = root_pool_patterns
             cluster = root_cluster
-            while not len(pool_clusters) + len(pool_patterns) < CLUSTER_LIMIT:
+            while cluster.depth < Clusters.max_depth and not len(pool_clusters) + len(pool_patterns) < CLUSTER_LIMIT:
                 nearest = cls._get_nearest_node(pool_clusters, pool_patterns, pattern)
                 if isinstance(nearest, Clusters):
                     cluster = nearest
@@ -82,6 +86,9 @@ class ManageClustersSupporter:
 
             cls.recalculate_center(cluster)
 
+            if on_pattern_registered is not None:
+                on_pattern_registered()
+
     @classmethod
     def _get_nearest_node(cls, pool_clusters, pool_patterns, pattern):
         if pool_clusters and pool_patterns:
@@ -172,98 +179,122 @@ class ManageClustersSupporter:
 
     @classmethod
     def manage_clusters_after_pattern_deletion(cls, pattern_instance):
+        if pattern_instance.cluster_id is not None:
+            cls.manage_clusters_after_patterns_deletion({pattern_instance.cluster_id: 1})
+
+    @classmethod
+    def manage_clusters_after_patterns_deletion(cls, deleted_patterns_amounts):
+        """Restructuring clusters, that lost patterns. Receives dict {cluster_pk: deleted_patterns_amount}.
+        Each cluster is handled once, starting from the latest created ones (they are usually deeper)."""
+        for cluster_pk in sorted(deleted_patterns_amounts, reverse=True):
+            try:
+                cluster = Clusters.objects.select_related('parent', 'center').get(pk=cluster_pk)
+            except Clusters.DoesNotExist:
+                # Cluster was already united with another one while handling previous clusters
+                continue
+            cls._manage_cluster_after_patterns_deletion(cluster, deleted_patterns_amounts[cluster_pk])
+
+    @classmethod
+    def _manage_cluster_after_patterns_deletion(cls, cluster, deleted_patterns_amount):
         # --------------------------------------------------------------------------------------------------------------
         # !!! Follow checks must go in this exact order and if success - end function !!!
         # --------------------------------------------------------------------------------------------------------------
         # If it is possible to readdress cluster's pool to its parent --------------------------------------------------
         # (parent should absorb cluster's pool; cluster should be deleted)
-        if pattern_instance.cluster.parent and \
-                pattern_instance.cluster.parent.patterns_set.count() +\
-                pattern_instance.cluster.parent.clusters_set.count() +\
-                pattern_instance.cluster.patterns_set.count() +\
-                pattern_instance.cluster.clusters_set.count() < CLUSTER_LIMIT:
-            cls._give_pool_to_parent(pattern_instance)
+        if cluster.parent and \
+                cluster.parent.patterns_set.count() +\
+                cluster.parent.clusters_set.count() +\
+                cluster.patterns_set.count() +\
+                cluster.clusters_set.count() < CLUSTER_LIMIT:
+            cls._give_pool_to_parent(cluster)
             return
 
         # If it is possible to absorb one of the child clusters --------------------------------------------------------
         # (cluster should absorb child clusters' pool; child cluster should be deleted)
-        min_pool_size, smallest_child = cls._get_smallest_child(pattern_instance)
-        if min_pool_size + pattern_instance.cluster.patterns_set.count() +\
-                pattern_instance.cluster.clusters_set.count() < CLUSTER_LIMIT:
-            cls._absorb_child(pattern_instance, child=smallest_child)
+        min_pool_size, smallest_child = cls._get_smallest_child(cluster)
+        if min_pool_size + cluster.patterns_set.count() + cluster.clusters_set.count() < CLUSTER_LIMIT:
+            cls._absorb_child(cluster, child=smallest_child)
             return
 
         # If after deletion will be left single pattern in cluster -----------------------------------------------------
         # (cluster should be deleted, pattern should be moved up to its parent)
-        if pattern_instance.cluster.parent \
-                and not pattern_instance.cluster.clusters_set.exists()\
-                and pattern_instance.cluster.patterns_set.count() == 1:
-            cls._move_last_pattern_up(pattern_instance)
+        if cluster.parent \
+                and not cluster.clusters_set.exists()\
+                and cluster.patterns_set.count() == 1:
+            cls._move_last_pattern_up(cluster)
             return
 
         # If it is last pattern in root cluster ------------------------------------------------------------------------
         # (pattern will be just deleted, cluster's change counter will be set 0) ---------------------------------------
-        if pattern_instance.cluster.parent is None and not pattern_instance.cluster.patterns_set.exists():
-            cls._delete_last_pattern(pattern_instance)
+        if cluster.parent is None and not cluster.patterns_set.exists():
+            cls._delete_last_pattern(cluster)
             return
 
         # If this is just regular deletion of pattern ------------------------------------------------------------------
-        cls._simple_delete(pattern_instance)
+        cls._simple_delete(cluster, deleted_patterns_amount)
         return
         # --------------------------------------------------------------------------------------------------------------
 
     @classmethod
-    def _give_pool_to_parent(cls, pattern_instance):
-        parent = pattern_instance.cluster.parent
-        clusters = pattern_instance.cluster.clusters_set.all()
-        patterns = pattern_instance.cluster.patterns_set.all()
-        for cluster in clusters:
-            cluster.parent = parent
+    def _give_pool_to_parent(cls, cluster):
+        parent = cluster.parent
+        clusters = cluster.clusters_set.all()
+        patterns = cluster.patterns_set.all()
+        for child_cluster in clusters:
+            child_cluster.parent = parent
         for pattern in patterns:
             pattern.cluster = parent
             pattern.is_registered_in_cluster = False
         Clusters.objects.bulk_update(clusters, fields=['parent'])
         Patterns.objects.bulk_update(patterns, fields=['cluster', 'is_registered_in_cluster'])
+        cls._lift_descendants(cluster, new_parent=parent)
 
         # Registration of added subclusters
         parent.not_recalc_patt_del = parent.not_recalc_patt_del + len(clusters)
         parent.save(update_fields=['not_recalc_patt_del'])
 
-        pattern_instance.cluster.delete()
+        cluster.delete()
 
         was_central_pattern = parent.center is None
         cls.recalculate_center(parent, need_check_changes=not was_central_pattern)
 
     @classmethod
-    def _absorb_child(cls, pattern_instance, child):
-        current_cluster = pattern_instance.cluster
+    def _absorb_child(cls, cluster, child):
         clusters = child.clusters_set.all()
         patterns = child.patterns_set.all()
-        for cluster in clusters:
-            cluster.parent = current_cluster
+        for child_cluster in clusters:
+            child_cluster.parent = cluster
         for pattern in patterns:
-            pattern.cluster = current_cluster
+            pattern.cluster = cluster
             pattern.is_registered_in_cluster = False
         Clusters.objects.bulk_update(clusters, fields=['parent'])
         Patterns.objects.bulk_update(patterns, fields=['cluster', 'is_registered_in_cluster'])
+        cls._lift_descendants(child, new_parent=cluster)
 
         # Registration of added subclusters
-        current_cluster.not_recalc_patt_del = current_cluster.not_recalc_patt_del + len(clusters)
-        current_cluster.save(update_fields=['not_recalc_patt_del'])
+        cluster.not_recalc_patt_del = cluster.not_recalc_patt_del + len(clusters)
+        cluster.save(update_fields=['not_recalc_patt_del'])
 
         child.delete()
 
-        was_central_pattern = pattern_instance.cluster.center is None
-        cls.recalculate_center(current_cluster, need_check_changes=not was_central_pattern)
+        was_central_pattern = cluster.center is None
+        cls.recalculate_center(cluster, need_check_changes=not was_central_pattern)
+
+    @staticmethod
+    def _lift_descendants(cluster, new_parent):
+        """Moving all subtrees of cluster one level up, under new_parent, by replacing their paths prefix."""
+        Clusters.objects.filter(path__startswith=cluster.path).exclude(pk=cluster.pk).update(
+            path=Concat(Value(new_parent.path), Substr('path', len(cluster.path) + 1), output_field=CharField()),
+            depth=F('depth') - 1,
+        )
 
     @classmethod
-    def _get_smallest_child(cls, pattern_instance):
-        current_cluster = pattern_instance.cluster
-        children_clusters = current_cluster.clusters_set.all()
+    def _get_smallest_child(cls, cluster):
+        children_clusters = cluster.clusters_set.all()
         min_pool_size = CLUSTER_LIMIT
         smallest_index = 0
-        for i, cluster in enumerate(children_clusters):
-            pool_size = cluster.patterns_set.count() + cluster.clusters_set.count()
+        for i, child_cluster in enumerate(children_clusters):
+            pool_size = child_cluster.patterns_set.count() + child_cluster.clusters_set.count()
             if pool_size < min_pool_size:
                 min_pool_size = pool_size
                 smallest_index = i
@@ -273,32 +304,105 @@ class ManageClustersSupporter:
         return min_pool_size, smallest_child
 
     @classmethod
-    def _move_last_pattern_up(cls, pattern_instance):
-        parent = pattern_instance.cluster.parent
-        current_cluster = pattern_instance.cluster
-        last_pattern = current_cluster.patterns_set.get()
+    def _move_last_pattern_up(cls, cluster):
+        parent = cluster.parent
+        last_pattern = cluster.patterns_set.get()
 
         last_pattern.cluster = parent
         last_pattern.is_registered_in_cluster = False
         last_pattern.save(update_fields=['cluster', 'is_registered_in_cluster'])
 
-        current_cluster.delete()
+        cluster.delete()
 
         was_central_pattern = parent.center is None
         cls.recalculate_center(parent, need_check_changes=not was_central_pattern)
 
     @staticmethod
-    def _delete_last_pattern(pattern_instance):
-        root = pattern_instance.cluster
-        root.not_recalc_patt_del = 0
-        root.save(update_fields=['not_recalc_patt_del'])
+    def _delete_last_pattern(cluster):
+        cluster.not_recalc_patt_del = 0
+        cluster.save(update_fields=['not_recalc_patt_del'])
         return
 
     @classmethod
-    def _simple_delete(cls, pattern_instance):
-        cluster = pattern_instance.cluster
-        cluster.not_recalc_patt_del = cluster.not_recalc_patt_del + 1
+    def _simple_delete(cls, cluster, deleted_patterns_amount=1):
+        cluster.not_recalc_patt_del = cluster.not_recalc_patt_del + deleted_patterns_amount
         cluster.save(update_fields=['not_recalc_patt_del'])
 
-        was_central_pattern = pattern_instance.cluster.center is None
-        cls.recalculate_center(pattern_instance.cluster, need_check_changes=not was_central_pattern)
+        was_central_pattern = cluster.center is None
+        cls.recalculate_center(cluster, need_check_changes=not was_central_pattern)
+
+
+class SignalsSuspendingSupporter:
+    """Base class for supporters, that do in bulk what signal receivers do for single objects.
+    Receivers should do nothing, while signals of supporter are suspended in current thread."""
+    _state = threading.local()
+
+    @classmethod
+    @contextmanager
+    def suspend_signals(cls):
+        suspended = cls._get_suspended()
+        already_suspended = cls in suspended
+        suspended.add(cls)
+        try:
+            yield
+        finally:
+            if not already_suspended:
+                suspended.discard(cls)
+
+    @classmethod
+    def signals_suspended(cls):
+        return cls in cls._get_suspended()
+
+    @classmethod
+    def _get_suspended(cls):
+        if not hasattr(cls._state, 'suspended'):
+            cls._state.suspended = set()
+        return cls._state.suspended
+
+
+class FacesDeletionSupporter(SignalsSuspendingSupporter):
+    """Deletion of faces set by a few queries. Pattern centers, empty patterns and people
+    and clusters structure are handled once for all deleted faces, instead of handling it
+    by signals after deletion of every single face."""
+
+    @classmethod
+    def delete_faces(cls, faces_queryset):
+        faces = list(faces_queryset.values_list('pk', 'slug', 'pattern_id'))
+        if not faces:
+            return
+
+        faces_pks, faces_slugs, patterns_pks = zip(*faces)
+        with transaction.atomic(), cls.suspend_signals():
+            Faces.objects.filter(pk__in=faces_pks).delete()
+
+            patterns = Patterns.objects.filter(
+                pk__in={pk for pk in patterns_pks if pk is not None},
+            ).annotate(left_faces_amount=Count('faces'))
+            empty_patterns = []
+            left_patterns_pks = []
+            people_pks = set()
+            for pattern in patterns:
+                people_pks.add(pattern.person_id)
+                if pattern.left_faces_amount:
+                    recalculate_pattern_center(pattern)
+                    left_patterns_pks.append(pattern.pk)
+                else:
+                    empty_patterns.append(pattern)
+
+            cls.delete_patterns(empty_patterns)
+            recount_patterns_faces_amounts(Patterns.objects.filter(pk__in=left_patterns_pks))
+            recount_people_amounts(People.objects.filter(pk__in=people_pks))
+
+        delete_faces_thumbnails(get_face_thumbnail_name(pk, slug) for pk, slug in zip(faces_pks, faces_slugs))
+
+    @classmethod
+    def delete_patterns(cls, patterns):
+        if not patterns:
+            return
+
+        deleted_patterns_amounts = Counter(p.cluster_id for p in patterns if p.cluster_id is not None)
+        people_pks = {p.person_id for p in patterns if p.person_id is not None}
+        with transaction.atomic(), cls.suspend_signals():
+            Patterns.objects.filter(pk__in=[p.pk for p in patterns]).delete()
+            People.objects.filter(pk__in=people_pks, patterns__isnull=True).delete()
+            ManageClustersSupporter.manage_clusters_after_patterns_deletion(deleted_patterns_amounts)
@@ -1,23 +1,57 @@
+import hashlib
 import os
+import time
 import face_recognition as fr
 
 import pickle
 from PIL import Image
+from django.db import transaction
 from django.db.models import Prefetch
 
 from mainapp.models import Photos, Albums
 from photoalbums.settings import BASE_DIR, FACE_RECOGNITION_TOLERANCE, PATTERN_EQUALITY_TOLERANCE, \
-    SEARCH_PEOPLE_LIMIT, TEMP_ROOT
+    SEARCH_PEOPLE_LIMIT, TEMP_ROOT, PROGRESS_REPORT_INTERVAL_SECONDS
 
 from .data_classes import FaceData, PatternData, PersonData
 from .models import Faces, Patterns, People, Clusters
 from .redis_interface.task_handlers_api import RedisAPIStage1Handler, RedisAPIStage3Handler, RedisAPIStage6Handler, \
     RedisAPIStage9Handler, RedisAPISearchHandler
-from .utils import set_album_photos_processed
+from .utils import set_album_photos_processed, create_faces_thumbnails, recount_patterns_faces_amounts, \
+    recount_people_amounts
 from .supporters import DataDeletionSupporter, ManageClustersSupporter
 
 
-class BaseRecognitionHandler:
+class ProgressReportingMixin:
+    """Mixin for saving progress of handling to redis. Records are written not more often,
+    than once in PROGRESS_REPORT_INTERVAL_SECONDS, except the first and the last ones."""
+    progress_key_template = "album_{pk}"
+
+    def _start_progress(self, total):
+        self._progress_done = 0
+        self._progress_total = total
+        self._progress_started_at = time.time()
+        self._report_progress()
+
+    def _advance_progress(self, units=1):
+        self._progress_done += units
+        if self._progress_done >= self._progress_total or \
+                time.time() - self._progress_reported_at >= PROGRESS_REPORT_INTERVAL_SECONDS:
+            self._report_progress()
+
+    def _finish_progress(self):
+        self._progress_done = self._progress_total
+        self._report_progress()
+
+    def _report_progress(self):
+        self._progress_reported_at = time.time()
+        self.redisAPI.set_progress(self.progress_key_template.format(pk=self._object_pk),
+                                   stage=self.stage,
+                                   done=min(self._progress_done, self._progress_total),
+                                   total=self._progress_total,
+                                   started_at=self._progress_started_at)
+
+
+class BaseRecognitionHandler(ProgressReportingMixin):
     """Base class for all recognition Handlers"""
     start_message_template = ""
     finish_message_template = ""
@@ -25,6 +59,10 @@ class BaseRecognitionHandler:
     def __init__(self, album_pk):
         self._album_pk = album_pk
 
+    @property
+    def _object_pk(self):
+        return self._album_pk
+
     @property
     def start_message(self):
         return self.start_message_template.replace("album_pk", str(self._album_pk))
@@ -125,7 +163,7 @@ class FaceSearchingHandler(BaseRecognitionHandler):
         DataDeletionSupporter.prepare_to_recognition(self._album_pk)
         set_album_photos_processed(album_pk=self._album_pk, status=False)
 
-        photos_slugs = [photo.slug for photo in Photos.objects.filter(album__pk=self._album_pk, is_private=False)]
+        photos_slugs = [photo.slug for photo in self._get_photos()]
         self.redisAPI.set_photos_slugs(self._album_pk, photos_slugs)
 
         self.redisAPI.set_stage(self._album_pk, stage=1)
@@ -133,12 +171,38 @@ class FaceSearchingHandler(BaseRecognitionHandler):
         self.redisAPI.reset_processed_photos_amount(self._album_pk)
 
     def _face_search_and_save_to_redis(self):
-        for photo in Photos.objects.filter(album__pk=self._album_pk, is_private=False):
-            image = fr.load_image_file(os.path.join(BASE_DIR, photo.original.url[1:]))
-            faces = self._find_faces_on_image(image=image)
+        photos = list(self._get_photos())
+        self._start_progress(total=len(photos))
+        for photo in photos:
+            path = os.path.join(BASE_DIR, photo.original.url[1:])
+            file_digest = self._get_file_digest(path)
+            faces = self.redisAPI.get_detected_faces(file_digest)
+            if faces is None:
+                image = fr.load_image_file(path)
+                faces = self._find_faces_on_image(image=image)
+                self.redisAPI.set_detected_faces(file_digest, faces)
             self.redisAPI.set_photo_faces_data(album_pk=self._album_pk, photo_pk=photo.pk, data=faces)
             if not faces:
                 self.redisAPI.delete_photo_slug(self._album_pk, photo.slug)
+            self._advance_progress()
+        self._finish_progress()
+
+    def _get_photos(self):
+        """Public photos of album, that are processed. Photos, which processing failed, are not images,
+        so they are skipped."""
+        return Photos.objects.filter(album__pk=self._album_pk, is_private=False,
+                                     processing_status=Photos.PROCESSING_READY)
+
+    @staticmethod
+    def _get_file_digest(path):
+        """Digest of content of image file. All faces, found by detector on image, are kept in redis by it
+        (saved faces are only ones, that owner verified), and used instead of searching faces on the same image
+        again (copies of photos in copied albums)."""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
 
     @staticmethod
     def _find_faces_on_image(image):
@@ -166,10 +230,12 @@ class RelateFacesHandler(BaseRecognitionHandler):
         self._prepare_path()
         self._get_queryset()
         self._get_faces_data_from_redis()
+        self._start_progress(total=self._count_progress_units())
         self._relate_faces_data()
         self._find_central_faces_of_patterns()
         self._save_patterns_data_to_redis()
         self._print_pattern_faces()
+        self._finish_progress()
         super().handle()
 
         if self._all_patterns_have_single_faces():
@@ -184,6 +250,10 @@ class RelateFacesHandler(BaseRecognitionHandler):
             photo_faces = self.redisAPI.get_faces_data_of_photo(photo.pk)
             self._data.update({photo.pk: photo_faces})
 
+    def _count_progress_units(self):
+        # Every face is related to pattern and then printed
+        return sum(map(len, self._data.values())) * 2
+
     def _relate_faces_data(self):
         for photo_pk, faces in self._data.items():
             if not self._patterns:
@@ -198,6 +268,7 @@ class RelateFacesHandler(BaseRecognitionHandler):
                             break
                     else:
                         self._patterns.append(PatternData(face))
+            self._advance_progress(len(faces))
 
     @staticmethod
     def _is_same_face(face_enc, known_encs):
@@ -232,6 +303,7 @@ class RelateFacesHandler(BaseRecognitionHandler):
                     os.makedirs(os.path.join(self._path, str(i)))
                 save_path = os.path.join(self._path, str(i), f'{j}.jpg')
                 pil_image.save(save_path)
+                self._advance_progress()
 
     def _all_patterns_have_single_faces(self):
         return all(map(lambda p: len(p) == 1, self._patterns))
@@ -261,8 +333,10 @@ class ComparingExistingAndNewPeopleHandler(BaseRecognitionLateStageHandler):
     def handle(self):
         self._get_existing_people_data_from_db()
         self._get_new_people_data_from_redis_or_create_people()
+        self._start_progress(total=len(self._existing_people) * len(self._new_people))
         self._connect_people_in_pairs()
         self._save_united_people_data_to_redis()
+        self._finish_progress()
         super().handle()
 
         if not self.redisAPI.check_any_tech_matches(self._album_pk):
@@ -311,6 +385,7 @@ class ComparingExistingAndNewPeopleHandler(BaseRecognitionLateStageHandler):
                 dist = self._get_ppl_dist(old_per, new_per)
                 if dist <= FACE_RECOGNITION_TOLERANCE:
                     ppl_distances.append((dist, old_per, new_per))
+            self._advance_progress(len(self._new_people))
 
         ppl_distances.sort(key=lambda data: data[0])
 
@@ -360,16 +435,28 @@ class SavingAlbumRecognitionDataToDBHandler(BaseRecognitionLateStageHandler):
         super().__init__(album_pk)
         self._new_people = []
         self._new_patterns_instances = []
+        self._new_faces_instances = []
+        self._saved_people_pks = []
 
     def handle(self):
         self._get_new_people_data_from_redis_or_create_people()
+        self._start_progress(total=self._count_progress_units())
         self._save_data_to_db()
+        self._finish_progress()
         self._save_album_report()
         self._set_finished_and_clear()
 
+    def _count_progress_units(self):
+        # Every person is saved, and then every its pattern may be registered in clusters
+        return len(self._new_people) + sum(map(len, self._new_people))
+
     def _save_data_to_db(self):
-        self._save_main_data()
-        ManageClustersSupporter.form_cluster_structure(self._new_patterns_instances)
+        with transaction.atomic():
+            self._save_main_data()
+            self._recount_saved_people_amounts()
+        create_faces_thumbnails(self._new_faces_instances)
+        ManageClustersSupporter.form_cluster_structure(self._new_patterns_instances,
+                                                       on_pattern_registered=self._advance_progress)
         set_album_photos_processed(album_pk=self._album_pk, status=True)
 
     def _save_main_data(self):
@@ -382,11 +469,17 @@ class SavingAlbumRecognitionDataToDBHandler(BaseRecognitionLateStageHandler):
                 self._create_person_instance(person, album, person_number_in_album=count_new_people)
             else:
                 self._update_person_instance(person, album)
+            self._advance_progress()
+
+    def _recount_saved_people_amounts(self):
+        recount_patterns_faces_amounts(Patterns.objects.filter(person__pk__in=self._saved_people_pks))
+        recount_people_amounts(People.objects.filter(pk__in=self._saved_people_pks))
 
     def _create_person_instance(self, person_data, album, person_number_in_album):
         person_instance = People(owner=album.owner,
                                  name=f"{album.title[:20]}__{person_number_in_album}__{album.owner.username[:10]}")
         person_instance.save()
+        self._saved_people_pks.append(person_instance.pk)
 
         patterns_instances = []
         # Saving patterns
@@ -403,6 +496,7 @@ class SavingAlbumRecognitionDataToDBHandler(BaseRecognitionLateStageHandler):
                                       loc_top=top, loc_right=right, loc_bot=bot, loc_left=left,
                                       encoding=face_data.encoding.dumps())
                 face_instance.save()
+                self._new_faces_instances.append(face_instance)
 
                 # Saving central face of pattern
                 if pattern_data.central_face == face_data:
@@ -414,6 +508,7 @@ class SavingAlbumRecognitionDataToDBHandler(BaseRecognitionLateStageHandler):
     def _update_person_instance(self, person_data, album):
         created_patterns_instances = []
         old_person_data, person_instance = self._get_old_person(person_pk=person_data.pair_pk, album=album)
+        self._saved_people_pks.append(person_instance.pk)
 
         # Creating new pattern, ot uniting with old one, if it already exists
         for new_pattern_data in person_data:
@@ -451,6 +546,7 @@ class SavingAlbumRecognitionDataToDBHandler(BaseRecognitionLateStageHandler):
                                       loc_top=top, loc_right=right, loc_bot=bot, loc_left=left,
                                       encoding=face_data.encoding.dumps())
                 face_instance.save()
+                self._new_faces_instances.append(face_instance)
 
                 # If central face is a new one - linking it
                 if central_face_is_new and calculated_central_face_data == face_data:
@@ -510,17 +606,22 @@ class ClearTempDataHandler(BaseRecognitionHandler):
         DataDeletionSupporter.clean_after_recognition(album_pk=self._album_pk)
 
 
-class SimilarPeopleSearchingHandler:
+class SimilarPeopleSearchingHandler(ProgressReportingMixin):
     """Class for searching people in other users photos, who look like the person in the user's photos.
     Search is based on patterns in the fractal structure of clusters."""
     start_message_template = "Starting to search person person_pk."
     finish_message_template = "Search of person person_pk is finished."
     stage = 0
     redisAPI = RedisAPISearchHandler
+    progress_key_template = "person_{pk}"
 
     def __init__(self, person_pk):
         self._person_pk = person_pk
 
+    @property
+    def _object_pk(self):
+        return self._person_pk
+
     @property
     def start_message(self):
         return self.start_message_template.replace("person_pk", str(self._person_pk))
@@ -539,6 +640,7 @@ class SimilarPeopleSearchingHandler:
     def _find_similar_people(self):
         person_patterns = Patterns.objects.filter(person__pk=self._person_pk).select_related('central_face')
         nearest_people = {}
+        self._start_progress(total=len(person_patterns))
         for pattern in person_patterns:
             nearest_patterns = self._find_nearest_patterns(
                 pattern_central_encoding=pickle.loads(pattern.central_face.encoding),
@@ -548,6 +650,8 @@ class SimilarPeopleSearchingHandler:
                     nearest_people[patt.person] = distance
 
             self.redisAPI.encrease_patterns_search_amount(self._person_pk)
+            self._advance_progress()
+        self._finish_progress()
 
         list_of_nearest_people = sorted(filter(lambda p: p.pk != self._person_pk and p.owner.pk != self._owner_pk,
                                                nearest_people.keys()), key=lambda k: nearest_people[k])
@@ -1,10 +1,13 @@
 import os
+import threading
+from contextlib import contextmanager
 
 from celery.utils.log import get_task_logger
 from celery import shared_task
 
-from photoalbums.settings import TEMP_ROOT
-from .redis_interface.functional_api import RedisAPIAlbumDataChecker
+from mainapp.utils import delete_expired_zip_cache
+from photoalbums.settings import TEMP_ROOT, RECOGNITION_TASK_HEARTBEAT_SECONDS
+from .redis_interface.functional_api import RedisAPIAlbumDataChecker, RedisAPITasksQueue, RedisAPITaskLock
 from .supporters import DataDeletionSupporter
 from .task_handlers import FaceSearchingHandler, RelateFacesHandler, ComparingExistingAndNewPeopleHandler, \
     SavingAlbumRecognitionDataToDBHandler, ClearTempDataHandler, SimilarPeopleSearchingHandler
@@ -21,22 +24,72 @@ recognition_handlers = {handler.stage: handler for handler in [
 ]}
 
 
+def lock_recognition_task(object_pk: int, recognition_stage: int):
+    """Should be called before launching of recognition task (and changing of processing state for it).
+    Returns False, if the same task is already launched and not finished, so this launch must do nothing."""
+    return RedisAPITaskLock.acquire(RedisAPITasksQueue.get_object_key(recognition_stage, object_pk), recognition_stage)
+
+
+def schedule_recognition_task(object_pk: int, recognition_stage: int, user_pk: int):
+    """Puts recognition task of user to queue, from which it is started, when there is free slot for it."""
+    RedisAPITasksQueue.add_task(user_pk, recognition_stage, object_pk)
+    dispatch_recognition_tasks()
+
+
+@contextmanager
+def recognition_task_heartbeat(object_pk: int, recognition_stage: int, user_pk: int = None):
+    """Refreshes start time of running task (if it was scheduled) and its lock in background thread,
+    while task is running, so long task is not considered lost."""
+    object_key = RedisAPITasksQueue.get_object_key(recognition_stage, object_pk)
+    stopped = threading.Event()
+
+    def beat():
+        while not stopped.wait(RECOGNITION_TASK_HEARTBEAT_SECONDS):
+            RedisAPITaskLock.refresh(object_key, recognition_stage)
+            if user_pk is not None:
+                RedisAPITasksQueue.refresh_task(user_pk, recognition_stage, object_pk)
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+@shared_task
+def dispatch_recognition_tasks():
+    for user_pk, recognition_stage, object_pk in RedisAPITasksQueue.pop_tasks_to_start():
+        # Lock of task was held while waiting in queue, since now it expires as slot of lost task
+        RedisAPITaskLock.refresh(RedisAPITasksQueue.get_object_key(recognition_stage, object_pk), recognition_stage)
+        recognition_task.delay(object_pk, recognition_stage, user_pk)
+
+
 @shared_task
-def recognition_task(object_pk: int, recognition_stage: int):
+def recognition_task(object_pk: int, recognition_stage: int, user_pk: int = None):
     handler = recognition_handlers[recognition_stage](object_pk)
     logger.info(handler.start_message)
-    handler.handle()
+    try:
+        with recognition_task_heartbeat(object_pk, recognition_stage, user_pk):
+            handler.handle()
+    finally:
+        RedisAPITaskLock.release(RedisAPITasksQueue.get_object_key(recognition_stage, object_pk), recognition_stage)
+        # Slot of scheduled task is freed for next one in queue
+        if user_pk is not None:
+            RedisAPITasksQueue.finish_task(user_pk, recognition_stage, object_pk)
+            dispatch_recognition_tasks()
     return handler.finish_message
 
 
 @shared_task
-def clear_cache_and_delete_expired_temp_files():
-    logger.info("Cache clearing and deletion of expire temp files started")
+def delete_expired_temp_files():
+    logger.info("Deletion of expire temp files started")
     temp_directories = os.listdir(TEMP_ROOT)
     for directory_name in temp_directories:
         if not RedisAPIAlbumDataChecker.check_album_in_processing(directory_name):
             DataDeletionSupporter.delete_temp_directory(directory_name)
 
-    DataDeletionSupporter.clear_cache()
+    delete_expired_zip_cache()
 
-    return "Cache clearing and deletion of expire temp files finished"
+    return "Deletion of expire temp files finished"
@@ -0,0 +1,84 @@
+from django.test import TestCase
+
+from mainapp.tests.performance import PerformanceTestCase
+from recognition.models import Clusters, People, Faces, Patterns
+from recognition.supporters import ManageClustersSupporter
+
+
+class TestClustersPath(TestCase):
+    def setUp(self):
+        self.root = Clusters.objects.create()
+        self.child = Clusters.objects.create(parent=self.root)
+        self.grandchild = Clusters.objects.create(parent=self.child)
+        self.great_grandchild = Clusters.objects.create(parent=self.grandchild)
+
+    def test_path_and_depth_on_creation(self):
+        self.assertEqual(self.root.depth, 0)
+        self.assertEqual(self.great_grandchild.depth, 3)
+        self.assertEqual(self.great_grandchild.get_ancestors_pks(),
+                         [self.root.pk, self.child.pk, self.grandchild.pk])
+        self.assertTrue(self.great_grandchild.path.startswith(self.grandchild.path))
+
+    def test_get_ancestors(self):
+        self.assertEqual(list(self.great_grandchild.get_ancestors()), [self.root, self.child, self.grandchild])
+        self.assertFalse(self.root.get_ancestors().exists())
+
+    def test_get_descendants(self):
+        self.assertEqual(set(self.child.get_descendants()), {self.grandchild, self.great_grandchild})
+
+    def test_lift_descendants(self):
+        self.grandchild.parent = self.root
+        self.grandchild.save(update_fields=['parent'])
+        ManageClustersSupporter._lift_descendants(self.child, new_parent=self.root)
+
+        self.grandchild.refresh_from_db()
+        self.great_grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.depth, 1)
+        self.assertEqual(self.grandchild.get_ancestors_pks(), [self.root.pk])
+        self.assertEqual(self.great_grandchild.depth, 2)
+        self.assertEqual(self.great_grandchild.get_ancestors_pks(), [self.root.pk, self.grandchild.pk])
+
+    def test_path_of_the_deepest_cluster_fits_field(self):
+        cluster = self.great_grandchild
+        while cluster.depth < Clusters.max_depth:
+            cluster = Clusters.objects.create(parent=cluster)
+
+        self.assertLessEqual(len(cluster.path), Clusters._meta.get_field('path').max_length)
+
+
+class TestPeopleCoverFace(PerformanceTestCase):
+    users_amount = 1
+    albums_per_user = 2
+
+    def _get_biggest_pattern(self, person):
+        return person.patterns_set.order_by('-faces_amount', 'pk').first()
+
+    def test_cover_face_is_central_face_of_biggest_pattern(self):
+        for person in People.objects.all():
+            self.assertIsNotNone(person.cover_face_id)
+            self.assertEqual(person.cover_face_id, self._get_biggest_pattern(person).central_face_id)
+
+    def test_cover_face_is_replaced_after_deletion(self):
+        old_cover_face = self.person.cover_face
+        old_cover_face.delete()
+
+        self.person.refresh_from_db()
+        self.assertIsNotNone(self.person.cover_face_id)
+        self.assertNotEqual(self.person.cover_face_id, old_cover_face.pk)
+        self.assertEqual(self.person.cover_face_id, self._get_biggest_pattern(self.person).central_face_id)
+
+
+class TestPhotoDeletion(PerformanceTestCase):
+    users_amount = 1
+    albums_per_user = 1
+
+    def test_faces_of_single_photo_are_deleted_together(self):
+        faces_pks = list(self.photo.faces_set.values_list('pk', flat=True))
+        self.assertTrue(faces_pks)
+
+        self.photo.delete()
+
+        self.assertFalse(Faces.objects.filter(pk__in=faces_pks).exists())
+        for pattern in Patterns.objects.all():
+            self.assertEqual(pattern.faces_amount, pattern.faces_set.count())
+            self.assertIsNotNone(pattern.central_face_id)
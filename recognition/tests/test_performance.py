@@ -0,0 +1,20 @@
+from django.urls import reverse
+
+from mainapp.tests.performance import PerformanceTestCase
+from recognition.models import People
+from recognition.redis_interface.functional_api import RedisAPISearchSetter
+
+
+class TestViewsPerformance(PerformanceTestCase):
+    def test_recognized_people(self):
+        self.assertWithinBudget(reverse('recognition_main'), queries=5)
+
+    def test_person(self):
+        self.assertWithinBudget(self.person.get_absolute_url(), queries=10)
+
+    def test_search_people(self):
+        RedisAPISearchSetter.prepare_to_search(self.person.pk)
+        RedisAPISearchSetter.set_founded_similar_people(
+            self.person.pk, list(People.objects.exclude(owner=self.user).values_list('pk', flat=True)))
+        self.assertWithinBudget(reverse('search_people'), {'person': self.person.slug}, queries=8)
+        RedisAPISearchSetter.prepare_to_search(self.person.pk)
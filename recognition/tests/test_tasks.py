@@ -0,0 +1,123 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from photoalbums.celery import set_recognition_worker_concurrency
+from photoalbums.settings import RECOGNITION_QUEUES_SLOTS, RECOGNITION_USER_TASKS_LIMIT, RECOGNITION_TASK_STALE_SECONDS
+from recognition.redis_interface.functional_api import RedisAPITasksQueue, RedisAPITaskLock, RedisAPIDetectedFaces, \
+    redis_instance
+from recognition.tasks import lock_recognition_task
+
+
+class TestRecognitionTasksQueue(SimpleTestCase):
+    def setUp(self):
+        redis_instance.delete(RedisAPITasksQueue.queue_key, RedisAPITasksQueue.running_key)
+
+    def tearDown(self):
+        redis_instance.delete(RedisAPITasksQueue.queue_key, RedisAPITasksQueue.running_key)
+
+    def test_users_go_in_turns(self):
+        queue = [('1:1:10', 1), ('1:1:11', 2), ('1:1:12', 3), ('2:1:20', 4), ('2:3:21', 5)]
+
+        self.assertEqual(RedisAPITasksQueue.order_queue(queue, running=[]),
+                         ['1:1:10', '2:1:20', '1:1:11', '2:3:21', '1:1:12'])
+        self.assertEqual(RedisAPITasksQueue.order_queue(queue, running=['1:3:13']),
+                         ['2:1:20', '1:1:10', '2:3:21', '1:1:11', '1:1:12'])
+
+    def test_bulk_stages_wait_for_interactive_ones(self):
+        queue = [('1:0:10', 1), ('2:0:20', 2), ('3:9:30', 3), ('3:1:31', 4)]
+
+        self.assertEqual(RedisAPITasksQueue.order_queue(queue, running=[]), ['3:9:30', '3:1:31', '1:0:10', '2:0:20'])
+        # Position is counted among tasks of the same celery queue
+        self.assertEqual(RedisAPITasksQueue.parse_queue_position(queue, [], 'person_20'), 2)
+        self.assertEqual(RedisAPITasksQueue.parse_queue_position(queue, [], 'album_31'), 1)
+        self.assertIsNone(RedisAPITasksQueue.parse_queue_position(queue, [], 'album_10'))
+
+    def test_slots_and_user_limit(self):
+        slots = RECOGNITION_QUEUES_SLOTS['recognition_images']
+        for album_pk in range(slots + RECOGNITION_USER_TASKS_LIMIT):
+            RedisAPITasksQueue.add_task(user_pk=1, stage=1, object_pk=album_pk)
+        RedisAPITasksQueue.add_task(user_pk=2, stage=1, object_pk=100)
+        RedisAPITasksQueue.add_task(user_pk=1, stage=9, object_pk=200)
+
+        started = RedisAPITasksQueue.pop_tasks_to_start()
+
+        self.assertIn((2, 1, 100), started)
+        self.assertIn((1, 9, 200), started)
+        self.assertEqual(len([task for task in started if task[:2] == (1, 1)]),
+                         min(RECOGNITION_USER_TASKS_LIMIT, slots - 1))
+        self.assertEqual(RedisAPITasksQueue.pop_tasks_to_start(), [])
+
+        RedisAPITasksQueue.finish_task(2, 1, 100)
+        self.assertEqual(len(RedisAPITasksQueue.pop_tasks_to_start()), 1)
+        # Last queued task of user is the last one in queue
+        self.assertEqual(RedisAPITasksQueue.get_queue_position(f'album_{slots + RECOGNITION_USER_TASKS_LIMIT - 1}'),
+                         redis_instance.zcard(RedisAPITasksQueue.queue_key))
+
+    def test_refreshed_long_task_is_not_lost(self):
+        started_at = time.time() - 2 * RECOGNITION_TASK_STALE_SECONDS
+        redis_instance.zadd(RedisAPITasksQueue.running_key, {'1:1:10': started_at, '1:1:11': started_at})
+
+        RedisAPITasksQueue.refresh_task(user_pk=1, stage=1, object_pk=10)
+        RedisAPITasksQueue.pop_tasks_to_start()
+
+        self.assertEqual(redis_instance.zrange(RedisAPITasksQueue.running_key, 0, -1), ['1:1:10'])
+        # Lost task is not returned to running ones by its late heartbeat
+        RedisAPITasksQueue.refresh_task(user_pk=1, stage=1, object_pk=11)
+        self.assertEqual(redis_instance.zrange(RedisAPITasksQueue.running_key, 0, -1), ['1:1:10'])
+
+
+class TestRecognitionTaskLock(SimpleTestCase):
+    def tearDown(self):
+        RedisAPITaskLock.release('album_1', 1)
+
+    def test_repeated_launch_is_locked(self):
+        self.assertTrue(lock_recognition_task(1, 1))
+        self.assertFalse(lock_recognition_task(1, 1))
+        self.assertTrue(RedisAPITaskLock.is_locked('album_1', 1))
+
+        RedisAPITaskLock.release('album_1', 1)
+        self.assertTrue(lock_recognition_task(1, 1))
+
+    def test_dispatched_task_lock_expires_as_its_slot(self):
+        lock_recognition_task(1, 1)
+
+        RedisAPITaskLock.refresh('album_1', 1)
+
+        self.assertLessEqual(redis_instance.ttl(RedisAPITaskLock.get_key('album_1', 1)), RECOGNITION_TASK_STALE_SECONDS)
+
+
+class TestDetectedFaces(SimpleTestCase):
+    file_digest = 'test_digest'
+
+    def tearDown(self):
+        redis_instance.delete(f'detected_faces_{self.file_digest}')
+
+    def test_faces_are_kept_by_file_digest(self):
+        encoding = np.random.default_rng(0).random(128)
+        self.assertIsNone(RedisAPIDetectedFaces.get_detected_faces(self.file_digest))
+
+        RedisAPIDetectedFaces.set_detected_faces(self.file_digest, [((0, 4, 4, 0), encoding)])
+        [(location, cached_encoding)] = RedisAPIDetectedFaces.get_detected_faces(self.file_digest)
+
+        self.assertEqual(location, (0, 4, 4, 0))
+        np.testing.assert_array_equal(cached_encoding, encoding)
+        # Photo without faces is not searched again too
+        RedisAPIDetectedFaces.set_detected_faces(self.file_digest, [])
+        self.assertEqual(RedisAPIDetectedFaces.get_detected_faces(self.file_digest), [])
+
+
+class TestRecognitionWorkerConcurrency(SimpleTestCase):
+    def test_concurrency_is_taken_from_queue_slots(self):
+        conf = SimpleNamespace(worker_concurrency=None)
+        set_recognition_worker_concurrency('db@host', conf=conf, options={'queues': ['recognition_db']})
+        self.assertEqual(conf.worker_concurrency, RECOGNITION_QUEUES_SLOTS['recognition_db'])
+
+    def test_concurrency_of_command_line_and_other_queues_is_kept(self):
+        conf = SimpleNamespace(worker_concurrency=None)
+        set_recognition_worker_concurrency('db@host', conf=conf, options={'queues': ['recognition_db'],
+                                                                          'concurrency': 3})
+        set_recognition_worker_concurrency('default@host', conf=conf, options={'queues': ['default']})
+        self.assertIsNone(conf.worker_concurrency)
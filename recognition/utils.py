@@ -1,16 +1,77 @@
+import hashlib
+import io
+import os
 import pickle
+from functools import lru_cache
 
-from mainapp.models import Photos
-from .models import Patterns
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from PIL import Image, ImageOps, ImageDraw, ImageFont
+
+from mainapp.models import Albums, Photos
+from mainapp.utils import get_or_compute, get_version, bump_version, get_temp_path
+from photoalbums.settings import FACES_THUMBNAILS_ROOT, FACE_THUMBNAIL_SIZE, FACE_THUMBNAIL_QUALITY, \
+    FACE_THUMBNAIL_FORMATS, FACE_THUMBNAIL_CACHE_SECONDS, FRAMED_PHOTO_WIDTHS, REDIS_DATA_EXPIRATION_SECONDS
+from .models import Faces, Patterns
 from .data_classes import FaceData, PatternData
 
 
 def set_album_photos_processed(album_pk: int, status: bool):
-    photos = Photos.objects.filter(album__pk=album_pk)
-    for photo in photos:
-        photo.faces_extracted = status
+    with transaction.atomic():
+        Photos.objects.filter(album__pk=album_pk).update(faces_extracted=status)
+        recount_albums_photos_amounts(Albums.objects.filter(pk=album_pk))
+
+
+def recount_albums_photos_amounts(albums):
+    """Updating counters of public and processed public photos of albums queryset by one query."""
+    albums.update(public_photos_amount=_get_amount_subquery(Photos.objects.filter(is_private=False), 'album'),
+                  processed_photos_amount=_get_amount_subquery(
+                      Photos.objects.filter(is_private=False, faces_extracted=True), 'album'))
+
+
+def recount_patterns_faces_amounts(patterns):
+    """Updating counters of faces of patterns queryset by one query."""
+    patterns.update(faces_amount=_get_amount_subquery(Faces.objects.all(), 'pattern'))
+
+
+def recount_people_amounts(people):
+    """Updating counters of faces, photos and albums of people queryset by one query.
+    Cover face of each person is updated too - it is the central face of person's biggest pattern,
+    so patterns faces amounts should be recounted before."""
+    people.update(faces_amount=_get_amount_subquery(Faces.objects.all(), 'pattern__person'),
+                  photos_amount=_get_amount_subquery(Faces.objects.all(), 'pattern__person', 'photo'),
+                  albums_amount=_get_amount_subquery(Faces.objects.all(), 'pattern__person', 'photo__album'),
+                  cover_face=_get_cover_face_subquery())
+    bump_people_versions(people.values_list('owner_id', flat=True))
+
+
+def get_people_version(owner_pk):
+    """Version stamp of recognized people of user (with their faces) for conditional requests."""
+    return get_version(f'user_{owner_pk}_people_version')
+
+
+def bump_people_versions(owners_pks):
+    for owner_pk in set(owners_pks):
+        bump_version(f'user_{owner_pk}_people_version')
 
-    Photos.objects.bulk_update(photos, ['faces_extracted'])
+
+def _get_amount_subquery(queryset, related_field, counted_field='pk'):
+    return Coalesce(Subquery(queryset.filter(
+        **{related_field: OuterRef('pk')},
+    ).order_by().values(related_field).annotate(
+        amount=Count(counted_field, distinct=True),
+    ).values('amount')), 0)
+
+
+def _get_cover_face_subquery():
+    return Subquery(Patterns.objects.filter(
+        person=OuterRef('pk'),
+        central_face__isnull=False,
+    ).order_by('-faces_amount', 'pk').values('central_face')[:1])
 
 
 def recalculate_pattern_center(pattern: Patterns):
@@ -32,3 +93,131 @@ def recalculate_pattern_center(pattern: Patterns):
             pattern.central_face = faces[i]
             pattern.save(update_fields=['central_face'])
             break
+
+
+def get_face_thumbnail_name(face_pk: int, face_slug: str):
+    """Name of thumbnail of face. Slug of face is repeated by face of new photo with the same title and index
+    (after deletion of old photo), so thumbnail is named by primary key too."""
+    return f'{face_slug}-{face_pk}'
+
+
+def get_face_thumbnail_path(thumbnail_name: str, image_format: str = 'JPEG'):
+    return os.path.join(FACES_THUMBNAILS_ROOT, thumbnail_name + FACE_THUMBNAIL_FORMATS[image_format])
+
+
+def create_faces_thumbnails(faces):
+    """Saving fixed-size crops of faces in all thumbnail formats. Each photo is opened only once."""
+    faces_by_photo = {}
+    for face in faces:
+        faces_by_photo.setdefault(face.photo_id, []).append(face)
+
+    if not os.path.exists(FACES_THUMBNAILS_ROOT):
+        os.makedirs(FACES_THUMBNAILS_ROOT, exist_ok=True)
+
+    for photo_faces in faces_by_photo.values():
+        with Image.open(photo_faces[0].photo.original.path) as photo_img:
+            photo_img = photo_img.convert('RGB')
+            for face in photo_faces:
+                face_img = photo_img.crop((face.loc_left, face.loc_top, face.loc_right, face.loc_bot))
+                face_img = ImageOps.fit(face_img, FACE_THUMBNAIL_SIZE)
+                for image_format in FACE_THUMBNAIL_FORMATS:
+                    # Writing to temp file first, so not finished thumbnail will never be served
+                    path = get_face_thumbnail_path(get_face_thumbnail_name(face.pk, face.slug), image_format)
+                    temp_path = get_temp_path(path)
+                    face_img.save(temp_path, image_format, quality=FACE_THUMBNAIL_QUALITY)
+                    os.replace(temp_path, path)
+
+
+def delete_faces_thumbnails(thumbnails_names):
+    for thumbnail_name in thumbnails_names:
+        for image_format in FACE_THUMBNAIL_FORMATS:
+            path = get_face_thumbnail_path(thumbnail_name, image_format)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def get_face_thumbnail_response(request, face):
+    """Returns thumbnail of face (creating it, if it was not created yet) with long time caching headers.
+    Location of face never changes after its creation, so thumbnail is validated by name (with primary key
+    of face) and format."""
+    image_format = 'WEBP' if 'image/webp' in request.headers.get('Accept', '') else 'JPEG'
+    thumbnail_name = get_face_thumbnail_name(face.pk, face.slug)
+    etag = quote_etag(f'{thumbnail_name}-{image_format.lower()}')
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        path = get_face_thumbnail_path(thumbnail_name, image_format)
+        if not os.path.exists(path):
+            create_faces_thumbnails([face])
+        response = FileResponse(open(path, 'rb'), content_type=f'image/{image_format.lower()}')
+
+    response['ETag'] = etag
+    response['Cache-Control'] = f'private, max-age={FACE_THUMBNAIL_CACHE_SECONDS}'
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+@lru_cache(maxsize=64)
+def get_frame_font(size: int):
+    return ImageFont.truetype("arialbd.ttf", max(size, 1))
+
+
+def get_framed_photo_width(requested_width):
+    """Returns the smallest allowed width, that is not less than requested, or None for original size."""
+    try:
+        requested_width = int(requested_width)
+    except (TypeError, ValueError):
+        return None
+    for width in FRAMED_PHOTO_WIDTHS:
+        if width >= requested_width:
+            return width
+    return None
+
+
+def render_photo_with_framed_faces(photo, faces_locations, width=None):
+    with Image.open(photo.original.path) as image:
+        image = image.convert('RGB')
+        scale = 1
+        if width is not None and width < image.width:
+            scale = width / image.width
+            image = image.resize((width, round(image.height * scale)))
+
+        draw = ImageDraw.Draw(image)
+        for i, location in enumerate(faces_locations, 1):
+            top, right, bottom, left = map(lambda x: round(x * scale), location)
+            draw.rectangle(((left, top), (right, bottom)), outline=(0, 255, 0), width=max(round(4 * scale), 1))
+            draw.text((left, top), str(i), fill=(255, 0, 0), font=get_frame_font((bottom - top) // 3))
+        del draw
+
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def get_framed_photo_response(request, photo, faces_locations):
+    """Returns photo with drawn frames of faces, or only frames coordinates in overlay mode.
+    Rendered images are cached by photo, its faces locations and width."""
+    if request.GET.get('overlay'):
+        return JsonResponse({
+            'width': photo.original.width,
+            'height': photo.original.height,
+            'faces': [{'number': i, 'top': top, 'right': right, 'bottom': bottom, 'left': left}
+                      for i, (top, right, bottom, left) in enumerate(faces_locations, 1)],
+        })
+
+    width = get_framed_photo_width(request.GET.get('width'))
+    locations_hash = hashlib.md5(repr(faces_locations).encode()).hexdigest()
+    etag = quote_etag(f'{locations_hash}-{width}')
+
+    # Client, that already has the image with the same frames, gets it without rendering
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        cache_key = f"framed_photo_{photo.pk}_{locations_hash}_{width}"
+        image_bytes = get_or_compute(cache_key,
+                                     lambda: render_photo_with_framed_faces(photo, faces_locations, width=width),
+                                     REDIS_DATA_EXPIRATION_SECONDS)
+        response = HttpResponse(image_bytes, content_type='image/jpeg')
+
+    response['Cache-Control'] = 'private, no-cache'
+    response['ETag'] = etag
+    return response
@@ -1,19 +1,16 @@
 import os
 
 from django.contrib.auth.decorators import login_required
-from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.forms import formset_factory
-from django.http import Http404, HttpResponse
+from django.http import Http404
 from django.shortcuts import redirect
 from django.urls import reverse_lazy, reverse
 from django.views.generic import ListView, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Count, Q, Prefetch
+from django.db.models import Prefetch
 from django.views.generic.edit import FormMixin
 
-from PIL import Image, ImageDraw, ImageFont
-
 from mainapp.models import Photos, Albums
 from .forms import *
 from .models import Faces, People, Patterns
@@ -22,10 +19,10 @@ from .redis_interface.functional_api import RedisAPIPhotoDataGetter, RedisAPISta
 from .redis_interface.views_api import RedisAPIStageSearchView, RedisAPIStage1View, RedisAPIStage3View, \
     RedisAPIStage4View, RedisAPIStage2View, RedisAPIStage5View, RedisAPIStage6View, RedisAPIStage7View, \
     RedisAPIStage8View, RedisAPIStage9View
-from .tasks import recognition_task
-from photoalbums.settings import MEDIA_ROOT, BASE_DIR
+from .tasks import schedule_recognition_task, lock_recognition_task
+from photoalbums.settings import MEDIA_ROOT
 from .mixin_views import RecognitionMixin, ManualRecognitionMixin
-from .utils import set_album_photos_processed
+from .utils import set_album_photos_processed, get_face_thumbnail_response, get_framed_photo_response
 
 
 @login_required
@@ -45,17 +42,7 @@ def return_face_image_view(request):
     if face.photo.is_private:
         raise Http404
 
-    response = cache.get(face_slug)
-    if response:
-        return response
-
-    photo_img = Image.open(os.path.join(BASE_DIR, face.photo.original.url[1:]))
-    top, right, bottom, left = face.loc_top, face.loc_right, face.loc_bot, face.loc_left
-    face_img = photo_img.crop((left, top, right, bottom))
-    response = HttpResponse(content_type='image/jpg')
-    face_img.save(response, "JPEG")
-    cache.set(face_slug, response, 60 * 5)
-    return response
+    return get_face_thumbnail_response(request, face)
 
 
 @login_required
@@ -78,20 +65,7 @@ def return_photo_with_framed_faces(request):
     # Loading faces locations from redis
     faces_locations = RedisAPIPhotoDataGetter.get_face_locations_in_photo(photo.pk)
 
-    # Drawing
-    image = Image.open(os.path.join(BASE_DIR, photo.original.url[1:]))
-    draw = ImageDraw.Draw(image)
-    for i, location in enumerate(faces_locations, 1):
-        top, right, bottom, left = location
-        draw.rectangle(((left, top), (right, bottom)), outline=(0, 255, 0), width=4)
-        fontsize = (bottom - top) // 3
-        font = ImageFont.truetype("arialbd.ttf", fontsize)
-        draw.text((left, top), str(i), fill=(255, 0, 0), font=font)
-    del draw
-
-    response = HttpResponse(content_type='image/jpg')
-    image.save(response, "JPEG")
-    return response
+    return get_framed_photo_response(request, photo, faces_locations)
 
 
 class AlbumsRecognitionView(LoginRequiredMixin, ListView):
@@ -103,10 +77,7 @@ class AlbumsRecognitionView(LoginRequiredMixin, ListView):
     paginate_by = 12
 
     def get_queryset(self):
-        queryset = self.model.objects.select_related('miniature').filter(owner__pk=self.request.user.pk).annotate(
-            public_photos=Count('photos', filter=Q(photos__is_private=False)),
-            processed_photos=Count('photos', filter=(Q(photos__is_private=False) & Q(photos__faces_extracted=True)))
-        )
+        queryset = self.model.objects.select_related('miniature').filter(owner__pk=self.request.user.pk)
         return queryset
 
 
@@ -117,9 +88,7 @@ class AlbumProcessingConfirmView(LoginRequiredMixin, DetailView):
     template_name = 'recognition/processing_confirm.html'
 
     def get(self, request, *args, **kwargs):
-        self.object = Albums.objects.select_related('owner').annotate(
-            public_photos=Count('photos', filter=Q(photos__is_private=False))
-        ).get(slug=kwargs['album_slug'])
+        self.object = Albums.objects.select_related('owner').get(slug=kwargs['album_slug'])
 
         self._check_access_right()
 
@@ -133,10 +102,18 @@ class AlbumProcessingConfirmView(LoginRequiredMixin, DetailView):
             "If you do not complete the procedure, the result will NOT be saved.",
         ]
 
+        photos_processing = self.object.photos_set.filter(
+            is_private=False,
+            processing_status=Photos.PROCESSING_UPLOADED,
+        ).exists()
+        if photos_processing:
+            instructions = ["Uploaded photos of album are still being processed. Please, try again later."]
+
         context.update({
             'title': f'Album \"{self.object}\" - recognition',
             'button_label': "Start people recognition",
             'instructions': instructions,
+            'photos_processing': photos_processing,
         })
         return context
 
@@ -144,7 +121,7 @@ class AlbumProcessingConfirmView(LoginRequiredMixin, DetailView):
         if self.request.user.username_slug != self.object.owner.username_slug:
             raise Http404
 
-        if self.object.is_private or self.object.public_photos == 0:
+        if self.object.is_private or self.object.public_photos_amount == 0:
             raise Http404
 
 
@@ -165,9 +142,15 @@ def find_faces_view(request):
     if request.user.username_slug != album.owner.username_slug:
         raise Http404
 
-    RedisAPIStage.set_stage(album_pk=album.pk, stage=0)
-    RedisAPIStatus.set_status(album_pk=album.pk, status="processing")
-    recognition_task.delay(album.pk, 1)
+    # Faces are searched only on processed photos, as their files are replaced by processing
+    if album.photos_set.filter(is_private=False, processing_status=Photos.PROCESSING_UPLOADED).exists():
+        return redirect('processing_album_confirm', album_slug=album_slug)
+
+    # Repeated launch only leads to waiting page of already launched task
+    if lock_recognition_task(album.pk, 1):
+        RedisAPIStage.set_stage(album_pk=album.pk, stage=0)
+        RedisAPIStatus.set_status(album_pk=album.pk, status="processing")
+        schedule_recognition_task(album.pk, 1, request.user.pk)
 
     return redirect('frames_waiting', album_slug=album_slug)
 
@@ -219,6 +202,7 @@ class AlbumFramesWaitingView(LoginRequiredMixin, RecognitionMixin, DetailView):
             'instructions': instructions,
             'title': f'Album \"{self.object}\" - waiting',
             'number_of_processed_photos': number_of_processed_photos,
+            'task_progress': self.redisAPI.get_progress(f"album_{self.object.pk}"),
         })
 
         return context
@@ -230,9 +214,7 @@ class AlbumFramesWaitingView(LoginRequiredMixin, RecognitionMixin, DetailView):
 
     def get_queryset(self):
         queryset = self.model.objects.prefetch_related('photos_set__faces_set').select_related('owner').filter(
-            owner__pk=self.request.user.pk).annotate(
-            public_photos=Count('photos', filter=Q(photos__is_private=False))
-        )
+            owner__pk=self.request.user.pk)
 
         return queryset
 
@@ -287,7 +269,8 @@ class AlbumVerifyFramesView(LoginRequiredMixin, FormMixin, ManualRecognitionMixi
             self._count_photos_with_verified_faces()
             if self._photos_with_faces_amount == 0:
                 self.redisAPI.set_no_faces(self.album.pk)
-                recognition_task.delay(self.album.pk, -1)
+                if lock_recognition_task(self.album.pk, -1):
+                    schedule_recognition_task(self.album.pk, -1, self.request.user.pk)
                 set_album_photos_processed(album_pk=self.album.pk, status=True)
             else:
                 self._get_next_stage()
@@ -365,9 +348,11 @@ class AlbumVerifyFramesView(LoginRequiredMixin, FormMixin, ManualRecognitionMixi
         return context
 
     def _start_celery_task(self, next_stage):
+        if not lock_recognition_task(self.album.pk, next_stage):
+            return
         self.redisAPI.set_stage(album_pk=self.album.pk, stage=next_stage)
         self.redisAPI.set_status(album_pk=self.album.pk, status="processing")
-        recognition_task.delay(self.album.pk, next_stage)
+        schedule_recognition_task(self.album.pk, next_stage, self.request.user.pk)
 
     def _count_photos_with_verified_faces(self):
         count = 0
@@ -410,6 +395,7 @@ class AlbumPatternsWaitingView(LoginRequiredMixin, RecognitionMixin, DetailView)
             'progress': progress,
             'heading': "Recognizing faces. Creating patterns.",
             'instructions': instructions,
+            'task_progress': self.redisAPI.get_progress(f"album_{self.object.pk}"),
         })
 
         return context
@@ -525,9 +511,11 @@ class AlbumVerifyPatternsView(LoginRequiredMixin, FormMixin, ManualRecognitionMi
         return super().form_valid(form)
 
     def _start_celery_task(self, next_stage):
+        if not lock_recognition_task(self.object.pk, next_stage):
+            return
         self.redisAPI.set_stage(album_pk=self.object.pk, stage=next_stage)
         self.redisAPI.set_status(album_pk=self.object.pk, status="processing")
-        recognition_task.delay(self.object.pk, next_stage)
+        schedule_recognition_task(self.object.pk, next_stage, self.request.user.pk)
 
     def get_success_url(self):
         if self.formset.has_changed():
@@ -689,9 +677,11 @@ class AlbumGroupPatternsView(LoginRequiredMixin, FormMixin, ManualRecognitionMix
                 self.redisAPI.set_status(self.object.pk, status="processing")
 
     def _start_celery_task(self, next_stage):
+        if not lock_recognition_task(self.object.pk, next_stage):
+            return
         self.redisAPI.set_stage(album_pk=self.object.pk, stage=next_stage)
         self.redisAPI.set_status(album_pk=self.object.pk, status="processing")
-        recognition_task.delay(self.object.pk, next_stage)
+        schedule_recognition_task(self.object.pk, next_stage, self.request.user.pk)
 
     def get_success_url(self):
         if self._single_patterns:
@@ -737,6 +727,7 @@ class ComparingAlbumPeopleWaitingView(LoginRequiredMixin, RecognitionMixin, Deta
             'heading': "Looking for people matches in your other processed albums",
             'progress': progress,
             'instructions': instructions,
+            'task_progress': self.redisAPI.get_progress(f"album_{self.object.pk}"),
         })
 
         return context
@@ -788,15 +779,14 @@ class VerifyTechPeopleMatchesView(LoginRequiredMixin, FormMixin, ManualRecogniti
         # Getting index of new person and pk of old person in matches
         old_people_pks, new_people_inds = self.redisAPI.get_matching_people(self.object.pk)
 
-        # Getting urls of first faces of first patterns of each person
+        # Getting urls of first faces of first patterns of new people and cover faces of old people
         # new people
         patt_inds = self.redisAPI.get_first_patterns_indexes_of_people(self.object.pk, new_people_inds)
         face_urls = [f"/media/temp_photos/album_{self.object.pk}/patterns/{x}/1.jpg" for x in patt_inds]
 
         # old people
-        old_people = People.objects.filter(pk__in=old_people_pks).prefetch_related('patterns_set__faces_set')
-        old_face_urls = [reverse('get_face_img') + '?face=' +
-                         old_people.get(pk=x).patterns_set.first().faces_set.first().slug for x in old_people_pks]
+        old_faces_slugs = dict(People.objects.filter(pk__in=old_people_pks).values_list('pk', 'cover_face__slug'))
+        old_face_urls = [reverse('get_face_img') + '?face=' + old_faces_slugs[x] for x in old_people_pks]
 
         self._matches_urls = tuple(zip(new_people_inds, old_people_pks, face_urls, old_face_urls))
 
@@ -825,8 +815,10 @@ class VerifyTechPeopleMatchesView(LoginRequiredMixin, FormMixin, ManualRecogniti
         self._register_verified_matches_to_redis(form=form)
         self._check_new_single_people()
         self._check_old_single_people()
-        if not self._new_singe_people_present or not self._old_singe_people_present:
-            recognition_task.delay(self.object.pk, AlbumRecognitionDataSavingWaitingView.recognition_stage)
+        if (not self._new_singe_people_present or not self._old_singe_people_present) and \
+                lock_recognition_task(self.object.pk, AlbumRecognitionDataSavingWaitingView.recognition_stage):
+            schedule_recognition_task(self.object.pk, AlbumRecognitionDataSavingWaitingView.recognition_stage,
+                                      self.request.user.pk)
         self._set_correct_status()
         return super().form_valid(form)
 
@@ -912,7 +904,7 @@ class ManualMatchingPeopleView(LoginRequiredMixin, FormMixin, ManualRecognitionM
         return context
 
     def _get_old_ppl(self):
-        queryset = People.objects.prefetch_related('patterns_set__faces_set').filter(owner=self.object.owner)
+        queryset = People.objects.select_related('cover_face').filter(owner=self.object.owner)
 
         # Collecting already paired people with created people of this album
         paired = self.redisAPI.get_old_paired_people(self.object.pk)
@@ -923,7 +915,7 @@ class ManualMatchingPeopleView(LoginRequiredMixin, FormMixin, ManualRecognitionM
         for person in queryset:
             if person.pk not in paired:
                 old_ppl.append((person.pk,
-                                reverse('get_face_img') + '?face=' + person.patterns_set.first().faces_set.first().slug))
+                                reverse('get_face_img') + '?face=' + person.cover_face.slug))
 
         return old_ppl
 
@@ -939,8 +931,10 @@ class ManualMatchingPeopleView(LoginRequiredMixin, FormMixin, ManualRecognitionM
 
         self._set_correct_status()
 
-        if self._done:
-            recognition_task.delay(self.object.pk, AlbumRecognitionDataSavingWaitingView.recognition_stage)
+        if self._done and \
+                lock_recognition_task(self.object.pk, AlbumRecognitionDataSavingWaitingView.recognition_stage):
+            schedule_recognition_task(self.object.pk, AlbumRecognitionDataSavingWaitingView.recognition_stage,
+                                      self.request.user.pk)
 
         return super().form_valid(form)
 
@@ -1022,6 +1016,7 @@ class AlbumRecognitionDataSavingWaitingView(LoginRequiredMixin, RecognitionMixin
             'heading': "Saving all data to Data Base",
             'progress': 90,
             'instructions': instructions,
+            'task_progress': self.redisAPI.get_progress(f"album_{self.object.pk}"),
         })
         return context
 
@@ -1065,15 +1060,13 @@ class RenameAlbumsPeopleView(LoginRequiredMixin, FormMixin, RecognitionMixin, De
         people_pks = set(map(lambda f: f.pattern.person.pk, faces))
         people = People.objects.filter(
             pk__in=people_pks,
-        ).prefetch_related(
-            'patterns_set__faces_set',
-        ).annotate(
-            albums_amount=Count('patterns__faces__photo__album', distinct=True),
+        ).select_related(
+            'cover_face',
         ).exclude(albums_amount__gt=1)
         return people
 
     def _get_formset(self):
-        queryset = self._people.all().prefetch_related(None)
+        queryset = self._people.all().select_related(None)
         if self.request.method == 'GET':
             return RenamePeopleFormset(queryset=queryset)
         elif self.request.method == 'POST':
@@ -1094,7 +1087,7 @@ class RenameAlbumsPeopleView(LoginRequiredMixin, FormMixin, RecognitionMixin, De
             heading = "All recognized people in this album were paired with people from other albums"
             instructions = ["You can rename them on their pages"]
 
-        faces_slugs = tuple(map(lambda p: p.patterns_set.first().faces_set.first().slug, self._people))
+        faces_slugs = tuple(map(lambda p: p.cover_face.slug, self._people))
 
         context.update({
             'is_ready': True,
@@ -1176,8 +1169,7 @@ class RecognizedPeopleView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         queryset = self.model.objects.select_related(
             'owner',
-        ).prefetch_related(
-            'patterns_set__faces_set',
+            'cover_face',
         ).filter(owner__pk=self.request.user.pk)
         return queryset
 
@@ -1236,10 +1228,7 @@ class RecognizedPersonView(LoginRequiredMixin, FormMixin, ListView):
         return context
 
     def _get_person(self):
-        person = People.objects.select_related('owner').annotate(
-            photos_amount=Count('patterns__faces__photo', distinct=True),
-            albums_amount=Count('patterns__faces__photo__album', distinct=True),
-        ).get(slug=self.kwargs['person_slug'])
+        person = People.objects.select_related('owner').get(slug=self.kwargs['person_slug'])
         return person
 
     def get_success_url(self):
@@ -1259,8 +1248,10 @@ def find_people_view(request):
     if request.user.pk != person.owner.pk:
         raise Http404
 
-    RedisAPISearchSetter.prepare_to_search(person.pk)
-    recognition_task.delay(person.pk, 0)
+    # Repeated launch only leads to page of already launched search
+    if lock_recognition_task(person.pk, 0):
+        RedisAPISearchSetter.prepare_to_search(person.pk)
+        schedule_recognition_task(person.pk, 0, request.user.pk)
 
     response = redirect('search_people')
     response['Location'] += f'?person={person_slug}'
@@ -1279,8 +1270,7 @@ class SearchPeopleView(LoginRequiredMixin, ListView):
         if person_slug is None:
             raise Http404
 
-        self._person = People.objects.prefetch_related(
-            'patterns_set__faces_set').select_related('owner').get(slug=person_slug)
+        self._person = People.objects.select_related('owner', 'cover_face').get(slug=person_slug)
         if request.user.pk != self._person.owner.pk:
             raise Http404
 
@@ -1294,15 +1284,13 @@ class SearchPeopleView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         nearest_people_pks = self.redisAPI.get_founded_similar_people(self._person.pk)
-        queryset = People.objects.prefetch_related(
-            'patterns_set__faces_set',
-        ).select_related(
+        queryset = People.objects.select_related(
             'owner',
+            'cover_face',
+        ).prefetch_related(
+            'patterns_set__central_face',
         ).filter(
             pk__in=nearest_people_pks,
-        ).annotate(
-            photos_amount=Count('patterns__faces__photo', distinct=True),
-            albums_amount=Count('patterns__faces__photo__album', distinct=True),
         )
         query_list = sorted(queryset, key=lambda p: nearest_people_pks.index(p.pk))
         return query_list
@@ -1323,6 +1311,7 @@ class SearchPeopleView(LoginRequiredMixin, ListView):
             'progress': int(patterns_searched_amount / total_patterns_amount * 100),
             'person': self._person,
             'progress_label': f"{patterns_searched_amount} / {total_patterns_amount} patterns searched",
+            'task_progress': self.redisAPI.get_progress(f"person_{self._person.pk}"),
             'founded_people_heading': "Founded people from most similar to least:",
         })
 